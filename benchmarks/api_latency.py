@@ -0,0 +1,150 @@
+"""API route latency at a set data volume, against a local DynamoDB stand-in.
+
+Seeds fake_dynamodb.py by running a full ingest of the synthetic eCFR at
+--volume (ingest_throughput.py in a subprocess, as the two Lambdas can't
+share a process), then calls the API Lambda's main.handler in this process
+for each route below. Every route is measured twice:
+
+- cached: repeated requests against a warm container and a warm cache
+- uncached: a warm container, with the response, blob and search caches
+  cleared before every request, so each one reads DynamoDB
+
+Reports p50/p90/p99 per route and DynamoDB calls and read units per
+uncached request.
+
+    python benchmarks/api_latency.py [--volume medium] [--requests 200] [--out result.json]
+
+--table reuses a table written by ingest_throughput.py --dump instead of
+seeding one. --ddb-latency-ms adds a fixed delay to every DynamoDB call.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from common import API_DIR, http_event, log, offline_env, summarize, use_lambda, write_report
+from ecfr_server import VOLUMES
+from fake_dynamodb import FakeDynamoDB
+
+# name, path, query; names are the keys in the report
+ROUTES: List[Tuple[str, str, Dict[str, str]]] = [
+    ("health", "/health", {}),
+    ("agencies.json", "/agencies", {"format": "json"}),
+    ("agencies.html", "/agencies", {}),
+    ("titles.json", "/titles", {"format": "json"}),
+    ("search", "/api/search", {"q": "water"}),
+    ("search.prefix", "/api/search", {"q": "tra"}),
+    ("rankings", "/api/rankings/total_bytes", {}),
+    ("agency.cfr", "/agency/cfr", {"agency_slug": "office-1-1", "format": "json"}),
+    ("title.tree", "/api/title/1/tree", {"depth": "1"}),
+    ("title.tree.chapter", "/api/title/1/tree", {"path": "1/I", "depth": "2"}),
+    ("title.structure", "/title/structure", {"title_num": "1"}),
+]
+
+
+def seed(volume: str, seed: int, path: str) -> None:
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_throughput.py"),
+               "--volume", volume, "--seed", str(seed), "--runs", "1", "--scenarios", "full",
+               "--dump", path, "--out", os.devnull]
+    proc = subprocess.run(command, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Seeding the table failed:\n{proc.stderr}")
+
+
+def clear_caches(cache: Any) -> None:
+    # The generation stays known, as it would in a warm container
+    cache.responses.clear()
+    cache.blobs.clear()
+    cache.search.clear()
+
+
+def call(main: Any, event: Dict[str, Any]) -> Tuple[float, int]:
+    started = time.perf_counter()
+    response = main.handler(event, None)
+    return (time.perf_counter() - started) * 1000, response.get("statusCode", 0)
+
+
+def measure(main: Any, cache: Any, fake: FakeDynamoDB, path: str, query: Dict[str, str],
+            requests: int, uncached_requests: int) -> Dict[str, Any]:
+    event = http_event("GET", path, query)
+    # The first request imports whatever the route needs; that is cold_start.py's job
+    _, status = call(main, event)
+    if status != 200:
+        raise RuntimeError(f"GET {path} {query} answered {status}")
+    cached = [call(main, event)[0] for _ in range(requests)]
+
+    uncached: List[float] = []
+    fake.reset_stats()
+    for _ in range(uncached_requests):
+        clear_caches(cache)
+        uncached.append(call(main, event)[0])
+    reads = fake.stats()
+    clear_caches(cache)
+    return {
+        "path": path,
+        "query": query,
+        "cached_ms": summarize(cached),
+        "uncached_ms": summarize(uncached),
+        "dynamodb_per_request": {
+            "calls": round(reads["calls"] / uncached_requests, 2),
+            "read_units": round(reads["read_units"] / uncached_requests, 2),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--volume", choices=list(VOLUMES), default="medium")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--table", help="a table written by ingest_throughput.py --dump, instead of seeding one")
+    parser.add_argument("--requests", type=int, default=200, help="cached requests per route")
+    parser.add_argument("--uncached-requests", type=int, default=50)
+    parser.add_argument("--routes", nargs="+", choices=[name for name, _, _ in ROUTES], help="default: all")
+    parser.add_argument("--ddb-latency-ms", type=float, default=0.0, help="added to every DynamoDB call")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    fake = FakeDynamoDB(args.ddb_latency_ms)
+    table: Optional[str] = args.table
+    with tempfile.TemporaryDirectory() as scratch:
+        if table is None:
+            log(f"seeding a {args.volume} table")
+            table = os.path.join(scratch, "table.pickle")
+            seed(args.volume, args.seed, table)
+        fake.load(table)
+    offline_env()
+    fake.install()
+    use_lambda(API_DIR)
+    import cache
+    import main as api
+
+    report: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "volume": "table" if args.table else args.volume,
+        "requests": args.requests,
+        "uncached_requests": args.uncached_requests,
+        "ddb_latency_ms": args.ddb_latency_ms,
+        "items": fake.stats()["items"],
+        "routes": {},
+        "headline": {},
+    }
+    for name, path, query in ROUTES:
+        if args.routes and name not in args.routes:
+            continue
+        result = measure(api, cache, fake, path, query, args.requests, args.uncached_requests)
+        report["routes"][name] = result
+        for kind in ("cached", "uncached"):
+            for q in ("p50", "p99"):
+                report["headline"][f"api.{report['volume']}.{name}.{kind}.{q}_ms"] = result[f"{kind}_ms"][q]
+        log(f"{name:<20} cached p50 {result['cached_ms']['p50']:>7.2f} p99 {result['cached_ms']['p99']:>7.2f} ms  "
+            f"uncached p50 {result['uncached_ms']['p50']:>7.2f} p99 {result['uncached_ms']['p99']:>7.2f} ms  "
+            f"{result['dynamodb_per_request']['calls']:>5} calls")
+
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Checksum cost against the size of a title's structure tree.
+
+Builds synthetic structure documents of increasing size and times ingest's
+two ways of turning one into hashed nodes:
+
+- stream: structure_stream.iter_json_tree over the raw bytes, split into
+  parse and checksum time, as the ingest pipeline runs it
+- tree: json.loads and then merkle.iter_tree over the parsed document
+
+Reports nodes, bytes, time, ns per node and MB/s for each, and checks the
+two agree on the root checksum, which covers every node below it.
+
+    python benchmarks/checksum_cost.py [--sizes xs s m l] [--runs 5] [--memory] [--out result.json]
+
+--memory adds one traced pass per size for peak allocation, which is slow.
+"""
+import argparse
+import io
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from common import INGEST_DIR, log, summarize, use_lambda, write_report
+from ecfr_server import SyntheticEcfr
+
+# chapters, parts per chapter, sections per part, all in one title
+SIZES = {
+    "xs": (1, 2, 5),
+    "s": (2, 5, 10),
+    "m": (4, 10, 25),
+    "l": (8, 20, 50),
+    "xl": (16, 25, 100),
+}
+
+
+def stream(body: bytes) -> Dict[str, Any]:
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    nodes = 0
+    root = ""
+    for node in structure_stream.iter_json_tree(io.BytesIO(body), timings):
+        nodes += 1
+        root = node.checksum
+    return {"ms": (time.perf_counter() - started) * 1000, "nodes": nodes, "root": root,
+            "parse_ms": timings.get("parse", 0.0) * 1000, "checksum_ms": timings.get("checksum", 0.0) * 1000}
+
+
+def tree(body: bytes) -> Dict[str, Any]:
+    started = time.perf_counter()
+    document = json.loads(body)
+    loaded = time.perf_counter()
+    nodes = 0
+    root = ""
+    for node in merkle.iter_tree(document):
+        nodes += 1
+        root = node.checksum
+    return {"ms": (time.perf_counter() - started) * 1000, "nodes": nodes, "root": root,
+            "parse_ms": (loaded - started) * 1000, "walk_ms": (time.perf_counter() - loaded) * 1000}
+
+
+def peak_kb(run: Callable[[bytes], Any], body: bytes) -> float:
+    tracemalloc.start()
+    try:
+        run(body)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def measure(run: Callable[[bytes], Dict[str, Any]], body: bytes, runs: int) -> Dict[str, Any]:
+    run(body)  # warm up
+    samples = [run(body) for _ in range(runs)]
+    nodes = samples[-1]["nodes"]
+    ms = summarize([s["ms"] for s in samples])
+    result: Dict[str, Any] = {
+        "ms": ms,
+        "ns_per_node": round(ms["p50"] * 1e6 / nodes, 1),
+        "mb_per_s": round(len(body) / 1e6 / (ms["p50"] / 1000), 2),
+    }
+    for part in ("parse_ms", "checksum_ms", "walk_ms"):
+        if part in samples[-1]:
+            result[part] = round(sorted(s[part] for s in samples)[len(samples) // 2], 3)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["xs", "s", "m", "l"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--memory", action="store_true", help="also trace peak allocation per size")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"python": sys.version.split()[0], "runs": args.runs, "results": [], "headline": {}}
+    for size in args.sizes:
+        chapters, parts, sections = SIZES[size]
+        body = SyntheticEcfr(1, chapters, parts, sections, seed=args.seed).structure(1)
+        streamed, parsed = stream(body), tree(body)
+        if (streamed["nodes"], streamed["root"]) != (parsed["nodes"], parsed["root"]):
+            raise RuntimeError(f"{size}: iter_json_tree and iter_tree disagree on the root checksum")
+        entry: Dict[str, Any] = {
+            "size": size,
+            "shape": {"chapters": chapters, "parts": parts, "sections": sections},
+            "nodes": streamed["nodes"],
+            "bytes": len(body),
+            "stream": measure(stream, body, args.runs),
+            "tree": measure(tree, body, args.runs),
+        }
+        if args.memory:
+            entry["stream"]["peak_kb"] = peak_kb(stream, body)
+            entry["tree"]["peak_kb"] = peak_kb(tree, body)
+        report["results"].append(entry)
+        report["headline"][f"checksum.{size}.stream.ns_per_node"] = entry["stream"]["ns_per_node"]
+        report["headline"][f"checksum.{size}.tree.ns_per_node"] = entry["tree"]["ns_per_node"]
+        log(f"{size:<3} {entry['nodes']:>7} nodes {len(body) / 1e6:>7.2f} MB  "
+            f"stream {entry['stream']['ms']['p50']:>8.1f} ms ({entry['stream']['checksum_ms']:.1f} hashing)  "
+            f"tree {entry['tree']['ms']['p50']:>8.1f} ms")
+
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    use_lambda(INGEST_DIR)
+    import merkle
+    import structure_stream
+    main()
@@ -0,0 +1,140 @@
+"""Cold-start benchmark for the API Lambda.
+
+Every sample runs in a fresh interpreter, so module imports are paid exactly as
+on a new Lambda container. Reports import time of each entry point and the
+time to answer the first request through main.handler.
+
+    python benchmarks/cold_start.py [--runs 20] [--with-dynamodb] [--out result.json]
+
+Routes that read DynamoDB are only measured with --with-dynamodb, against the
+table in DDB_TABLE using the ambient AWS credentials.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambdas", "api_lambda")
+TOKEN = "cold-start-benchmark"
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+module = __import__(sys.argv[1])
+t1 = time.perf_counter()
+result = {"import_ms": (t1 - t0) * 1000}
+event = json.loads(sys.argv[2])
+if event:
+    response = module.handler(event, None)
+    result["request_ms"] = (time.perf_counter() - t1) * 1000
+    result["status"] = response.get("statusCode")
+result["modules"] = len(sys.modules)
+print(json.dumps(result))
+"""
+
+
+def http_event(method: str, path: str, query: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    # API Gateway HTTP API, payload format 2.0
+    query = query or {}
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "&".join(f"{k}={v}" for k, v in query.items()),
+        "queryStringParameters": query or None,
+        "headers": {"host": "benchmark.local", "x-api-key": TOKEN},
+        "requestContext": {
+            "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "benchmark"},
+            "stage": "$default",
+            "requestId": "benchmark",
+        },
+        "isBase64Encoded": False,
+        "body": None,
+    }
+
+
+def scenarios(with_dynamodb: bool) -> List[Dict[str, Any]]:
+    cases = [
+        {"name": "import main", "module": "main", "event": None},
+        {"name": "import app (FastAPI)", "module": "app", "event": None},
+        {"name": "GET /health (fast path)", "module": "main", "event": http_event("GET", "/health")},
+        {"name": "GET / (FastAPI fallback)", "module": "main", "event": http_event("GET", "/")},
+    ]
+    if with_dynamodb:
+        cases += [
+            {"name": "GET /agencies?format=json (fast path)", "module": "main",
+             "event": http_event("GET", "/agencies", {"format": "json", "limit": "25"})},
+            {"name": "GET /agencies (FastAPI, HTML)", "module": "main",
+             "event": http_event("GET", "/agencies", {"limit": "25"})},
+        ]
+    return cases
+
+
+def run_once(module: str, event: Optional[Dict[str, Any]], env: Dict[str, str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, module, json.dumps(event)],
+        cwd=API_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{module} failed:\n{proc.stderr}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50": round(statistics.median(ordered), 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "min": round(ordered[0], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--with-dynamodb", action="store_true")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DDB_TABLE", "cold-start-benchmark")
+    env.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    env["API_AUTH_TOKEN"] = TOKEN
+
+    report = {"python": sys.version.split()[0], "runs": args.runs, "results": []}
+    for case in scenarios(args.with_dynamodb):
+        # One discarded run writes the bytecode the deployed zip ships with
+        run_once(case["module"], case["event"], env)
+        samples = [run_once(case["module"], case["event"], env) for _ in range(args.runs)]
+        entry = {
+            "name": case["name"],
+            "import_ms": summarize([s["import_ms"] for s in samples]),
+            "process_ms": summarize([s["process_ms"] for s in samples]),
+            "modules": samples[-1]["modules"],
+        }
+        if case["event"]:
+            entry["request_ms"] = summarize([s["request_ms"] for s in samples])
+            entry["status"] = samples[-1]["status"]
+        report["results"].append(entry)
+        print(f"{case['name']:<40} import p50 {entry['import_ms']['p50']:>8.1f} ms"
+              + (f"  first request p50 {entry['request_ms']['p50']:>8.1f} ms" if case["event"] else ""),
+              file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
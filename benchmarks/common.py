@@ -0,0 +1,90 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import statistics
+import sys
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+API_DIR = os.path.join(ROOT, "lambdas", "api_lambda")
+INGEST_DIR = os.path.join(ROOT, "lambdas", "ingest_lambda")
+TOKEN = "benchmark"
+TABLE = "ecfr-benchmark"
+
+
+def use_lambda(directory: str) -> None:
+    # The two Lambdas share module names (app, search_index, structure_blob),
+    # so a benchmark process imports from exactly one of them
+    other = API_DIR if directory == INGEST_DIR else INGEST_DIR
+    if other in sys.path:
+        raise RuntimeError(f"{other} is already importable in this process")
+    sys.path.insert(0, directory)
+
+
+def offline_env(**overrides: str) -> None:
+    # Everything boto3 needs to build clients without touching AWS; the
+    # DynamoDB stand-in answers before any request is signed or sent
+    os.environ.update({
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_ACCESS_KEY_ID": "benchmark",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+        "AWS_ACCOUNT_ID_ENDPOINT_MODE": "disabled",
+        "AWS_EC2_METADATA_DISABLED": "true",
+        "DDB_TABLE": TABLE,
+        "API_AUTH_TOKEN": TOKEN,
+        # EMF lines would be most of the output and a share of the time
+        "METRICS_LOGS": "false",
+        **overrides,
+    })
+
+
+def http_event(method: str, path: str, query: Optional[Dict[str, str]] = None,
+               headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    # API Gateway HTTP API, payload format 2.0
+    query = query or {}
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "&".join(f"{k}={v}" for k, v in query.items()),
+        "queryStringParameters": query or None,
+        "headers": {"host": "benchmark.local", "x-api-key": TOKEN, **(headers or {})},
+        "requestContext": {
+            "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "benchmark"},
+            "stage": "$default",
+            "requestId": "benchmark",
+        },
+        "isBase64Encoded": False,
+        "body": None,
+    }
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    # Nearest rank on an already sorted list
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50": round(statistics.median(ordered), 3),
+        "p90": round(percentile(ordered, 0.90), 3),
+        "p99": round(percentile(ordered, 0.99), 3),
+        "min": round(ordered[0], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def write_report(report: Dict[str, Any], out: Optional[str]) -> None:
+    output = json.dumps(report, indent=2, default=str)
+    if out:
+        with open(out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def log(message: str) -> None:
+    # Progress goes to stderr so stdout stays a clean JSON report
+    print(message, file=sys.stderr, flush=True)
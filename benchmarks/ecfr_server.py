@@ -0,0 +1,364 @@
+"""Local stand-in for the eCFR API.
+
+Serves the endpoints ingest reads (admin/v1/agencies.json,
+versioner/v1/titles.json and versioner/v1/structure/<date>/title-<n>.json)
+from one of two sources:
+
+- SyntheticEcfr generates them from a seed at a chosen volume. Every title
+  is title > chapter > subchapter > part > subpart > section, and every chapter
+  has an agency referencing it. Bumping `revision` edits a deterministic
+  fraction of the titles, which is what an incremental ingest has to find.
+- ReplayEcfr serves payloads recorded from the real API, stored under the
+  request path, e.g. DIR/versioner/v1/titles.json. Structure files are matched
+  on the title alone, whatever date is asked for:
+
+      wget -x -nH --cut-dirs=1 -P DIR https://www.ecfr.gov/api/versioner/v1/titles.json
+
+Responses carry an ETag and answer If-None-Match with 304, so ingest's
+download cache (ECFR_CACHE) revalidates the way it does against eCFR.
+
+    python benchmarks/ecfr_server.py --volume small --port 8765
+    ECFR_BASE_URL=http://127.0.0.1:8765/api python lambdas/ingest_lambda/local_runner.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# titles x chapters x parts per chapter x sections per part
+VOLUMES = {
+    "tiny": (2, 2, 2, 5),
+    "small": (4, 2, 5, 10),
+    "medium": (10, 3, 10, 25),
+    "large": (20, 4, 20, 50),
+}
+DATE = "2025-01-06"
+REVISED_DATE = "2025-02-03"
+ROMAN = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII"]
+WORDS = (
+    "accounting acquisition administrative agency air allowance amendments application approval assistance "
+    "authority benefits certification chemical civil claims classification coastal compliance construction "
+    "contracts control cooperative credit crop customs definitions determination disclosure disposal "
+    "education eligibility emergency emission employment energy enforcement environmental equipment "
+    "examination export facilities federal fees financial fisheries food forest funds general grants "
+    "hazardous health hearings housing identification import information inspection insurance investigation "
+    "labeling land licensing loans management marketing materials medical mining monitoring national "
+    "navigation notice nuclear occupational operations organization payments permits personnel pesticides "
+    "petroleum plans pollution practice procedures program protection public quality radiation records "
+    "recovery registration reporting requirements research reserve review safety sanitation security "
+    "standards state storage substances surveillance taxation testing trade transportation treatment "
+    "vessels veterans waste water wildlife"
+).split()
+
+
+class SyntheticEcfr:
+    """Deterministic eCFR payloads at a given volume."""
+
+    def __init__(self, titles: int, chapters: int, parts: int, sections: int,
+                 seed: int = 1, revision: int = 0, changed: float = 0.1):
+        self.shape = (titles, chapters, parts, sections)
+        self.seed = seed
+        self.revision = revision
+        self.changed = changed
+        self._structures: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def volume(cls, name: str, **kwargs: Any) -> "SyntheticEcfr":
+        return cls(*VOLUMES[name], **kwargs)
+
+    def numbers(self) -> List[int]:
+        return list(range(1, self.shape[0] + 1))
+
+    def revised(self, number: int) -> bool:
+        # Titles edited in the current revision. Each revision picks its own.
+        if not self.revision:
+            return False
+        rng = random.Random(f"{self.seed}/{self.revision}/{number}")
+        return rng.random() < self.changed or number == 1 + self.revision % self.shape[0]
+
+    def description(self, rng: random.Random, words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    def agencies(self) -> Dict[str, Any]:
+        titles, chapters, _, _ = self.shape
+        agencies = []
+        for number in self.numbers():
+            for c in range(chapters):
+                rng = random.Random(f"{self.seed}/agency/{number}/{c}")
+                name = f"Office of {self.description(rng, 2)}"
+                slug = f"office-{number}-{c + 1}"
+                agency = {
+                    "name": name,
+                    "short_name": f"O{number}{c + 1}",
+                    "display_name": name,
+                    "sortable_name": name,
+                    "slug": slug,
+                    "children": [],
+                    "cfr_references": [{"title": number, "chapter": ROMAN[c]}],
+                }
+                # Every third agency has a sub-agency that regulates one part
+                if c % 3 == 2:
+                    agency["children"].append({
+                        "name": f"{name} Bureau", "short_name": "", "display_name": f"{name} Bureau",
+                        "sortable_name": f"{name} Bureau", "slug": f"{slug}-bureau", "children": [],
+                        "cfr_references": [{"title": number, "part": str(self.part_number(number, c, 0))}],
+                    })
+                agencies.append(agency)
+        return {"agencies": agencies}
+
+    def titles(self) -> Dict[str, Any]:
+        entries = []
+        for number in self.numbers():
+            rng = random.Random(f"{self.seed}/title/{number}")
+            date = REVISED_DATE if self.revised(number) else DATE
+            entries.append({
+                "number": number,
+                "name": self.description(rng, 3),
+                "latest_amended_on": date,
+                "latest_issue_date": date,
+                "up_to_date_as_of": date,
+                "reserved": False,
+            })
+        # Reserved titles have no structure; ingest must skip them
+        entries.append({"number": self.shape[0] + 1, "name": "[Reserved]", "latest_amended_on": None,
+                        "latest_issue_date": None, "up_to_date_as_of": None, "reserved": True})
+        return {"titles": entries, "meta": {"date": DATE, "import_in_progress": False}}
+
+    def part_number(self, number: int, chapter: int, part: int) -> int:
+        return (chapter * self.shape[2] + part + 1) * 10
+
+    def structure(self, number: int) -> Optional[bytes]:
+        if number not in self.numbers():
+            return None
+        with self._lock:
+            if number not in self._structures:
+                self._structures[number] = json.dumps(self._title(number)).encode("utf-8")
+            return self._structures[number]
+
+    def _title(self, number: int) -> Dict[str, Any]:
+        _, chapters, parts, sections = self.shape
+        rng = random.Random(f"{self.seed}/structure/{number}")
+        # The one section this revision edits, if the title changed
+        edit = None
+        if self.revised(number):
+            edit_rng = random.Random(f"{self.seed}/edit/{self.revision}/{number}")
+            edit = (edit_rng.randrange(chapters), edit_rng.randrange(parts), edit_rng.randrange(sections))
+
+        def node(node_type: str, identifier: str, label: str, level: str, description: str,
+                 children: Optional[List[Dict[str, Any]]] = None, size: int = 0) -> Dict[str, Any]:
+            out = {
+                "identifier": identifier,
+                "label": f"{label} - {description}" if description else label,
+                "label_level": level,
+                "label_description": description,
+                "reserved": False,
+                "type": node_type,
+            }
+            if children is not None:
+                out["size"] = sum(child.get("size", 0) for child in children)
+                out["children"] = children
+            else:
+                out["size"] = size
+            return out
+
+        chapter_nodes = []
+        for c in range(chapters):
+            subchapters = []
+            for s, letter in enumerate("AB"):
+                part_nodes = []
+                for p in range(s * parts // 2, (s + 1) * parts // 2 if s == 0 else parts):
+                    part = self.part_number(number, c, p)
+                    subparts = []
+                    for sp, sp_letter in enumerate("AB"):
+                        section_nodes = []
+                        for n in range(sp * sections // 2, (sp + 1) * sections // 2 if sp == 0 else sections):
+                            identifier = f"{part}.{n + 1}"
+                            description = self.description(rng, rng.randint(2, 7))
+                            size = rng.randint(400, 24000)
+                            if edit == (c, p, n):
+                                description += f" (revision {self.revision})"
+                                size += 100 * self.revision
+                            section_nodes.append(node("section", identifier, f"§ {identifier}", f"§ {identifier}",
+                                                      description, size=size))
+                        subparts.append(node("subpart", sp_letter, f"Subpart {sp_letter}", f"Subpart {sp_letter}",
+                                             self.description(rng, 3), section_nodes))
+                    part_nodes.append(node("part", str(part), f"Part {part}", f"Part {part}",
+                                           self.description(rng, 4), subparts))
+                subchapters.append(node("subchapter", letter, f"Subchapter {letter}", f"Subchapter {letter}",
+                                        self.description(rng, 3), part_nodes))
+            chapter_nodes.append(node("chapter", ROMAN[c], f"Chapter {ROMAN[c]}", f"Chapter {ROMAN[c]}",
+                                      self.description(rng, 4), subchapters))
+        return node("title", str(number), f"Title {number}", f"Title {number}",
+                    self.description(random.Random(f"{self.seed}/title/{number}"), 3), chapter_nodes)
+
+    def describe(self) -> Dict[str, Any]:
+        titles, chapters, parts, sections = self.shape
+        return {
+            "titles": titles,
+            "sections": titles * chapters * parts * sections,
+            # title + chapters + 2 subchapters each + parts + 2 subparts each + sections
+            "nodes_per_title": 1 + chapters * (1 + 2 + parts * (1 + 2 + sections)),
+            "seed": self.seed,
+            "revision": self.revision,
+        }
+
+    def get(self, path: str) -> Optional[bytes]:
+        if path == "admin/v1/agencies.json":
+            return json.dumps(self.agencies()).encode("utf-8")
+        if path == "versioner/v1/titles.json":
+            return json.dumps(self.titles()).encode("utf-8")
+        match = STRUCTURE_PATH.match(path)
+        if match:
+            return self.structure(int(match.group(1)))
+        return None
+
+    def prepare(self) -> "SyntheticEcfr":
+        # Generates every payload up front, so generation isn't timed as fetching
+        for number in self.numbers():
+            self.structure(number)
+        return self
+
+
+STRUCTURE_PATH = re.compile(r"^versioner/v1/structure/[\d-]+/title-(\d+)\.json$")
+
+
+class ReplayEcfr:
+    """Recorded eCFR responses, read from a directory laid out like the API."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._structures: Dict[int, str] = {}
+        structure_dir = os.path.join(directory, "versioner", "v1", "structure")
+        for root, _, files in os.walk(structure_dir):
+            for name in files:
+                match = re.match(r"^title-(\d+)\.json$", name)
+                if match:
+                    self._structures[int(match.group(1))] = os.path.join(root, name)
+
+    def get(self, path: str) -> Optional[bytes]:
+        match = STRUCTURE_PATH.match(path)
+        file_path = self._structures.get(int(match.group(1))) if match else os.path.join(self.directory, *path.split("/"))
+        if not file_path or not os.path.isfile(file_path):
+            return None
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    def describe(self) -> Dict[str, Any]:
+        return {"replay": self.directory, "titles": len(self._structures)}
+
+    def prepare(self) -> "ReplayEcfr":
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like eCFR
+
+    def do_GET(self) -> None:
+        server: EcfrServer = self.server  # type: ignore[assignment]
+        path = self.path.split("?", 1)[0]
+        if path.startswith(server.prefix):
+            path = path[len(server.prefix):]
+        if server.latency:
+            time.sleep(server.latency)
+        body = server.source.get(path)
+        server.count(path, body)
+        if body is None:
+            self._send(404, b'{"error": "not found"}')
+            return
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", {"ETag": etag})
+            return
+        self._send(200, body, {"ETag": etag})
+
+    def _send(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class EcfrServer(ThreadingHTTPServer):
+    """Threaded HTTP server for a source; `source` can be swapped between runs."""
+
+    daemon_threads = True
+
+    def __init__(self, source: Any, port: int = 0, latency_ms: float = 0.0, prefix: str = "/api/"):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.source = source
+        self.latency = latency_ms / 1000
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{self.prefix.rstrip('/')}"
+
+    def count(self, path: str, body: Optional[bytes]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += len(body or b"")
+            if body is None:
+                self.not_found.append(path)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.not_found: List[str] = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests, "bytes": self.bytes_sent, "not_found": list(self.not_found[:10])}
+
+    def start(self) -> "EcfrServer":
+        threading.Thread(target=self.serve_forever, name="ecfr-server", daemon=True).start()
+        return self
+
+
+def source_from_args(args: argparse.Namespace) -> Any:
+    if args.replay:
+        return ReplayEcfr(args.replay)
+    return SyntheticEcfr.volume(args.volume, seed=args.seed)
+
+
+def add_source_args(parser: argparse.ArgumentParser, several: bool = False) -> None:
+    # With `several`, --volume takes a list and defaults to ["small"]
+    parser.add_argument("--volume", choices=sorted(VOLUMES, key=lambda v: VOLUMES[v]),
+                        nargs="+" if several else None, default=["small"] if several else "small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--replay", help="directory of recorded eCFR responses; overrides --volume")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_source_args(parser)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every response")
+    args = parser.parse_args()
+    source = source_from_args(args).prepare()
+    server = EcfrServer(source, args.port, args.latency_ms)
+    print(json.dumps({"base_url": server.base_url, **source.describe()}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
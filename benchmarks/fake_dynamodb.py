@@ -0,0 +1,919 @@
+"""In-memory DynamoDB for the offline benchmarks.
+
+Calls are answered inside botocore: a before-call hook on the default boto3
+session returns the response, so nothing is signed or sent, while everything
+above it runs exactly as against the real service. That covers the boto3
+resources and their type (de)serialization, the ingest BatchWriter's client
+calls, and the telemetry hooks, which see a ConsumedCapacity estimated with
+DynamoDB's rounding rules (1 KB per write unit, 4 KB per read unit, half for
+eventually consistent reads).
+
+Supports the calls the Lambdas make: GetItem, PutItem, UpdateItem,
+DeleteItem, Query, Scan, BatchGetItem and BatchWriteItem, with key
+condition, filter, condition, projection and update expressions over
+top-level attributes. Query pages stop at 1 MB like the real service.
+
+    fake = FakeDynamoDB(latency_ms=0)
+    fake.create_table("ecfr-benchmark")
+    fake.install()  # before the code under test creates its boto3 resources
+"""
+import base64
+import json
+import math
+import pickle
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+AttributeValue = Dict[str, Any]
+Item = Dict[str, AttributeValue]
+
+# Mirrors infra/dynamo.tf. An index projection of None means ALL.
+SCHEMA = {
+    "hash": "pk",
+    "range": "sk",
+    "indexes": {
+        "list-index": {
+            "hash": "list_type",
+            "range": "sk",
+            "projection": ("entity_type", "name", "short_name", "display_name", "slug", "cfr_references", "number",
+                           "latest_amended_on", "latest_issue_date", "up_to_date_as_of", "reserved", "updated_date",
+                           "checksum", "agency_slug", "agency_name", "title_number", "chapter"),
+        },
+        "level-index": {
+            "hash": "pk",
+            "range": "level_key",
+            "projection": ("entity_type", "identifier", "label", "label_level", "label_description",
+                           "reserved", "size", "path", "depth"),
+        },
+    },
+}
+PAGE_BYTES = 1024 * 1024
+WRITE_UNIT_BYTES = 1024
+READ_UNIT_BYTES = 4096
+
+
+class DynamoError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+# --- attribute values ---
+
+def _decode(value: AttributeValue) -> AttributeValue:
+    # Binary values arrive base64 encoded in the JSON request body; botocore's
+    # response parser hands them to boto3 as bytes
+    if "S" in value or "N" in value:
+        return value
+    kind, inner = next(iter(value.items()))
+    if kind == "B":
+        return {"B": base64.b64decode(inner)}
+    if kind == "BS":
+        return {"BS": [base64.b64decode(v) for v in inner]}
+    if kind == "L":
+        return {"L": [_decode(v) for v in inner]}
+    if kind == "M":
+        return {"M": {k: _decode(v) for k, v in inner.items()}}
+    return value
+
+
+def _decode_item(item: Item) -> Item:
+    return {name: _decode(value) for name, value in item.items()}
+
+
+def _plain(value: AttributeValue) -> Any:
+    if "S" in value:
+        return value["S"]
+    kind, inner = next(iter(value.items()))
+    if kind == "N":
+        return Decimal(inner)
+    if kind in ("SS", "BS"):
+        return frozenset(inner)
+    if kind == "NS":
+        return frozenset(Decimal(v) for v in inner)
+    if kind == "L":
+        return [_plain(v) for v in inner]
+    if kind == "M":
+        return {k: _plain(v) for k, v in inner.items()}
+    return None if kind == "NULL" else inner
+
+
+def _size(value: AttributeValue) -> int:
+    # DynamoDB's item size accounting, close enough for capacity estimates
+    if "S" in value:
+        return len(value["S"].encode("utf-8"))
+    kind, inner = next(iter(value.items()))
+    if kind == "N":
+        return (len(inner.lstrip("-").replace(".", "")) + 1) // 2 + 1
+    if kind == "B":
+        return len(inner)
+    if kind == "SS":
+        return sum(len(v.encode("utf-8")) for v in inner)
+    if kind == "NS":
+        return sum(_size({"N": v}) for v in inner)
+    if kind == "BS":
+        return sum(len(v) for v in inner)
+    if kind == "L":
+        return 3 + sum(1 + _size(v) for v in inner)
+    if kind == "M":
+        return 3 + sum(len(k.encode("utf-8")) + 1 + _size(v) for k, v in inner.items())
+    return 1
+
+
+def item_size(item: Item) -> int:
+    return sum(len(name.encode("utf-8")) + _size(value) for name, value in item.items())
+
+
+def _compare(left: Optional[AttributeValue], right: Optional[AttributeValue]) -> Optional[int]:
+    # None when the two can't be ordered: a missing attribute or mixed types
+    if left is None or right is None:
+        return None
+    (lkind, lvalue), = left.items()
+    (rkind, rvalue), = right.items()
+    if lkind != rkind:
+        return None
+    if lkind == "N":
+        lvalue, rvalue = Decimal(lvalue), Decimal(rvalue)
+    elif lkind not in ("S", "B"):
+        return 0 if _plain(left) == _plain(right) else None
+    return (lvalue > rvalue) - (lvalue < rvalue)
+
+
+def _equal(left: Optional[AttributeValue], right: Optional[AttributeValue]) -> bool:
+    return left is not None and right is not None and next(iter(left)) == next(iter(right)) and _plain(left) == _plain(right)
+
+
+def _number(value: Decimal) -> AttributeValue:
+    text = format(value.normalize(), "f") if value == value.to_integral_value() else str(value)
+    return {"N": text}
+
+
+# --- expressions ---
+
+_TOKEN = re.compile(r"\s*(<>|<=|>=|[=<>(),+\-]|[#:]?[A-Za-z_][A-Za-z0-9_]*)")
+_COMPARATORS = {
+    "=": lambda c: c == 0,
+    "<": lambda c: c < 0,
+    "<=": lambda c: c <= 0,
+    ">": lambda c: c > 0,
+    ">=": lambda c: c >= 0,
+}
+Operand = Callable[[Item], Optional[AttributeValue]]
+Condition = Callable[[Item], bool]
+
+
+class _Expression:
+    """Recursive-descent parser for DynamoDB expressions over top-level
+    attributes. While parsing a key condition it records the equality and
+    range bounds a query uses to find its slice of the index."""
+
+    def __init__(self, text: str, names: Dict[str, str], values: Dict[str, AttributeValue]):
+        self.tokens: List[str] = []
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = _TOKEN.match(text, position)
+            if not match:
+                raise DynamoError("ValidationException", f"Invalid expression near {text[position:]!r}")
+            self.tokens.append(match.group(1))
+            position = match.end()
+        self.position = 0
+        self.names = names
+        self.values = values
+        self.equals: Dict[str, AttributeValue] = {}
+        self.bounds: Dict[str, Tuple[str, List[AttributeValue]]] = {}
+
+    def peek(self, offset: int = 0) -> Optional[str]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def take(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token.upper() != expected):
+            raise DynamoError("ValidationException", f"Expected {expected or 'a token'}, got {token!r}")
+        self.position += 1
+        return token
+
+    def keyword(self, word: str) -> bool:
+        token = self.peek()
+        if token is not None and token.upper() == word:
+            self.position += 1
+            return True
+        return False
+
+    def done(self) -> None:
+        if self.peek() is not None:
+            raise DynamoError("ValidationException", f"Unexpected {self.peek()!r} in expression")
+
+    def path(self) -> str:
+        token = self.take()
+        if token.startswith("#"):
+            if token not in self.names:
+                raise DynamoError("ValidationException", f"Undefined attribute name {token}")
+            return self.names[token]
+        if token.startswith(":") or not token[0].isalpha():
+            raise DynamoError("ValidationException", f"Expected an attribute, got {token!r}")
+        return token
+
+    def value(self) -> AttributeValue:
+        token = self.take()
+        if token not in self.values:
+            raise DynamoError("ValidationException", f"Undefined attribute value {token}")
+        return self.values[token]
+
+    def operand(self) -> Tuple[Operand, Optional[str]]:
+        # The operand and, for a bare attribute, its name
+        token = self.peek()
+        if token is not None and token.startswith(":"):
+            value = self.value()
+            return (lambda item: value), None
+        if token is not None and token.lower() == "size" and self.peek(1) == "(":
+            self.take()
+            self.take("(")
+            name = self.path()
+            self.take(")")
+
+            def size(item: Item) -> Optional[AttributeValue]:
+                value = item.get(name)
+                if value is None:
+                    return None
+                kind, inner = next(iter(value.items()))
+                return {"N": str(len(inner) if kind != "N" else _size(value))}
+            return size, None
+        name = self.path()
+        return (lambda item: item.get(name)), name
+
+    # Conditions
+
+    def condition(self) -> Condition:
+        left = self.conjunction()
+        while self.keyword("OR"):
+            left = (lambda a, b: lambda item: a(item) or b(item))(left, self.conjunction())
+        return left
+
+    def conjunction(self) -> Condition:
+        left = self.negation()
+        while self.keyword("AND"):
+            left = (lambda a, b: lambda item: a(item) and b(item))(left, self.negation())
+        return left
+
+    def negation(self) -> Condition:
+        if self.keyword("NOT"):
+            inner = self.negation()
+            return lambda item: not inner(item)
+        return self.comparison()
+
+    def comparison(self) -> Condition:
+        token = self.peek()
+        if token == "(":
+            self.take()
+            inner = self.condition()
+            self.take(")")
+            return inner
+        if token is not None and self.peek(1) == "(" and token.lower() in (
+                "attribute_exists", "attribute_not_exists", "attribute_type", "begins_with", "contains"):
+            return self.function(self.take().lower())
+        left, name = self.operand()
+        operator = self.take()
+        if operator in _COMPARATORS:
+            right, _ = self.operand()
+            if operator == "=" and name:
+                self.equals[name] = right({})
+            if name:
+                self.bounds.setdefault(name, (operator, [right({})]))
+            test = _COMPARATORS[operator]
+            return lambda item: (lambda c: c is not None and test(c))(_compare(left(item), right(item)))
+        if operator == "<>":
+            right, _ = self.operand()
+            # A missing attribute is "not equal" to anything
+            return lambda item: not _equal(left(item), right(item))
+        if operator.upper() == "BETWEEN":
+            low, _ = self.operand()
+            self.take("AND")
+            high, _ = self.operand()
+            if name:
+                self.bounds[name] = ("BETWEEN", [low({}), high({})])
+
+            def between(item: Item) -> bool:
+                below, above = _compare(low(item), left(item)), _compare(left(item), high(item))
+                return below is not None and above is not None and below <= 0 and above <= 0
+            return between
+        if operator.upper() == "IN":
+            self.take("(")
+            options = [self.operand()[0]]
+            while self.peek() == ",":
+                self.take()
+                options.append(self.operand()[0])
+            self.take(")")
+            return lambda item: any(_equal(left(item), option(item)) for option in options)
+        raise DynamoError("ValidationException", f"Unsupported operator {operator!r}")
+
+    def function(self, name: str) -> Condition:
+        self.take("(")
+        attribute = self.path()
+        argument = None
+        if self.peek() == ",":
+            self.take()
+            argument = self.operand()[0]
+        self.take(")")
+        if name == "attribute_exists":
+            return lambda item: attribute in item
+        if name == "attribute_not_exists":
+            return lambda item: attribute not in item
+        if name == "attribute_type":
+            return lambda item: attribute in item and next(iter(item[attribute])) == _plain(argument({}))
+        if name == "begins_with":
+            prefix = argument({})
+            self.bounds[attribute] = ("begins_with", [prefix])
+
+            def begins_with(item: Item) -> bool:
+                value = item.get(attribute)
+                return value is not None and next(iter(value)) == next(iter(prefix)) and \
+                    _plain(value).startswith(_plain(prefix))
+            return begins_with
+
+        def contains(item: Item) -> bool:
+            value, needle = item.get(attribute), argument(item)
+            if value is None or needle is None:
+                return False
+            kind = next(iter(value))
+            if kind in ("S", "B"):
+                return next(iter(needle)) == kind and _plain(needle) in _plain(value)
+            if kind == "L":
+                return any(_equal(v, needle) for v in value["L"])
+            return _plain(needle) in _plain(value)
+        return contains
+
+    # Projections and updates
+
+    def projection(self) -> List[str]:
+        names = [self.path()]
+        while self.peek() == ",":
+            self.take()
+            names.append(self.path())
+        self.done()
+        return names
+
+    def update(self) -> List[Tuple[str, str, Optional[Operand]]]:
+        actions = []
+        while self.peek() is not None:
+            clause = self.take().upper()
+            if clause not in ("SET", "REMOVE", "ADD", "DELETE"):
+                raise DynamoError("ValidationException", f"Unsupported update clause {clause!r}")
+            while True:
+                name = self.path()
+                if clause == "SET":
+                    self.take("=")
+                    actions.append((clause, name, self.set_value()))
+                elif clause == "REMOVE":
+                    actions.append((clause, name, None))
+                else:
+                    actions.append((clause, name, self.operand()[0]))
+                if self.peek() != ",":
+                    break
+                self.take()
+        return actions
+
+    def set_value(self) -> Operand:
+        left = self.set_term()
+        if self.peek() in ("+", "-"):
+            sign = 1 if self.take() == "+" else -1
+            right = self.set_term()
+
+            def arithmetic(item: Item) -> AttributeValue:
+                a, b = left(item), right(item)
+                if a is None or b is None or "N" not in a or "N" not in b:
+                    raise DynamoError("ValidationException", "Arithmetic on a missing or non-number attribute")
+                return _number(Decimal(a["N"]) + sign * Decimal(b["N"]))
+            return arithmetic
+        return left
+
+    def set_term(self) -> Operand:
+        token = (self.peek() or "").lower()
+        if token in ("if_not_exists", "list_append") and self.peek(1) == "(":
+            self.take()
+            self.take("(")
+            first, _ = self.operand()
+            self.take(",")
+            second, _ = self.operand()
+            self.take(")")
+            if token == "if_not_exists":
+                return lambda item: first(item) if first(item) is not None else second(item)
+            return lambda item: {"L": list(first(item)["L"]) + list(second(item)["L"])}
+        return self.operand()[0]
+
+
+def _apply_update(item: Item, actions: List[Tuple[str, str, Optional[Operand]]]) -> Tuple[Item, List[str]]:
+    # Every right-hand side reads the item as it was before the update
+    old = dict(item)
+    new = dict(item)
+    touched = []
+    for clause, name, operand in actions:
+        value = operand(old) if operand else None
+        if clause == "SET":
+            new[name] = value
+        elif clause == "REMOVE":
+            new.pop(name, None)
+        elif clause == "ADD":
+            current = new.get(name)
+            kind = next(iter(value))
+            if current is None:
+                new[name] = value
+            elif kind == "N":
+                new[name] = _number(Decimal(current["N"]) + Decimal(value["N"]))
+            else:
+                new[name] = {kind: sorted(set(current[kind]) | set(value[kind]))}
+        elif clause == "DELETE" and name in new:
+            kind = next(iter(value))
+            remaining = sorted(set(new[name][kind]) - set(value[kind]))
+            if remaining:
+                new[name] = {kind: remaining}
+            else:
+                del new[name]
+        touched.append(name)
+    return new, touched
+
+
+# --- tables ---
+
+class _Index:
+    """Sorted key order for the table or one of its indexes. Partitions are
+    sorted lazily, on the first read after a write."""
+
+    def __init__(self, hash_key: str, range_key: Optional[str], projection: Optional[Tuple[str, ...]], table_keys: Tuple[str, str]):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.projection = projection
+        self.table_keys = table_keys
+        self.partitions: Dict[Any, Dict[tuple, tuple]] = {}
+        self._sorted: Dict[Any, List[tuple]] = {}
+        # An index's sort position ends with the table key, which makes it unique
+        self._sort_keys = ((range_key,) if range_key else ()) + (
+            table_keys if table_keys != (hash_key, range_key) else ())
+
+    def position(self, item: Item) -> Optional[Tuple[Any, tuple]]:
+        # (partition, sort position), or None for items this index doesn't hold
+        hash_value = item.get(self.hash_key)
+        if hash_value is None or (self.range_key and self.range_key not in item):
+            return None
+        return _plain(hash_value), tuple(_plain(item[k]) for k in self._sort_keys)
+
+    def add(self, item: Item, primary: tuple) -> None:
+        position = self.position(item)
+        if position:
+            self.partitions.setdefault(position[0], {})[position[1]] = primary
+            self._sorted.pop(position[0], None)
+
+    def remove(self, item: Item) -> None:
+        position = self.position(item)
+        if position and position[0] in self.partitions:
+            partition = self.partitions[position[0]]
+            partition.pop(position[1], None)
+            if not partition:
+                del self.partitions[position[0]]
+            self._sorted.pop(position[0], None)
+
+    def ordered(self, partition: Any) -> List[tuple]:
+        if partition not in self._sorted:
+            self._sorted[partition] = sorted(self.partitions.get(partition, {}))
+        return self._sorted[partition]
+
+    def key_names(self) -> List[str]:
+        names = [self.hash_key] + ([self.range_key] if self.range_key else [])
+        return names + [k for k in self.table_keys if k not in names]
+
+    def project(self, item: Item) -> Item:
+        if self.projection is None:
+            return item
+        keep = set(self.key_names()) | set(self.projection)
+        return {k: v for k, v in item.items() if k in keep}
+
+
+class _Table:
+    def __init__(self, name: str, schema: Dict[str, Any]):
+        self.name = name
+        self.keys = (schema["hash"], schema["range"])
+        self.items: Dict[tuple, Tuple[Item, int]] = {}
+        self.primary = _Index(schema["hash"], schema["range"], None, self.keys)
+        self.indexes = {
+            index_name: _Index(index["hash"], index.get("range"), index.get("projection"), self.keys)
+            for index_name, index in schema.get("indexes", {}).items()
+        }
+
+    def key_of(self, item: Item) -> tuple:
+        try:
+            return tuple(_plain(item[k]) for k in self.keys)
+        except KeyError:
+            raise DynamoError("ValidationException", "The provided key element does not match the schema")
+
+    def get(self, key: Item) -> Optional[Tuple[Item, int]]:
+        return self.items.get(self.key_of(key))
+
+    def put(self, item: Item) -> Tuple[Optional[Item], Dict[str, float]]:
+        # Returns the replaced item and the write units per table/index
+        primary = self.key_of(item)
+        old = self.items.get(primary)
+        size = item_size(item)
+        units = self._remove(old[0]) if old else {}
+        self.items[primary] = (item, size)
+        self.primary.add(item, primary)
+        written = max(1, math.ceil(size / WRITE_UNIT_BYTES))
+        units["table"] = written
+        for name, index in self.indexes.items():
+            if index.position(item):
+                index.add(item, primary)
+                units[name] = units.get(name, 0) + written
+        return (old[0] if old else None), units
+
+    def delete(self, key: Item) -> Tuple[Optional[Item], Dict[str, float]]:
+        old = self.items.pop(self.key_of(key), None)
+        units = self._remove(old[0]) if old else {}
+        units["table"] = max(1, math.ceil(old[1] / WRITE_UNIT_BYTES)) if old else 1
+        return (old[0] if old else None), units
+
+    def _remove(self, item: Item) -> Dict[str, float]:
+        self.primary.remove(item)
+        units = {}
+        for name, index in self.indexes.items():
+            if index.position(item):
+                index.remove(item)
+                units[name] = 1
+        return units
+
+    def index(self, name: Optional[str]) -> _Index:
+        if name is None:
+            return self.primary
+        if name not in self.indexes:
+            raise DynamoError("ValidationException", f"The table does not have the specified index: {name}")
+        return self.indexes[name]
+
+
+def _read_units(size: int, consistent: bool) -> float:
+    units = max(1, math.ceil(size / READ_UNIT_BYTES))
+    return float(units) if consistent else units / 2
+
+
+def _project(item: Item, names: Optional[List[str]]) -> Item:
+    # Always a new dict: boto3 deserializes response items in place
+    return dict(item) if names is None else {k: item[k] for k in names if k in item}
+
+
+class FakeDynamoDB:
+    """The in-memory service. Thread safe; every call holds one lock, so
+    concurrent callers see each write whole."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.tables: Dict[str, _Table] = {}
+        self._lock = threading.RLock()
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            "GetItem": self._get_item,
+            "PutItem": self._put_item,
+            "UpdateItem": self._update_item,
+            "DeleteItem": self._delete_item,
+            "Query": self._query,
+            "Scan": self._scan,
+            "BatchGetItem": self._batch_get_item,
+            "BatchWriteItem": self._batch_write_item,
+        }
+        self.reset_stats()
+
+    def create_table(self, name: str, schema: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self.tables[name] = _Table(name, schema or SCHEMA)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats: Dict[str, Dict[str, float]] = {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = {name: dict(op, read_units=round(op["read_units"], 1)) for name, op in sorted(self._stats.items())}
+        return {
+            "calls": sum(op["calls"] for op in operations.values()),
+            "read_units": round(sum(op["read_units"] for op in operations.values()), 1),
+            "write_units": sum(op["write_units"] for op in operations.values()),
+            "items": {name: len(table.items) for name, table in self.tables.items()},
+            "operations": operations,
+        }
+
+    def install(self, boto3: Any = None) -> "FakeDynamoDB":
+        # On the default session, so every client created afterwards is covered
+        if boto3 is None:
+            import boto3
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        boto3.DEFAULT_SESSION.events.register("before-call.dynamodb", self._before_call, unique_id="fake-dynamodb")
+        return self
+
+    def dump(self, path: str) -> None:
+        with self._lock, open(path, "wb") as f:
+            pickle.dump({name: [item for item, _ in table.items.values()] for name, table in self.tables.items()}, f)
+
+    def load(self, path: str) -> None:
+        with open(path, "rb") as f:
+            tables = pickle.load(f)
+        with self._lock:
+            for name, items in tables.items():
+                self.create_table(name)
+                for item in items:
+                    self.tables[name].put(item)
+
+    # botocore glue
+
+    def _before_call(self, model: Any, params: Dict[str, Any], **kwargs: Any) -> Tuple[Any, Dict[str, Any]]:
+        from botocore.awsrequest import AWSResponse
+        handler = self._handlers.get(model.name)
+        status = 200
+        try:
+            if handler is None:
+                raise DynamoError("UnknownOperationException", f"{model.name} is not supported by the benchmark stand-in")
+            request = json.loads(params.get("body") or b"{}")
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                parsed = handler(request)
+        except DynamoError as e:
+            status = 400
+            parsed = {"Error": {"Code": e.code, "Message": str(e)}, "message": str(e)}
+        parsed["ResponseMetadata"] = {
+            "RequestId": uuid.uuid4().hex,
+            "HTTPStatusCode": status,
+            "HTTPHeaders": {},
+            "RetryAttempts": 0,
+        }
+        return AWSResponse(params.get("url"), status, {}, None), parsed
+
+    def _table(self, name: str) -> _Table:
+        if name not in self.tables:
+            raise DynamoError("ResourceNotFoundException", f"Requested resource not found: Table: {name} not found")
+        return self.tables[name]
+
+    def _count(self, operation: str, reads: float = 0.0, writes: int = 0) -> None:
+        op = self._stats.setdefault(operation, {"calls": 0, "read_units": 0.0, "write_units": 0})
+        op["calls"] += 1
+        op["read_units"] += reads
+        op["write_units"] += writes
+
+    @staticmethod
+    def _consumed(request: Dict[str, Any], table: str, units: Dict[str, float]) -> Dict[str, Any]:
+        # The shape DynamoDB returns for ReturnConsumedCapacity
+        mode = request.get("ReturnConsumedCapacity", "NONE")
+        if mode == "NONE":
+            return {}
+        consumed: Dict[str, Any] = {"TableName": table, "CapacityUnits": float(sum(units.values()))}
+        if mode == "INDEXES":
+            if "table" in units:
+                consumed["Table"] = {"CapacityUnits": float(units["table"])}
+            indexes = {name: {"CapacityUnits": float(u)} for name, u in units.items() if name != "table"}
+            if indexes:
+                consumed["GlobalSecondaryIndexes"] = indexes
+        return consumed
+
+    def _expression(self, request: Dict[str, Any], field: str) -> Optional[_Expression]:
+        if not request.get(field):
+            return None
+        values = {name: _decode(value) for name, value in request.get("ExpressionAttributeValues", {}).items()}
+        return _Expression(request[field], request.get("ExpressionAttributeNames", {}), values)
+
+    def _check(self, request: Dict[str, Any], current: Optional[Item]) -> None:
+        expression = self._expression(request, "ConditionExpression")
+        if expression:
+            condition = expression.condition()
+            expression.done()
+            if not condition(current or {}):
+                raise DynamoError("ConditionalCheckFailedException", "The conditional request failed")
+
+    def _projection(self, request: Dict[str, Any]) -> Optional[List[str]]:
+        expression = self._expression(request, "ProjectionExpression")
+        return expression.projection() if expression else None
+
+    # operations
+
+    def _get_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(request["TableName"])
+        found = table.get(_decode_item(request["Key"]))
+        units = {"table": _read_units(found[1] if found else 0, request.get("ConsistentRead", False))}
+        self._count("GetItem", reads=units["table"])
+        response: Dict[str, Any] = {}
+        if found:
+            response["Item"] = _project(found[0], self._projection(request))
+        consumed = self._consumed(request, table.name, units)
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def _put_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(request["TableName"])
+        item = _decode_item(request["Item"])
+        current = table.get(item)
+        self._check(request, current[0] if current else None)
+        old, units = table.put(item)
+        self._count("PutItem", writes=int(sum(units.values())))
+        response: Dict[str, Any] = {}
+        if old and request.get("ReturnValues") == "ALL_OLD":
+            response["Attributes"] = dict(old)
+        consumed = self._consumed(request, table.name, units)
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def _update_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(request["TableName"])
+        key = _decode_item(request["Key"])
+        current = table.get(key)
+        self._check(request, current[0] if current else None)
+        expression = self._expression(request, "UpdateExpression")
+        actions = expression.update() if expression else []
+        old = current[0] if current else dict(key)
+        new, touched = _apply_update(old, actions)
+        if table.key_of(new) != table.key_of(key):
+            raise DynamoError("ValidationException", "Cannot update attribute: it is part of the key")
+        _, units = table.put(new)
+        self._count("UpdateItem", writes=int(sum(units.values())))
+        response: Dict[str, Any] = {}
+        returned = request.get("ReturnValues", "NONE")
+        if returned == "ALL_NEW":
+            response["Attributes"] = dict(new)
+        elif returned == "UPDATED_NEW":
+            response["Attributes"] = {k: new[k] for k in touched if k in new}
+        elif returned == "ALL_OLD" and current:
+            response["Attributes"] = dict(current[0])
+        elif returned == "UPDATED_OLD" and current:
+            response["Attributes"] = {k: current[0][k] for k in touched if k in current[0]}
+        consumed = self._consumed(request, table.name, units)
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def _delete_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(request["TableName"])
+        key = _decode_item(request["Key"])
+        current = table.get(key)
+        self._check(request, current[0] if current else None)
+        old, units = table.delete(key)
+        self._count("DeleteItem", writes=int(sum(units.values())))
+        response: Dict[str, Any] = {}
+        if old and request.get("ReturnValues") == "ALL_OLD":
+            response["Attributes"] = dict(old)
+        consumed = self._consumed(request, table.name, units)
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def _query(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(request["TableName"])
+        index = table.index(request.get("IndexName"))
+        expression = self._expression(request, "KeyConditionExpression")
+        if expression is None:
+            raise DynamoError("ValidationException", "Query requires a KeyConditionExpression")
+        key_condition = expression.condition()
+        expression.done()
+        if index.hash_key not in expression.equals:
+            raise DynamoError("ValidationException", f"Query condition missed key schema element: {index.hash_key}")
+        partition = _plain(expression.equals[index.hash_key])
+        ordered = index.ordered(partition)
+        start, stop = self._range(ordered, expression.bounds.get(index.range_key) if index.range_key else None)
+        positions = range(start, stop) if request.get("ScanIndexForward", True) else range(stop - 1, start - 1, -1)
+        if request.get("ExclusiveStartKey"):
+            after = index.position(_decode_item(request["ExclusiveStartKey"]))
+            forward = request.get("ScanIndexForward", True)
+            # Resumes strictly after the key, even if that item has since been deleted
+            if forward:
+                positions = range(max(start, bisect_right(ordered, after[1]) if after else start), stop)
+            else:
+                positions = range(min(stop, bisect_left(ordered, after[1]) if after else stop) - 1, start - 1, -1)
+        return self._page(request, table, index, (index.partitions[partition][ordered[i]] for i in positions),
+                          key_condition, "Query")
+
+    @staticmethod
+    def _range(ordered: List[tuple], bound: Optional[Tuple[str, List[AttributeValue]]]) -> Tuple[int, int]:
+        # The slice of a sorted partition a range key condition can match
+        if not bound:
+            return 0, len(ordered)
+        operator, values = bound
+        first = _plain(values[0])
+        if operator == "begins_with":
+            return bisect_left(ordered, (first,)), bisect_left(ordered, (first + ("\U0010ffff" if isinstance(first, str) else b"\xff"),))
+        if operator == "BETWEEN":
+            return bisect_left(ordered, (first,)), bisect_left(ordered, (_plain(values[1]), _Top))
+        if operator == "=":
+            return bisect_left(ordered, (first,)), bisect_left(ordered, (first, _Top))
+        if operator in ("<", "<="):
+            return 0, bisect_left(ordered, (first,) if operator == "<" else (first, _Top))
+        return bisect_left(ordered, (first,) if operator == ">=" else (first, _Top)), len(ordered)
+
+    def _page(self, request: Dict[str, Any], table: _Table, index: _Index, keys: Iterator[tuple],
+              key_condition: Optional[Condition], operation: str) -> Dict[str, Any]:
+        limit = request.get("Limit")
+        filter_expression = self._expression(request, "FilterExpression")
+        keep = filter_expression.condition() if filter_expression else None
+        projection = self._projection(request)
+        items, scanned, read = [], 0, 0
+        last = None
+        for primary in keys:
+            item, size = table.items[primary]
+            if key_condition and not key_condition(item):
+                continue
+            scanned += 1
+            read += size
+            if keep is None or keep(item):
+                items.append(_project(index.project(item), projection))
+            if (limit and scanned >= limit) or read >= PAGE_BYTES:
+                last = item
+                break
+        units = _read_units(read, request.get("ConsistentRead", False))
+        by_index = {"table": units} if index is table.primary else {request["IndexName"]: units}
+        self._count(operation, reads=units)
+        response: Dict[str, Any] = {"Count": len(items), "ScannedCount": scanned}
+        if request.get("Select") != "COUNT":
+            response["Items"] = items
+        if last is not None:
+            response["LastEvaluatedKey"] = {k: last[k] for k in index.key_names() if k in last}
+        consumed = self._consumed(request, table.name, by_index)
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def _scan(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._table(request["TableName"])
+        index = table.index(request.get("IndexName"))
+        segment, segments = request.get("Segment", 0), request.get("TotalSegments", 1)
+        ordered = sorted(
+            ((partition,) + order, primary)
+            for partition, entries in index.partitions.items()
+            if segments == 1 or hash(str(partition)) % segments == segment
+            for order, primary in entries.items()
+        )
+        start = 0
+        if request.get("ExclusiveStartKey"):
+            after = index.position(_decode_item(request["ExclusiveStartKey"]))
+            start = bisect_left(ordered, ((after[0],) + after[1], _Top)) if after else 0
+        return self._page(request, table, index, (primary for _, primary in ordered[start:]), None, "Scan")
+
+    def _batch_get_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        responses: Dict[str, List[Item]] = {}
+        consumed = []
+        for name, spec in request["RequestItems"].items():
+            table = self._table(name)
+            projection = self._projection(spec)
+            consistent = spec.get("ConsistentRead", False)
+            units = 0.0
+            for key in spec["Keys"]:
+                found = table.get(_decode_item(key))
+                units += _read_units(found[1] if found else 0, consistent)
+                if found:
+                    responses.setdefault(name, []).append(_project(found[0], projection))
+            self._count("BatchGetItem", reads=units)
+            entry = self._consumed(request, name, {"table": units})
+            if entry:
+                consumed.append(entry)
+        response: Dict[str, Any] = {"Responses": responses, "UnprocessedKeys": {}}
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def _batch_write_item(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        consumed = []
+        for name, writes in request["RequestItems"].items():
+            table = self._table(name)
+            units: Dict[str, float] = {}
+            for write in writes:
+                if "PutRequest" in write:
+                    _, used = table.put(_decode_item(write["PutRequest"]["Item"]))
+                else:
+                    _, used = table.delete(_decode_item(write["DeleteRequest"]["Key"]))
+                for target, count in used.items():
+                    units[target] = units.get(target, 0) + count
+            self._count("BatchWriteItem", writes=int(sum(units.values())))
+            entry = self._consumed(request, name, units)
+            if entry:
+                consumed.append(entry)
+        response: Dict[str, Any] = {"UnprocessedItems": {}}
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+
+class _TopType:
+    """Sorts after every key value; bounds inclusive range conditions."""
+
+    def __lt__(self, other: Any) -> bool:
+        return False
+
+    def __gt__(self, other: Any) -> bool:
+        return True
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _TopType)
+
+    def __hash__(self) -> int:
+        return 0
+
+
+_Top = _TopType()
@@ -0,0 +1,167 @@
+"""Ingest throughput against local eCFR and DynamoDB stand-ins.
+
+Runs the ingest Lambda's handler in this process, fetching from
+ecfr_server.py and writing to fake_dynamodb.py, through three scenarios:
+
+- full: a full ingest into an empty table
+- incremental-unchanged: an incremental run straight after, nothing changed
+- incremental-changed: an incremental run after a revision edits a section
+  in some of the titles
+
+Each run starts from an empty table. Reports wall time, structure nodes and
+bytes per second, DynamoDB calls and capacity units, and ingest's own stage
+timings for each scenario and volume.
+
+    python benchmarks/ingest_throughput.py [--volume small medium] [--runs 3] [--out result.json]
+
+History and word counts are off: they read eCFR endpoints the stand-in
+doesn't serve. --dump writes the table after the last full ingest, for
+api_latency.py.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from common import INGEST_DIR, TABLE, log, offline_env, summarize, use_lambda, write_report
+from ecfr_server import EcfrServer, ReplayEcfr, SyntheticEcfr, add_source_args
+from fake_dynamodb import FakeDynamoDB
+
+SCENARIOS = ("full", "incremental-unchanged", "incremental-changed")
+EVENT = {"history": False, "word_counts": False}
+
+
+def run_scenario(ingest: Any, fake: FakeDynamoDB, server: EcfrServer, event: Dict[str, Any]) -> Dict[str, Any]:
+    fake.reset_stats()
+    server.reset_stats()
+    logs = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(logs):
+        result = ingest.handler(dict(EVENT, **event), None)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if not result.get("ok"):
+        raise RuntimeError(f"Ingest failed: {result.get('error')}\n{logs.getvalue()[-2000:]}")
+    counts = result["counts"]
+    fetched = server.stats()
+    return {
+        "wall_ms": wall_ms,
+        "titles": counts["titles"],
+        "structures": counts["structures"],
+        "unchanged_nodes": counts["unchanged_nodes"],
+        "fetch_requests": fetched["requests"],
+        "fetch_bytes": fetched["bytes"],
+        "not_found": fetched["not_found"],
+        "writes": counts["writes"],
+        "stages_ms": counts["timings_ms"],
+        "dynamodb": fake.stats(),
+        "errors": ingest.telemetry.stages.summary()["errors"],
+    }
+
+
+def summarize_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    wall = summarize([r["wall_ms"] for r in runs])
+    last = runs[-1]
+    seconds = wall["p50"] / 1000
+    return {
+        "wall_ms": wall,
+        # Structure nodes ingest parsed and stored; unchanged titles aren't parsed
+        "nodes_per_s": round(last["structures"] / seconds, 1) if seconds else None,
+        "fetch_mb_per_s": round(last["fetch_bytes"] / 1e6 / seconds, 2) if seconds else None,
+        "stages_ms": {stage: round(sorted(r["stages_ms"][stage] for r in runs)[len(runs) // 2], 1)
+                      for stage in last["stages_ms"]},
+        "titles": last["titles"],
+        "structures": last["structures"],
+        "unchanged_nodes": last["unchanged_nodes"],
+        "fetch": {"requests": last["fetch_requests"], "bytes": last["fetch_bytes"]},
+        "dynamodb": {k: last["dynamodb"][k] for k in ("calls", "read_units", "write_units", "items")},
+        "dynamodb_operations": last["dynamodb"]["operations"],
+        "writes": last["writes"],
+        "errors": last["errors"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_source_args(parser, several=True)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--storage", choices=("nodes", "blob"), default="nodes", help="STRUCTURE_STORAGE")
+    parser.add_argument("--concurrency", type=int, default=8, help="ECFR_FETCH_CONCURRENCY")
+    parser.add_argument("--ecfr-latency-ms", type=float, default=0.0, help="added to every eCFR response")
+    parser.add_argument("--ddb-latency-ms", type=float, default=0.0, help="added to every DynamoDB call")
+    parser.add_argument("--dump", help="write the table after the last full ingest here")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    server = EcfrServer(None, latency_ms=args.ecfr_latency_ms).start()
+    # Ingest reads its settings when it is imported
+    offline_env(
+        ECFR_BASE_URL=server.base_url,
+        ECFR_FETCH_CONCURRENCY=str(args.concurrency),
+        STRUCTURE_STORAGE=args.storage,
+        INGEST_HISTORY="false",
+        INGEST_WORD_COUNTS="false",
+        PUBLISH_FUNCTION_NAME="",
+    )
+    os.environ.pop("ECFR_CACHE", None)
+    fake = FakeDynamoDB(args.ddb_latency_ms).install()
+    fake.create_table(TABLE)
+    use_lambda(INGEST_DIR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as ingest
+
+    report: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "storage": args.storage,
+        "concurrency": args.concurrency,
+        "ecfr_latency_ms": args.ecfr_latency_ms,
+        "ddb_latency_ms": args.ddb_latency_ms,
+        "results": [],
+        "headline": {},
+    }
+    volumes = [None] if args.replay else args.volume
+    for volume in volumes:
+        if args.replay:
+            source, changed, name = ReplayEcfr(args.replay), None, "replay"
+        else:
+            source = SyntheticEcfr.volume(volume, seed=args.seed).prepare()
+            changed = SyntheticEcfr.volume(volume, seed=args.seed, revision=1).prepare()
+            name = volume
+        described = source.describe()
+        samples: Dict[str, List[Dict[str, Any]]] = {scenario: [] for scenario in args.scenarios}
+        for run in range(args.runs):
+            fake.create_table(TABLE)
+            server.source = source
+            # The incremental runs need the full ingest's state, so it always runs
+            full = run_scenario(ingest, fake, server, {"mode": "full"})
+            if "full" in samples:
+                samples["full"].append(full)
+            if "incremental-unchanged" in samples:
+                samples["incremental-unchanged"].append(run_scenario(ingest, fake, server, {"mode": "incremental"}))
+            if args.dump and run == args.runs - 1:
+                fake.dump(args.dump)
+            if "incremental-changed" in samples and changed is not None:
+                server.source = changed
+                samples["incremental-changed"].append(run_scenario(ingest, fake, server, {"mode": "incremental"}))
+        entry: Dict[str, Any] = {"volume": name, "source": described, "scenarios": {}}
+        for scenario, runs in samples.items():
+            if not runs:
+                continue
+            entry["scenarios"][scenario] = summarize_runs(runs)
+            p50 = entry["scenarios"][scenario]["wall_ms"]["p50"]
+            report["headline"][f"ingest.{name}.{scenario}.wall_ms"] = p50
+            log(f"{name:<8} {scenario:<24} p50 {p50:>9.1f} ms  "
+                f"{entry['scenarios'][scenario]['nodes_per_s'] or 0:>10.0f} nodes/s  "
+                f"{entry['scenarios'][scenario]['dynamodb']['write_units']:>7} WCU")
+        report["results"].append(entry)
+
+    server.shutdown()
+    write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
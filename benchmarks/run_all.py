@@ -0,0 +1,145 @@
+"""Runs the offline benchmarks and compares them with an earlier run.
+
+Each benchmark runs in its own interpreter, as they import different
+Lambdas. Their reports are merged into one JSON document with the git
+commit and interpreter they ran on, and every benchmark's headline metrics
+side by side. All headline metrics are times, so lower is better.
+
+    python benchmarks/run_all.py [--quick] [--out result.json]
+    python benchmarks/run_all.py --baseline previous.json [--threshold 15] [--fail-on-regression]
+
+A metric regresses when it is more than --threshold percent above the
+baseline and, for metrics in milliseconds, more than --noise-ms above it
+too. Only compare runs made on the same machine with the same options;
+--quick runs are a smoke test, too short to compare. --cold-start adds
+cold_start.py, which is slower.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from common import ROOT, log, write_report
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name: (script, arguments, --quick arguments)
+BENCHMARKS = {
+    "ingest_throughput": ("ingest_throughput.py", ["--volume", "small", "medium", "--runs", "3"],
+                          ["--volume", "small", "--runs", "1"]),
+    "checksum_cost": ("checksum_cost.py", ["--sizes", "xs", "s", "m", "l"], ["--sizes", "xs", "s", "m", "--runs", "3"]),
+    "api_latency": ("api_latency.py", ["--volume", "medium"], ["--volume", "small", "--requests", "50", "--uncached-requests", "10"]),
+    "cold_start": ("cold_start.py", ["--runs", "10"], ["--runs", "3"]),
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def cold_start_headline(report: Dict[str, Any]) -> Dict[str, float]:
+    # cold_start.py predates the headline section; its p50s stand in for one
+    headline = {}
+    for entry in report["results"]:
+        name = entry["name"].split(" (")[0].replace(" ", ".")
+        headline[f"cold_start.{name}.import_ms"] = entry["import_ms"]["p50"]
+        if "request_ms" in entry:
+            headline[f"cold_start.{name}.request_ms"] = entry["request_ms"]["p50"]
+    return headline
+
+
+def run(name: str, quick: bool, scratch: str) -> Dict[str, Any]:
+    script, arguments, quick_arguments = BENCHMARKS[name]
+    out = os.path.join(scratch, f"{name}.json")
+    started = time.perf_counter()
+    # Progress lines on stderr pass straight through
+    subprocess.run([sys.executable, os.path.join(HERE, script), *(quick_arguments if quick else arguments), "--out", out],
+                   check=True)
+    with open(out) as f:
+        report = json.load(f)
+    report["elapsed_s"] = round(time.perf_counter() - started, 1)
+    if "headline" not in report:
+        report["headline"] = cold_start_headline(report)
+    return report
+
+
+def compare(headline: Dict[str, float], baseline: Dict[str, float], threshold: float, noise_ms: float) -> Dict[str, Any]:
+    metrics = {}
+    regressions: List[str] = []
+    for key in sorted(headline.keys() & baseline.keys()):
+        before, after = baseline[key], headline[key]
+        change = (after - before) / before * 100 if before else 0.0
+        regressed = change > threshold and not (key.endswith("_ms") and after - before <= noise_ms)
+        metrics[key] = {"baseline": before, "current": after, "change_pct": round(change, 1), "regressed": regressed}
+        if regressed:
+            regressions.append(key)
+    return {
+        "threshold_pct": threshold,
+        "noise_ms": noise_ms,
+        "metrics": metrics,
+        "regressions": regressions,
+        "new": sorted(headline.keys() - baseline.keys()),
+        "missing": sorted(baseline.keys() - headline.keys()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--benchmarks", nargs="+", choices=[b for b in BENCHMARKS if b != "cold_start"],
+                        default=[b for b in BENCHMARKS if b != "cold_start"])
+    parser.add_argument("--cold-start", action="store_true", help="also run cold_start.py")
+    parser.add_argument("--quick", action="store_true", help="smaller volumes and fewer runs")
+    parser.add_argument("--baseline", help="an earlier run_all.py report to compare with")
+    parser.add_argument("--threshold", type=float, default=15.0, help="percent slower that counts as a regression")
+    parser.add_argument("--noise-ms", type=float, default=0.5, help="smaller slowdowns in ms metrics never count")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    names = args.benchmarks + (["cold_start"] if args.cold_start else [])
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "benchmarks": {},
+        "headline": {},
+    }
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in names:
+            log(f"== {name}")
+            report["benchmarks"][name] = run(name, args.quick, scratch)
+            report["headline"].update(report["benchmarks"][name]["headline"])
+
+    regressions: List[str] = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(report["headline"], baseline.get("headline", {}), args.threshold, args.noise_ms)
+        report["comparison"]["baseline_commit"] = baseline.get("meta", {}).get("commit", "")
+        regressions = report["comparison"]["regressions"]
+        for key in regressions:
+            metric = report["comparison"]["metrics"][key]
+            log(f"REGRESSION {key}: {metric['baseline']} -> {metric['current']} ({metric['change_pct']:+.1f}%)")
+        log(f"{len(regressions)} of {len(report['comparison']['metrics'])} metrics regressed")
+
+    write_report(report, args.out)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Static bundle from S3 by default; dynamic routes go to the API.
+# Versioned files are immutable and cached for a year; current.json and the
+# root index.html carry a short max-age, so a publish shows up within a minute.
+locals {
+  api_domain = replace(aws_apigatewayv2_api.http_api.api_endpoint, "https://", "")
+  # AWS managed cache and origin request policies
+  caching_optimized_policy = "658327ea-f89d-4fab-a63d-7e88639e58f6"
+  caching_disabled_policy  = "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"
+  all_viewer_except_host   = "b689b0a8-53d0-40ab-baf2-68738e2966ac"
+  dynamic_paths            = ["/api/*", "/agencies*", "/titles*", "/title/*", "/agency/*", "/ingest", "/health"]
+}
+
+resource "aws_cloudfront_origin_access_control" "site" {
+  name                              = "${var.project_name}-site-${var.env}"
+  origin_access_control_origin_type = "s3"
+  signing_behavior                  = "always"
+  signing_protocol                  = "sigv4"
+}
+
+resource "aws_cloudfront_distribution" "site" {
+  enabled             = true
+  comment             = "${var.project_name} dashboard (${var.env})"
+  default_root_object = "index.html"
+  price_class         = "PriceClass_100"
+
+  origin {
+    origin_id                = "site"
+    domain_name              = aws_s3_bucket.site.bucket_regional_domain_name
+    origin_path              = "/site"
+    origin_access_control_id = aws_cloudfront_origin_access_control.site.id
+  }
+
+  origin {
+    origin_id   = "api"
+    domain_name = local.api_domain
+    custom_origin_config {
+      http_port              = 80
+      https_port             = 443
+      origin_protocol_policy = "https-only"
+      origin_ssl_protocols   = ["TLSv1.2"]
+    }
+  }
+
+  default_cache_behavior {
+    target_origin_id       = "site"
+    viewer_protocol_policy = "redirect-to-https"
+    allowed_methods        = ["GET", "HEAD"]
+    cached_methods         = ["GET", "HEAD"]
+    cache_policy_id        = local.caching_optimized_policy
+  }
+
+  dynamic "ordered_cache_behavior" {
+    for_each = local.dynamic_paths
+    content {
+      path_pattern             = ordered_cache_behavior.value
+      target_origin_id         = "api"
+      viewer_protocol_policy   = "redirect-to-https"
+      allowed_methods          = ["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH", "DELETE"]
+      cached_methods           = ["GET", "HEAD"]
+      cache_policy_id          = local.caching_disabled_policy
+      origin_request_policy_id = local.all_viewer_except_host
+    }
+  }
+
+  restrictions {
+    geo_restriction {
+      restriction_type = "none"
+    }
+  }
+
+  viewer_certificate {
+    cloudfront_default_certificate = true
+  }
+}
@@ -12,9 +12,41 @@ resource "aws_dynamodb_table" "metrics" {
     name = "sk"
     type = "S"
   }
+  attribute {
+    name = "list_type"
+    type = "S"
+  }
+  attribute {
+    name = "level_key"
+    type = "S"
+  }
+
+  # Lists agencies, titles and agency-title mappings without scanning the
+  # whole table. Sparse: only those items carry list_type, so structure
+  # nodes and history items cost no index writes. Projects what the list
+  # endpoints and exports read.
+  global_secondary_index {
+    name               = "list-index"
+    hash_key           = "list_type"
+    range_key          = "sk"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["entity_type", "name", "short_name", "display_name", "slug", "cfr_references", "number", "latest_amended_on", "latest_issue_date", "up_to_date_as_of", "reserved", "updated_date", "checksum", "agency_slug", "agency_name", "title_number", "chapter"]
+  }
+
+  # Structure nodes by "<depth>#<path>/": the nodes one level below a path
+  # are one contiguous key range, so drill-downs and subtrees (one range
+  # per level) read no more than they return. Sparse (only node items carry
+  # level_key) and projects just what the tree endpoint returns.
+  global_secondary_index {
+    name               = "level-index"
+    hash_key           = "pk"
+    range_key          = "level_key"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["entity_type", "identifier", "label", "label_level", "label_description", "reserved", "size", "path", "depth"]
+  }
 
   ttl {
     attribute_name = "ttl"
-    enabled = false
+    enabled = true
   }
 }
\ No newline at end of file
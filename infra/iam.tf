@@ -20,9 +20,9 @@ data "aws_iam_policy_document" "dynamodb_rw" {
   statement {
     actions = [
       "dynamodb:PutItem", "dynamodb:BatchWriteItem", "dynamodb:UpdateItem",
-      "dynamodb:GetItem", "dynamodb:Query", "dynamodb:Scan"
+      "dynamodb:GetItem", "dynamodb:BatchGetItem", "dynamodb:Query", "dynamodb:Scan"
     ]
-    resources = [aws_dynamodb_table.metrics.arn]
+    resources = [aws_dynamodb_table.metrics.arn, "${aws_dynamodb_table.metrics.arn}/index/*"]
   }
 }
 
@@ -56,6 +56,26 @@ resource "aws_iam_role_policy" "api_lambda_invoke" {
   policy = data.aws_iam_policy_document.lambda_invoke.json
 }
 
+# Exports are uploaded by whichever of the API or publish Lambda builds them
+# first and downloaded through URLs the API presigns. ListBucket makes a
+# missing object a 404 instead of a 403.
+data "aws_iam_policy_document" "exports_rw" {
+  statement {
+    actions   = ["s3:GetObject", "s3:PutObject"]
+    resources = ["${aws_s3_bucket.exports.arn}/*"]
+  }
+  statement {
+    actions   = ["s3:ListBucket"]
+    resources = [aws_s3_bucket.exports.arn]
+  }
+}
+
+resource "aws_iam_role_policy" "api_exports" {
+  name   = "${var.project_name}-api-exports-${var.env}"
+  role   = aws_iam_role.api_role.id
+  policy = data.aws_iam_policy_document.exports_rw.json
+}
+
 resource "aws_iam_role" "ingest_role" {
   name               = "${var.project_name}-ingest-${var.env}"
   assume_role_policy = data.aws_iam_policy_document.lambda_assume.json
@@ -71,4 +91,82 @@ resource "aws_iam_role_policy" "ingest_dynamodb" {
   name   = "${var.project_name}-ingest-dynamodb-${var.env}"
   role   = aws_iam_role.ingest_role.id
   policy = data.aws_iam_policy_document.dynamodb_rw.json
-}
\ No newline at end of file
+}
+
+# Sharded runs: the orchestrator and workers invoke this same function
+resource "aws_iam_role_policy" "ingest_self_invoke" {
+  name   = "${var.project_name}-ingest-self-invoke-${var.env}"
+  role   = aws_iam_role.ingest_role.id
+  policy = data.aws_iam_policy_document.lambda_invoke.json
+}
+
+data "aws_iam_policy_document" "ecfr_cache_rw" {
+  statement {
+    actions   = ["s3:GetObject", "s3:PutObject", "s3:DeleteObject"]
+    resources = ["${aws_s3_bucket.ecfr_cache.arn}/*"]
+  }
+  statement {
+    actions   = ["s3:ListBucket"]
+    resources = [aws_s3_bucket.ecfr_cache.arn]
+  }
+}
+
+resource "aws_iam_role_policy" "ingest_ecfr_cache" {
+  name   = "${var.project_name}-ingest-ecfr-cache-${var.env}"
+  role   = aws_iam_role.ingest_role.id
+  policy = data.aws_iam_policy_document.ecfr_cache_rw.json
+}
+
+# Ingest asks the publish Lambda for a new static bundle after changing data
+data "aws_iam_policy_document" "publish_invoke" {
+  statement {
+    actions   = ["lambda:InvokeFunction"]
+    resources = [aws_lambda_function.publish_lambda.arn]
+  }
+}
+
+resource "aws_iam_role_policy" "ingest_publish_invoke" {
+  name   = "${var.project_name}-ingest-publish-invoke-${var.env}"
+  role   = aws_iam_role.ingest_role.id
+  policy = data.aws_iam_policy_document.publish_invoke.json
+}
+
+resource "aws_iam_role" "publish_role" {
+  name               = "${var.project_name}-publish-${var.env}"
+  assume_role_policy = data.aws_iam_policy_document.lambda_assume.json
+}
+
+resource "aws_iam_role_policy" "publish_logs" {
+  name   = "${var.project_name}-publish-logs-${var.env}"
+  role   = aws_iam_role.publish_role.id
+  policy = data.aws_iam_policy_document.lambda_logs.json
+}
+
+resource "aws_iam_role_policy" "publish_dynamodb" {
+  name   = "${var.project_name}-publish-dynamodb-${var.env}"
+  role   = aws_iam_role.publish_role.id
+  policy = data.aws_iam_policy_document.dynamodb_rw.json
+}
+
+data "aws_iam_policy_document" "site_rw" {
+  statement {
+    actions   = ["s3:GetObject", "s3:PutObject", "s3:DeleteObject"]
+    resources = ["${aws_s3_bucket.site.arn}/*"]
+  }
+  statement {
+    actions   = ["s3:ListBucket"]
+    resources = [aws_s3_bucket.site.arn]
+  }
+}
+
+resource "aws_iam_role_policy" "publish_site" {
+  name   = "${var.project_name}-publish-site-${var.env}"
+  role   = aws_iam_role.publish_role.id
+  policy = data.aws_iam_policy_document.site_rw.json
+}
+
+resource "aws_iam_role_policy" "publish_exports" {
+  name   = "${var.project_name}-publish-exports-${var.env}"
+  role   = aws_iam_role.publish_role.id
+  policy = data.aws_iam_policy_document.exports_rw.json
+}
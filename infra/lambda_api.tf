@@ -2,7 +2,7 @@ resource "aws_lambda_function" "api_lambda" {
   function_name = "${var.project_name}-api-${var.env}"
   filename      = var.api_lambda_zip
   source_code_hash = filebase64sha256(var.api_lambda_zip)
-  handler       = "simple_app.handler"
+  handler       = "main.handler"
   role          = aws_iam_role.api_role.arn
   runtime       = "python3.12"
   timeout       = 15
@@ -12,6 +12,14 @@ resource "aws_lambda_function" "api_lambda" {
       DDB_TABLE      = aws_dynamodb_table.metrics.name
       API_AUTH_TOKEN = var.api_auth_token
       PROJECT_ENV    = var.env
+      LIST_INDEX = "list-index"
+      LEVEL_INDEX = "level-index"
+      API_CACHE_SIZE = "256"
+      API_CACHE_TTL  = "900"
+      DDB_POOL_SIZE  = "8"
+      EXPORT_BUCKET  = aws_s3_bucket.exports.bucket
+      INGEST_LAMBDA_NAME = aws_lambda_function.ingest_lambda.function_name
+      DIFF_WAIT_SECONDS  = "10"
     }
   }
 }
\ No newline at end of file
@@ -5,13 +5,46 @@ resource "aws_lambda_function" "ingest_lambda" {
   handler       = "app.handler"
   role          = aws_iam_role.ingest_role.arn
   runtime       = "python3.12"
-  timeout       = 60
+  timeout       = 900
   memory_size   = 1024
   environment {
     variables = {
       DDB_TABLE      = aws_dynamodb_table.metrics.name
       PROJECT_ENV    = var.env
       ECFR_BASE_URL  = "https://www.ecfr.gov/api"
+      DDB_WRITE_WORKERS = "8"
+      ECFR_FETCH_CONCURRENCY = "8"
+      INGEST_MODE    = "incremental"
+      INGEST_WORD_COUNTS = "true"
+      INGEST_METRICS = "all"
+      ECFR_FULLTEXT_CONCURRENCY = "2"
+      INGEST_HISTORY = "true"
+      STRUCTURE_STORAGE = "nodes"
+      INGEST_SHARDS  = "8"
+      INGEST_TIME_MARGIN_MS = "180000"
+      ECFR_CACHE     = "s3://${aws_s3_bucket.ecfr_cache.bucket}/raw"
+      ECFR_CACHE_MAX_MB = "4096"
+      PUBLISH_FUNCTION_NAME = aws_lambda_function.publish_lambda.function_name
     }
   }
-}
\ No newline at end of file
+}
+
+# Nightly sharded ingest of the full CFR
+resource "aws_cloudwatch_event_rule" "ingest_schedule" {
+  name                = "${var.project_name}-ingest-schedule-${var.env}"
+  schedule_expression = var.ingest_schedule
+}
+
+resource "aws_cloudwatch_event_target" "ingest_schedule" {
+  rule  = aws_cloudwatch_event_rule.ingest_schedule.name
+  arn   = aws_lambda_function.ingest_lambda.arn
+  input = jsonencode({ stage = "orchestrate" })
+}
+
+resource "aws_lambda_permission" "allow_ingest_schedule" {
+  statement_id  = "AllowEventBridgeInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.ingest_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.ingest_schedule.arn
+}
@@ -0,0 +1,25 @@
+# Renders the dashboard into the site bucket after ingest runs that changed
+# data. Same package as the API; only the handler differs.
+resource "aws_lambda_function" "publish_lambda" {
+  function_name = "${var.project_name}-publish-${var.env}"
+  filename      = var.api_lambda_zip
+  source_code_hash = filebase64sha256(var.api_lambda_zip)
+  handler       = "publish.handler"
+  role          = aws_iam_role.publish_role.arn
+  runtime       = "python3.12"
+  timeout       = 900
+  memory_size   = 1024
+  environment {
+    variables = {
+      DDB_TABLE      = aws_dynamodb_table.metrics.name
+      API_AUTH_TOKEN = var.api_auth_token
+      PROJECT_ENV    = var.env
+      LIST_INDEX = "list-index"
+      LEVEL_INDEX = "level-index"
+      DDB_POOL_SIZE  = "8"
+      EXPORT_BUCKET  = aws_s3_bucket.exports.bucket
+      SITE_BUNDLE    = "s3://${aws_s3_bucket.site.bucket}/site"
+      SITE_TREE_DEPTH = "2"
+    }
+  }
+}
@@ -1,4 +1,6 @@
 output "api_base_url" { value = aws_apigatewayv2_api.http_api.api_endpoint }
 output "dynamodb_table" { value = aws_dynamodb_table.metrics.name }
 output "api_lambda_name" { value = aws_lambda_function.api_lambda.function_name }
-output "ingest_lambda_name" { value = aws_lambda_function.ingest_lambda.function_name }
\ No newline at end of file
+output "ingest_lambda_name" { value = aws_lambda_function.ingest_lambda.function_name }
+output "site_url" { value = "https://${aws_cloudfront_distribution.site.domain_name}" }
+output "publish_lambda_name" { value = aws_lambda_function.publish_lambda.function_name }
@@ -0,0 +1,92 @@
+# Raw eCFR download cache (content-addressed, zlib-compressed blobs)
+resource "aws_s3_bucket" "ecfr_cache" {
+  bucket = "${var.project_name}-ecfr-cache-${var.env}"
+}
+
+resource "aws_s3_bucket_public_access_block" "ecfr_cache" {
+  bucket                  = aws_s3_bucket.ecfr_cache.id
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+# Backstop for the cache's own size-based eviction
+resource "aws_s3_bucket_lifecycle_configuration" "ecfr_cache" {
+  bucket = aws_s3_bucket.ecfr_cache.id
+
+  rule {
+    id     = "expire-raw-downloads"
+    status = "Enabled"
+    filter {}
+    expiration {
+      days = 30
+    }
+  }
+}
+
+# Static dashboard bundle written by the publish Lambda, served through CloudFront
+resource "aws_s3_bucket" "site" {
+  bucket = "${var.project_name}-site-${var.env}"
+}
+
+resource "aws_s3_bucket_public_access_block" "site" {
+  bucket                  = aws_s3_bucket.site.id
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+# Only the distribution reads the bucket
+data "aws_iam_policy_document" "site_cloudfront_read" {
+  statement {
+    actions   = ["s3:GetObject"]
+    resources = ["${aws_s3_bucket.site.arn}/*"]
+    principals {
+      type        = "Service"
+      identifiers = ["cloudfront.amazonaws.com"]
+    }
+    condition {
+      test     = "StringEquals"
+      variable = "AWS:SourceArn"
+      values   = [aws_cloudfront_distribution.site.arn]
+    }
+  }
+}
+
+resource "aws_s3_bucket_policy" "site" {
+  bucket = aws_s3_bucket.site.id
+  policy = data.aws_iam_policy_document.site_cloudfront_read.json
+}
+
+# Bulk exports, one set per ingest generation, downloaded through presigned
+# URLs; too large for a Lambda response
+resource "aws_s3_bucket" "exports" {
+  bucket = "${var.project_name}-exports-${var.env}"
+}
+
+resource "aws_s3_bucket_public_access_block" "exports" {
+  bucket                  = aws_s3_bucket.exports.id
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+# Older generations' exports are never linked again
+resource "aws_s3_bucket_lifecycle_configuration" "exports" {
+  bucket = aws_s3_bucket.exports.id
+
+  rule {
+    id     = "expire-old-exports"
+    status = "Enabled"
+    filter {}
+    expiration {
+      days = 7
+    }
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+}
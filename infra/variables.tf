@@ -33,4 +33,9 @@ variable "ingest_lambda_zip" {
     type = string  
     default = "../artifacts/ingest_lambda.zip" 
     description = "Path to the Ingest Lambda zip file"
-}
\ No newline at end of file
+}
+variable "ingest_schedule" {
+    type = string
+    default = "cron(0 6 * * ? *)"
+    description = "EventBridge schedule for the sharded ingest run"
+}
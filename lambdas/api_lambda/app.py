@@ -1,19 +1,41 @@
 import os
 import json
-import boto3
+import re
+from itertools import islice
+from urllib.parse import quote
 from fastapi import FastAPI, Request, HTTPException, Query
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from mangum import Mangum
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable, Iterable, Iterator, Awaitable
 from boto3.dynamodb.conditions import Key, Attr
 
-TABLE_NAME = os.environ.get("DDB_TABLE")
+import cache
+import data_access as db
+import exports
+import paging
+import search_index
+import telemetry
+from structure_blob import StructureBlob
+
 API_AUTH_TOKEN = os.environ.get("API_AUTH_TOKEN", "")
 PROJECT_ENV = os.environ.get("PROJECT_ENV", "dev")
+LIST_INDEX = os.environ.get("LIST_INDEX", "list-index")
+# Item types that carry list_type, and so can be listed through LIST_INDEX
+LIST_TYPES = ("agency", "title", "agency_title_mapping")
+LEVEL_INDEX = os.environ.get("LEVEL_INDEX", "level-index")
+# level_key depths are three digits
+MAX_TREE_LEVELS = 1000
+TREE_PAGE_MAX = 1000
+# Agency rollup fields ingest keeps a RANKING#<metric> partition for
+RANK_METRICS = ("total_bytes", "nodes", "parts", "sections", "word_count", "titles")
+INGEST_LAMBDA_NAME = os.environ.get("INGEST_LAMBDA_NAME", "danny-ecfr-ingest-dev")
+# How long a diff request waits on ingest before answering 202; the diff
+# keeps running and is stored for the next request
+DIFF_WAIT_SECONDS = float(os.environ.get("DIFF_WAIT_SECONDS", "10"))
+ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
-ddb = boto3.resource("dynamodb")
-table = ddb.Table(TABLE_NAME)
 app = FastAPI(title="USDS eCFR API", version="0.1.0")
 
 # --- simple, no-JS HTML helpers ---
@@ -49,6 +71,18 @@ HTML_PAGE = """
   <button type="submit">List Titles</button>
 </form>
 
+<h2>Top Agencies</h2>
+<form method="get" action="/agencies/top">
+  <label>By: <select name="metric">
+    <option value="total_bytes">Regulatory volume (bytes)</option>
+    <option value="sections">Sections</option>
+    <option value="parts">Parts</option>
+    <option value="word_count">Words</option>
+  </select></label>
+  <label>Limit: <input name="limit" type="number" value="25" min="1" max="200"></label>
+  <button type="submit">Rank Agencies</button>
+</form>
+
 <h2>Title Structure</h2>
 <form method="get" action="/title/structure">
   <label>Title Number: <input name="title_num" placeholder="40" required></label>
@@ -71,12 +105,197 @@ FOOTER = """
 """
 
 
+# --- response cache (entries and generation tracking live in cache.py) ---
+class _NotModified(Exception):
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+async def _current_generation() -> str:
+    value = cache.fresh_generation()
+    if value is None:
+        value = cache.set_generation(await db.get_item(Key=cache.GENERATION_KEY, ProjectionExpression="generation"))
+    return value
+
+
+async def _cached(request: Request, loader: Callable[[], Awaitable[Any]]) -> Any:
+    route = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    key = (await _current_generation(),) + route
+    entry = cache.responses.get(key)
+    if entry is None:
+        data = await loader()
+        entry = (data, cache.etag(route, data))
+        cache.responses.put(key, entry)
+    data, etag = entry
+    request.state.etag = etag
+    if cache.not_modified(request.headers.get("if-none-match", ""), etag):
+        raise _NotModified(etag)
+    return data
+
+
+@app.exception_handler(_NotModified)
+async def _not_modified(request: Request, exc: _NotModified):
+    return Response(status_code=304, headers={"ETag": exc.etag})
+
+
+@app.middleware("http")
+async def _etag_header(request: Request, call_next):
+    response = await call_next(request)
+    etag = getattr(request.state, "etag", None)
+    if etag and response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@app.middleware("http")
+async def _route_label(request: Request, call_next):
+    # The router records the matched route in the (shared) scope; main.py
+    # labels the request's metrics with its template, e.g. /titles/{title_num}
+    response = await call_next(request)
+    route = request.scope.get("route")
+    telemetry.match_route(getattr(route, "path", None))
+    return response
+
+
 def _auth_or_403(request: Request):
     token = request.headers.get("x-api-key", "")
     if not API_AUTH_TOKEN or token != API_AUTH_TOKEN:
         raise HTTPException(status_code=403, detail="Forbidden")
 
 
+def _decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    try:
+        return paging.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _page(call, cursor: Optional[str], **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    start_key = _decode_cursor(cursor)
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+    resp = await call(**kwargs)
+    return resp.get("Items", []), paging.encode_cursor(resp.get("LastEvaluatedKey"))
+
+
+async def _query_entities(list_type: str, limit: int, cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    return await _page(
+        db.query, cursor,
+        IndexName=LIST_INDEX,
+        KeyConditionExpression=Key('list_type').eq(list_type),
+        Limit=limit
+    )
+
+
+# --- title structure blobs (ingest STRUCTURE_STORAGE=blob) ---
+def _blob_query(title_num: int) -> Dict[str, Any]:
+    return {"KeyConditionExpression": Key('pk').eq(f'TITLE#{title_num}') & Key('sk').begins_with('BLOB#')}
+
+
+async def _load_blob(title_num: int) -> Optional[StructureBlob]:
+    # None for titles stored one item per node
+    key = (await _current_generation(), title_num)
+    blob = cache.blobs.get(key)
+    if blob is None:
+        try:
+            blob = StructureBlob.from_items(await db.query_all(**_blob_query(title_num)))
+        except ValueError:
+            # The read raced an ingest rewriting the chunks; a re-read sees the finished set
+            try:
+                blob = StructureBlob.from_items(await db.query_all(ConsistentRead=True, **_blob_query(title_num)))
+            except ValueError:
+                raise HTTPException(status_code=503, detail="Title structure is being updated")
+        # False remembers that the title has no blob
+        blob = blob or False
+        cache.blobs.put(key, blob)
+    return blob or None
+
+
+def _tree_path(title_num: int, path: Optional[str]) -> str:
+    # Node paths start at the title root, whose identifier is the title number
+    return "/".join(p for p in (path or "").split("/") if p) or str(title_num)
+
+
+def _level_query(title_num: int, path: str, level: int) -> Dict[str, Any]:
+    # The nodes `level` levels deep in the title that are `path` or below it.
+    # Every node item has level_key "<depth>#<path>/", so that is one key
+    # range, and a subtree cut at a depth is one range per level.
+    return {
+        "IndexName": LEVEL_INDEX,
+        "KeyConditionExpression": Key('pk').eq(f'TITLE#{title_num}') & Key('level_key').begins_with(f'{level:03d}#{path}/'),
+    }
+
+
+def _tree_levels(path: str, depth: Optional[int]) -> range:
+    # Title depths from the node at `path` down to `depth` levels below it,
+    # or without a depth, as deep as level_key goes
+    top = path.count("/")
+    return range(top, top + depth + 1 if depth is not None else MAX_TREE_LEVELS)
+
+
+async def _tree_page(title_num: int, path: str, depth: Optional[int], limit: int,
+                     cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # Flat nodes, parents before children. Blob titles come back in document
+    # order, per-node titles level by level.
+    blob = await _load_blob(title_num)
+    if blob:
+        offset = int((_decode_cursor(cursor) or {}).get("offset", 0))
+        nodes = list(islice(blob.iter_nodes(path=path, depth=depth), offset, offset + limit + 1))
+        more = len(nodes) > limit
+        return nodes[:limit], paging.encode_cursor({"offset": offset + limit} if more else None)
+    levels = _tree_levels(path, depth)
+    state = _decode_cursor(cursor) or {}
+    try:
+        level, start_key = int(state.get("level", levels.start)), state.get("key")
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if level not in levels:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    nodes: List[Dict[str, Any]] = []
+    # A cursor into a level means the level has nodes
+    found = bool(start_key)
+    while level in levels and len(nodes) < limit:
+        kwargs = dict(_level_query(title_num, path, level), Limit=limit - len(nodes))
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        resp = await db.query(**kwargs)
+        items = resp.get("Items", [])
+        nodes.extend(items)
+        found = found or bool(items)
+        start_key = resp.get("LastEvaluatedKey")
+        if not start_key:
+            # Nothing is stored below a level with no nodes, nor below a
+            # node that isn't there
+            if not found:
+                return nodes, None
+            level += 1
+            found = False
+    return nodes, paging.encode_cursor({"level": level, "key": start_key} if level in levels else None)
+
+
+def _nest(nodes: List[Dict[str, Any]], path: str, depth: Optional[int]) -> Optional[Dict[str, Any]]:
+    # Flat tree nodes (including one level past `depth`) -> nested dicts.
+    # Nodes at the cut-off report child_count instead of children.
+    by_path = {node["path"]: dict(node) for node in nodes}
+    if path not in by_path:
+        return None
+    children: Dict[str, List[Dict[str, Any]]] = {}
+    for node_path, node in by_path.items():
+        if node_path != path:
+            children.setdefault(node_path.rsplit("/", 1)[0], []).append(node)
+
+    def build(node: Dict[str, Any], level: int) -> Dict[str, Any]:
+        below = children.get(node["path"], [])
+        if depth is not None and level >= depth:
+            node["child_count"] = len(below)
+        else:
+            node["children"] = [build(child, level + 1) for child in below]
+        return node
+
+    return build(by_path[path], 0)
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     _auth_or_403(request)
@@ -84,29 +303,19 @@ async def home(request: Request):
 
 
 @app.get("/agencies")
-async def agencies(request: Request, limit: int = 25, format: str = "html"):
+async def agencies(request: Request, limit: int = 25, format: str = "html",
+                   cursor: Optional[str] = Query(None, alias="next")):
     _auth_or_403(request)
+    limit = paging.clamp_limit(limit)
     
-    # Scan for agency metadata
-    resp = table.scan(
-        FilterExpression=Attr('entity_type').eq('agency'),
-        Limit=limit
-    )
-    items = resp.get("Items", [])
+    if format == "csv":
+        # Full dump instead of one page of `limit`
+        return await _export_response("agencies", "csv")
     
-    if format == "json":
-        return JSONResponse(content={"agencies": items, "count": len(items)})
+    items, next_cursor = await _cached(request, lambda: _query_entities('agency', limit, cursor))
     
-    if format == "csv":
-        import csv
-        import io
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["Name", "Short Name", "Slug", "CFR References", "Updated Date"])
-        for item in items:
-            cfr_refs = "; ".join([f"Title {ref.get('title')} Ch {ref.get('chapter', '')}" for ref in item.get('cfr_references', [])])
-            writer.writerow([item.get('name',''), item.get('short_name',''), item.get('slug',''), cfr_refs, item.get('updated_date','')])
-        return JSONResponse(content=output.getvalue(), headers={"Content-Type": "text/csv"})
+    if format == "json":
+        return JSONResponse(content=jsonable_encoder({"agencies": items, "count": len(items), "next": next_cursor}))
     
     html_rows = []
     for item in items:
@@ -117,8 +326,9 @@ async def agencies(request: Request, limit: int = 25, format: str = "html"):
             f"<tr><td>{item.get('name','')}</td><td>{item.get('short_name','')}</td><td>{cfr_refs}</td><td>{item.get('updated_date','')}</td></tr>"
         )
     
-    summary = f"<div class='summary'>Total agencies: {len(items)}</div>"
-    export_links = f"<p><a href='/agencies?format=json&limit={limit}'>📄 JSON</a> | <a href='/agencies?format=csv&limit={limit}'>📊 CSV</a></p>"
+    summary = f"<div class='summary'>Agencies on this page: {len(items)}</div>"
+    export_links = f"<p><a href='/agencies?format=json&limit={limit}'>📄 JSON</a> | <a href='/api/export/agencies?format=csv'>📊 CSV (all)</a></p>"
+    next_link = f"<p><a href='/agencies?limit={limit}&next={next_cursor}'>Next page →</a></p>" if next_cursor else ""
     
     html = (
         HTML_PAGE.format(env=PROJECT_ENV)
@@ -126,23 +336,88 @@ async def agencies(request: Request, limit: int = 25, format: str = "html"):
         + "<table><tr><th>Agency Name</th><th>Short Name</th><th>CFR Titles</th><th>Updated</th></tr>"
         + ("".join(html_rows) or "<tr><td colspan=4>No agencies found</td></tr>")
         + "</table>"
+        + next_link
         + FOOTER.format(year=datetime.utcnow().year)
     )
     return HTMLResponse(content=html)
 
 
-@app.get("/titles")
-async def titles(request: Request, limit: int = 10, format: str = "html"):
+async def _ranking_page(metric: str, order: str, limit: int, cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # Ingest keeps one RANKING#<metric> item per agency (sub-agencies
+    # included) with the value zero-padded into the sort key, so any slice of
+    # the ranking is a single query
+    if metric not in RANK_METRICS:
+        raise HTTPException(status_code=404, detail=f"Unknown metric; use one of {', '.join(RANK_METRICS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    return await _page(
+        db.query, cursor,
+        KeyConditionExpression=Key('pk').eq(f'RANKING#{metric}'),
+        ScanIndexForward=order == "asc",
+        Limit=paging.clamp_limit(limit, 200)
+    )
+
+
+@app.get("/api/rankings/{metric}")
+async def agency_ranking(request: Request, metric: str, order: str = "desc", limit: int = 25,
+                         cursor: Optional[str] = Query(None, alias="next")):
     _auth_or_403(request)
+    items, next_cursor = await _cached(request, lambda: _ranking_page(metric, order, limit, cursor))
+    return JSONResponse(content=jsonable_encoder({
+        "metric": metric,
+        "order": order,
+        "agencies": [
+            {"agency_slug": i.get("agency_slug"), "name": i.get("name"), "parent_slug": i.get("parent_slug"), "value": i.get("value")}
+            for i in items
+        ],
+        "count": len(items),
+        "next": next_cursor
+    }))
+
+
+@app.get("/agencies/top")
+async def top_agencies(request: Request, metric: str = "total_bytes", limit: int = 25,
+                       cursor: Optional[str] = Query(None, alias="next")):
+    _auth_or_403(request)
+    items, next_cursor = await _cached(request, lambda: _ranking_page(metric, "desc", limit, cursor))
     
-    resp = table.scan(
-        FilterExpression=Attr('entity_type').eq('title'),
-        Limit=limit
+    html_rows = []
+    for item in items:
+        value = int(item.get('value', 0))
+        shown = f"{value / 1024 / 1024:,.1f} MB" if metric == "total_bytes" else f"{value:,}"
+        parent = item.get('parent_slug', '')
+        html_rows.append(
+            f"<tr><td><a href='/agency/cfr?agency_slug={item.get('agency_slug','')}'>{item.get('name','')}</a></td>"
+            f"<td>{parent}</td><td>{shown}</td></tr>"
+        )
+    
+    json_link = f"<p><a href='/api/rankings/{metric}?limit={limit}'>📄 JSON</a></p>"
+    next_link = f"<p><a href='/agencies/top?metric={metric}&limit={limit}&next={next_cursor}'>Next page →</a></p>" if next_cursor else ""
+    
+    html = (
+        HTML_PAGE.format(env=PROJECT_ENV)
+        + f"<h2>Top agencies by {metric.replace('_', ' ')}</h2>"
+        + json_link
+        + "<table><tr><th>Agency</th><th>Parent</th><th>Value</th></tr>"
+        + ("".join(html_rows) or "<tr><td colspan=3>No rollups yet; run an ingest</td></tr>")
+        + "</table>"
+        + next_link
+        + FOOTER.format(year=datetime.utcnow().year)
     )
-    items = sorted(resp.get("Items", []), key=lambda x: x.get("number", 0))
+    return HTMLResponse(content=html)
+
+
+@app.get("/titles")
+async def titles(request: Request, limit: int = 10, format: str = "html",
+                 cursor: Optional[str] = Query(None, alias="next")):
+    _auth_or_403(request)
+    limit = paging.clamp_limit(limit)
+    
+    page, next_cursor = await _cached(request, lambda: _query_entities('title', limit, cursor))
+    items = sorted(page, key=lambda x: x.get("number", 0))
     
     if format == "json":
-        return JSONResponse(content={"titles": items, "count": len(items)})
+        return JSONResponse(content=jsonable_encoder({"titles": items, "count": len(items), "next": next_cursor}))
     
     html_rows = []
     for item in items:
@@ -151,8 +426,9 @@ async def titles(request: Request, limit: int = 10, format: str = "html"):
             f"<tr><td>{item.get('number','')}</td><td>{item.get('name','')}</td><td>{item.get('latest_amended_on','')}</td><td>{reserved}</td></tr>"
         )
     
-    summary = f"<div class='summary'>Total CFR titles: {len(items)}</div>"
+    summary = f"<div class='summary'>CFR titles on this page: {len(items)}</div>"
     export_link = f"<p><a href='/titles?format=json&limit={limit}'>📄 Export as JSON</a></p>"
+    next_link = f"<p><a href='/titles?limit={limit}&next={next_cursor}'>Next page →</a></p>" if next_cursor else ""
     
     html = (
         HTML_PAGE.format(env=PROJECT_ENV)
@@ -160,81 +436,224 @@ async def titles(request: Request, limit: int = 10, format: str = "html"):
         + "<table><tr><th>Title #</th><th>Name</th><th>Last Amended</th><th>Reserved</th></tr>"
         + ("".join(html_rows) or "<tr><td colspan=4>No titles found</td></tr>")
         + "</table>"
+        + next_link
         + FOOTER.format(year=datetime.utcnow().year)
     )
     return HTMLResponse(content=html)
 
 @app.get("/title/structure")
-async def title_structure(request: Request, title_num: int, format: str = "html"):
+async def title_structure(request: Request, title_num: int, format: str = "html",
+                          path: Optional[str] = None, depth: Optional[int] = None,
+                          cursor: Optional[str] = Query(None, alias="next")):
     _auth_or_403(request)
+    node_path = _tree_path(title_num, path)
     
-    resp = table.query(
-        KeyConditionExpression=Key('pk').eq(f'TITLE#{title_num}') & Key('sk').begins_with('CHAPTER#'),
-        Limit=50
-    )
-    chapters = resp.get("Items", [])
-    
-    # Get parts for each chapter (limit for demo)
-    resp = table.query(
-        KeyConditionExpression=Key('pk').eq(f'TITLE#{title_num}') & Key('sk').begins_with('PART#'),
-        Limit=20
-    )
-    parts = resp.get("Items", [])
+    if format == "json" and path is not None:
+        # One node and its descendants (down to `depth` levels), nested
+        async def load_subtree():
+            # One level more than asked for, so cut-off nodes know their child count
+            below = None if depth is None else depth + 1
+            blob = await _load_blob(title_num)
+            if blob:
+                nodes = list(blob.iter_nodes(path=node_path, depth=below))
+            elif below is None:
+                # Level by level until one comes back empty
+                nodes = []
+                for level in _tree_levels(node_path, None):
+                    found = await db.query_all(**_level_query(title_num, node_path, level))
+                    if not found:
+                        break
+                    nodes.extend(found)
+            else:
+                # The levels are independent ranges, so they are read side by side
+                levels = await db.gather(*(db.query_all(**_level_query(title_num, node_path, level))
+                                           for level in _tree_levels(node_path, below)))
+                nodes = [node for level in levels for node in level]
+            return _nest(nodes, node_path, depth)
+        
+        node = await _cached(request, load_subtree)
+        if node is None:
+            return JSONResponse({"error": "Node not found"}, status_code=404)
+        return JSONResponse(content=jsonable_encoder({"title": title_num, "path": node_path, "node": node}))
     
     if format == "json":
-        return JSONResponse(content={"title": title_num, "chapters": chapters, "parts": parts})
+        async def load():
+            # Chapters and parts are independent, so both queries run at once
+            chapters_resp, parts_resp = await db.gather(
+                db.query(
+                    KeyConditionExpression=Key('pk').eq(f'TITLE#{title_num}') & Key('sk').begins_with('CHAPTER#'),
+                    Limit=50
+                ),
+                # Get parts for each chapter (limit for demo)
+                db.query(
+                    KeyConditionExpression=Key('pk').eq(f'TITLE#{title_num}') & Key('sk').begins_with('PART#'),
+                    Limit=20
+                )
+            )
+            return chapters_resp.get("Items", []), parts_resp.get("Items", [])
+        
+        chapters, parts = await _cached(request, load)
+        return JSONResponse(content=jsonable_encoder({"title": title_num, "chapters": chapters, "parts": parts}))
     
-    chapter_rows = []
-    for chapter in chapters:
-        size_mb = chapter.get('size', 0) / 1024 / 1024
-        chapter_rows.append(
-            f"<tr><td>{chapter.get('identifier','')}</td><td>{chapter.get('label_description','')}</td><td>{size_mb:.1f} MB</td></tr>"
-        )
+    # HTML drills down one level at a time: the node at `path` and its
+    # children, one exact level range each
+    nodes, next_cursor = await _cached(request, lambda: _tree_page(title_num, node_path, 1, TREE_PAGE_MAX, cursor))
+    node = next((n for n in nodes if n.get("path") == node_path), None)
+    children = [n for n in nodes if n.get("path") != node_path]
+    if node is None and not cursor:
+        return HTMLResponse(content=HTML_PAGE.format(env=PROJECT_ENV) + "<p>Node not found</p>", status_code=404)
     
-    part_rows = []
-    for part in parts[:10]:  # Limit display
-        size_kb = part.get('size', 0) / 1024
-        part_rows.append(
-            f"<tr><td>{part.get('identifier','')}</td><td>{part.get('label_description','')}</td><td>{size_kb:.0f} KB</td></tr>"
+    rows = []
+    for child in children:
+        size_kb = child.get('size', 0) / 1024
+        link = f"/title/structure?title_num={title_num}&path={quote(child.get('path', ''))}"
+        rows.append(
+            f"<tr><td>{child.get('entity_type','')}</td><td><a href='{link}'>{child.get('identifier','')}</a></td>"
+            f"<td>{child.get('label_description','')}</td><td>{size_kb:,.0f} KB</td></tr>"
         )
     
+    crumbs = []
+    parts = node_path.split("/")
+    for i in range(len(parts)):
+        crumbs.append(f"<a href='/title/structure?title_num={title_num}&path={quote('/'.join(parts[:i + 1]))}'>{parts[i]}</a>")
+    heading = (node or {}).get("label") or f"CFR Title {title_num}"
+    next_link = (
+        f"<p><a href='/title/structure?title_num={title_num}&path={quote(node_path)}&next={next_cursor}'>Next page →</a></p>"
+        if next_cursor else ""
+    )
+    json_link = f"/api/title/{title_num}/tree?path={quote(node_path)}&depth=1"
+    
     html = (
         HTML_PAGE.format(env=PROJECT_ENV)
-        + f"<h2>CFR Title {title_num} Structure</h2>"
-        + f"<h3>Chapters ({len(chapters)})</h3>"
-        + "<table><tr><th>Chapter</th><th>Description</th><th>Size</th></tr>"
-        + ("".join(chapter_rows) or "<tr><td colspan=3>No chapters found</td></tr>")
-        + "</table>"
-        + f"<h3>Parts (showing first 10 of {len(parts)})</h3>"
-        + "<table><tr><th>Part</th><th>Description</th><th>Size</th></tr>"
-        + ("".join(part_rows) or "<tr><td colspan=3>No parts found</td></tr>")
+        + f"<h2>{heading}</h2>"
+        + f"<p>{' / '.join(crumbs)}</p>"
+        + f"<p><a href='{json_link}'>📄 JSON</a></p>"
+        + "<table><tr><th>Type</th><th>Identifier</th><th>Description</th><th>Size</th></tr>"
+        + ("".join(rows) or "<tr><td colspan=4>No children</td></tr>")
         + "</table>"
+        + next_link
         + FOOTER.format(year=datetime.utcnow().year)
     )
     return HTMLResponse(content=html)
 
+
+@app.get("/api/title/{title_num}/tree")
+async def title_tree(request: Request, title_num: int, path: Optional[str] = None,
+                     depth: Optional[int] = None, limit: int = 200,
+                     cursor: Optional[str] = Query(None, alias="next")):
+    _auth_or_403(request)
+    if depth is not None and depth < 0:
+        raise HTTPException(status_code=400, detail="depth must be 0 or more")
+    limit = paging.clamp_limit(limit, TREE_PAGE_MAX)
+    node_path = _tree_path(title_num, path)
+    
+    nodes, next_cursor = await _cached(request, lambda: _tree_page(title_num, node_path, depth, limit, cursor))
+    if not nodes and not next_cursor and not cursor:
+        return JSONResponse({"error": "Node not found"}, status_code=404)
+    
+    return JSONResponse(content=jsonable_encoder({
+        "title": title_num,
+        "path": node_path,
+        "depth": depth,
+        "nodes": nodes,
+        "count": len(nodes),
+        "next": next_cursor
+    }))
+
+# --- structural diffs (computed and stored by ingest, see structure_diff.py there) ---
+_diff_lambda = None
+
+
+def _compute_diff(title_num: int, from_date: str, to_date: str) -> Dict[str, Any]:
+    # Synchronous ingest invocation, bounded by DIFF_WAIT_SECONDS. No retries:
+    # a timed-out invocation is still running and will store its result.
+    global _diff_lambda
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ReadTimeoutError
+    if _diff_lambda is None:
+        _diff_lambda = boto3.client("lambda", config=Config(read_timeout=DIFF_WAIT_SECONDS, retries={"max_attempts": 0}))
+    try:
+        resp = _diff_lambda.invoke(
+            FunctionName=INGEST_LAMBDA_NAME,
+            InvocationType="RequestResponse",
+            Payload=json.dumps({"diff": {"title": title_num, "from": from_date, "to": to_date}}).encode("utf-8")
+        )
+    except ReadTimeoutError:
+        return {"ok": False, "status": 202, "message": "Diff is being computed; retry shortly"}
+    return json.loads(resp["Payload"].read() or b"{}")
+
+
+@app.get("/api/title/{title_num}/diff")
+async def title_diff(request: Request, title_num: int,
+                     from_date: str = Query(..., alias="from"),
+                     to_date: str = Query(..., alias="to")):
+    _auth_or_403(request)
+    if not ISO_DATE_RE.match(from_date) or not ISO_DATE_RE.match(to_date):
+        raise HTTPException(status_code=400, detail="from and to must be YYYY-MM-DD dates")
+    key = {'pk': f'DIFF#{title_num}', 'sk': f'{from_date}#{to_date}'}
+    
+    async def load():
+        # Stored diffs never change; a miss computes one through ingest,
+        # which fetches (or reuses) both structures and prunes unchanged subtrees
+        item = (await db.get_item(Key=key)).get("Item")
+        if item is None:
+            result = await db.run(lambda: _compute_diff(title_num, from_date, to_date))
+            if not result.get("ok"):
+                headers = {"Retry-After": "5"} if result.get("status") == 202 else None
+                raise HTTPException(status_code=int(result.get("status") or 502),
+                                    detail=result.get("message") or result.get("errorMessage") or "Diff failed",
+                                    headers=headers)
+            item = (await db.get_item(Key=key, ConsistentRead=True)).get("Item")
+        if item is None:
+            raise HTTPException(status_code=502, detail="Diff was not stored")
+        item = {k: v for k, v in item.items() if k not in ("pk", "sk")}
+        return jsonable_encoder(item)
+    
+    return JSONResponse(content=await _cached(request, load))
+
 @app.get("/agency/cfr")
 async def agency_cfr(request: Request, agency_slug: str, format: str = "html"):
     _auth_or_403(request)
     
-    # Get agency metadata
-    resp = table.query(
-        KeyConditionExpression=Key('pk').eq(f'AGENCY#{agency_slug}') & Key('sk').eq('METADATA')
-    )
-    agency_items = resp.get("Items", [])
-    agency = agency_items[0] if agency_items else None
+    async def load():
+        # Agency metadata, its CFR title mappings and its rollup are fetched concurrently
+        agency_resp, mappings_resp, rollup_resp = await db.gather(
+            db.query(
+                KeyConditionExpression=Key('pk').eq(f'AGENCY#{agency_slug}') & Key('sk').eq('METADATA')
+            ),
+            db.query(
+                KeyConditionExpression=Key('pk').eq(f'AGENCY#{agency_slug}') & Key('sk').begins_with('TITLE#')
+            ),
+            db.get_item(Key={'pk': f'AGENCY#{agency_slug}', 'sk': 'ROLLUP'})
+        )
+        agency_items = agency_resp.get("Items", [])
+        rollup = rollup_resp.get("Item")
+        if not agency_items and rollup:
+            # Sub-agencies only have a rollup
+            agency_items = [{"name": rollup.get("name"), "slug": agency_slug, "parent_slug": rollup.get("parent_slug")}]
+        if not agency_items:
+            return None, [], None
+        return agency_items[0], mappings_resp.get("Items", []), rollup
+    
+    agency, mappings, rollup = await _cached(request, load)
     
     if not agency:
         return JSONResponse({"error": "Agency not found"}, status_code=404)
     
-    # Get CFR title mappings
-    resp = table.query(
-        KeyConditionExpression=Key('pk').eq(f'AGENCY#{agency_slug}') & Key('sk').begins_with('TITLE#')
-    )
-    mappings = resp.get("Items", [])
-    
     if format == "json":
-        return JSONResponse(content={"agency": agency, "cfr_coverage": mappings})
+        return JSONResponse(content=jsonable_encoder({"agency": agency, "cfr_coverage": mappings, "rollup": rollup}))
+    
+    rollup_html = ""
+    if rollup:
+        words = f"{int(rollup['word_count']):,}" if rollup.get('word_count') is not None else "n/a"
+        rollup_html = (
+            "<div class='summary'>"
+            f"{int(rollup.get('total_bytes', 0)) / 1024 / 1024:,.1f} MB across {int(rollup.get('titles', 0))} titles, "
+            f"{int(rollup.get('parts', 0)):,} parts, {int(rollup.get('sections', 0)):,} sections, {words} words"
+            + (" (including sub-agencies)" if rollup.get('sub_agencies') else "")
+            + f". Last amended {rollup.get('last_amended_on') or 'unknown'}.</div>"
+        )
     
     mapping_rows = []
     for mapping in mappings:
@@ -246,6 +665,7 @@ async def agency_cfr(request: Request, agency_slug: str, format: str = "html"):
         HTML_PAGE.format(env=PROJECT_ENV)
         + f"<h2>{agency.get('name', agency_slug)} - CFR Coverage</h2>"
         + f"<p><strong>Short Name:</strong> {agency.get('short_name', '')}</p>"
+        + rollup_html
         + "<table><tr><th>CFR Title</th><th>Chapter</th></tr>"
         + ("".join(mapping_rows) or "<tr><td colspan=2>No CFR coverage found</td></tr>")
         + "</table>"
@@ -259,53 +679,274 @@ async def search_cfr(request: Request,
                      entity_type: Optional[str] = None,
                      title_num: Optional[int] = None,
                      agency_slug: Optional[str] = None,
-                     limit: int = 25):
+                     q: Optional[str] = None,
+                     prefix: bool = True,
+                     limit: int = 25,
+                     cursor: Optional[str] = Query(None, alias="next")):
     _auth_or_403(request)
+    limit = paging.clamp_limit(limit)
     
-    filter_conditions = []
-    if entity_type:
-        filter_conditions.append(Attr('entity_type').eq(entity_type))
+    if q is not None:
+        # Text queries go to the inverted index ingest builds over headings;
+        # main.py answers the same query on its fast path
+        if agency_slug:
+            raise HTTPException(status_code=400, detail="q cannot be combined with agency_slug")
+        
+        async def search():
+            generation = await _current_generation()
+            try:
+                return await db.run(lambda: search_index.run_query(
+                    db.table(), generation, q, prefix, entity_type, title_num, limit, cursor
+                ))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        body = await _cached(request, search)
+        if body is None:
+            raise HTTPException(status_code=503, detail="Search index has not been built yet")
+        return JSONResponse(content=body)
     
-    scan_kwargs = {'Limit': limit}
-    if filter_conditions:
-        if len(filter_conditions) == 1:
-            scan_kwargs['FilterExpression'] = filter_conditions[0]
+    async def load():
+        # Every combination maps to a key condition, so Limit is applied to
+        # matching items only and pages are always full until the last one.
+        if title_num and agency_slug:
+            items, next_cursor = await _page(
+                db.query, cursor,
+                KeyConditionExpression=Key('pk').eq(f'AGENCY#{agency_slug}') & Key('sk').eq(f'TITLE#{title_num}'),
+                Limit=limit
+            )
+        elif title_num:
+            # Structure nodes are keyed {TYPE}#{path}, so a type is a sort key prefix
+            condition = Key('pk').eq(f'TITLE#{title_num}')
+            if entity_type:
+                condition = condition & Key('sk').begins_with(f'{entity_type.upper()}#')
+            items, next_cursor = await _page(db.query, cursor, KeyConditionExpression=condition, Limit=limit)
+        elif agency_slug:
+            kwargs = {'KeyConditionExpression': Key('pk').eq(f'AGENCY#{agency_slug}'), 'Limit': limit}
+            if entity_type:
+                # Agency partitions hold a handful of items, so filtering here is cheap
+                kwargs['FilterExpression'] = Attr('entity_type').eq(entity_type)
+            items, next_cursor = await _page(db.query, cursor, **kwargs)
+        elif entity_type:
+            # Only listable types are indexed; node types need a title_num
+            if entity_type not in LIST_TYPES:
+                raise HTTPException(status_code=400, detail=f"entity_type without title_num or agency_slug must be one of {', '.join(LIST_TYPES)}")
+            items, next_cursor = await _query_entities(entity_type, limit, cursor)
         else:
-            scan_kwargs['FilterExpression'] = filter_conditions[0]
-            for condition in filter_conditions[1:]:
-                scan_kwargs['FilterExpression'] = scan_kwargs['FilterExpression'] & condition
-    
-    if title_num and not agency_slug:
-        # Query specific title
-        resp = table.query(
-            KeyConditionExpression=Key('pk').eq(f'TITLE#{title_num}'),
-            Limit=limit
-        )
-    elif agency_slug and not title_num:
-        # Query specific agency
-        resp = table.query(
-            KeyConditionExpression=Key('pk').eq(f'AGENCY#{agency_slug}'),
-            Limit=limit
-        )
-    else:
-        # General scan
-        resp = table.scan(**scan_kwargs)
+            items, next_cursor = await _page(db.scan, cursor, Limit=limit)
+        return items, next_cursor
     
-    items = resp.get("Items", [])
-    return JSONResponse(content={
+    items, next_cursor = await _cached(request, load)
+    
+    return JSONResponse(content=jsonable_encoder({
         "items": items,
         "count": len(items),
+        "next": next_cursor,
         "filters_applied": {
             "entity_type": entity_type,
             "title_num": title_num,
             "agency_slug": agency_slug
         }
+    }))
+
+
+# --- bulk export ---
+def _iter_entity_pages(list_type: str) -> Iterator[List[Dict[str, Any]]]:
+    return db.iter_query(IndexName=LIST_INDEX, KeyConditionExpression=Key('list_type').eq(list_type))
+
+
+def _iter_structure_pages(title_num: Optional[int]) -> Iterator[List[Dict[str, Any]]]:
+    if title_num:
+        numbers = [title_num]
+    else:
+        numbers = sorted(int(t["number"]) for page in _iter_entity_pages('title') for t in page)
+    for number in numbers:
+        chunks = [item for page in db.iter_query(**_blob_query(number)) for item in page]
+        if chunks:
+            # Blob titles only keep unit-level node items; the blob has every node
+            page = []
+            for node in StructureBlob.from_items(chunks).iter_nodes():
+                node["pk"] = f'TITLE#{number}'
+                page.append(node)
+                if len(page) == 1000:
+                    yield page
+                    page = []
+            if page:
+                yield page
+            continue
+        for page in db.iter_query(KeyConditionExpression=Key('pk').eq(f'TITLE#{number}')):
+            # Only structure nodes carry a path
+            yield [item for item in page if "path" in item]
+
+
+def _cfr_refs_text(item: Dict[str, Any]) -> str:
+    return "; ".join([f"Title {ref.get('title')} Ch {ref.get('chapter', '')}" for ref in item.get('cfr_references', [])])
+
+
+EXPORT_COLUMNS = {
+    "agencies": [
+        ("Name", lambda i: i.get('name', '')),
+        ("Short Name", lambda i: i.get('short_name', '')),
+        ("Slug", lambda i: i.get('slug', '')),
+        ("CFR References", _cfr_refs_text),
+        ("Updated Date", lambda i: i.get('updated_date', '')),
+        ("Checksum", lambda i: i.get('checksum', '')),
+    ],
+    "titles": [
+        ("Number", lambda i: i.get('number', '')),
+        ("Name", lambda i: i.get('name', '')),
+        ("Latest Amended On", lambda i: i.get('latest_amended_on', '')),
+        ("Latest Issue Date", lambda i: i.get('latest_issue_date', '')),
+        ("Up To Date As Of", lambda i: i.get('up_to_date_as_of', '')),
+        ("Reserved", lambda i: i.get('reserved', False)),
+        ("Checksum", lambda i: i.get('checksum', '')),
+    ],
+    "structure": [
+        ("Title", lambda i: i.get('pk', '').split('#', 1)[-1]),
+        ("Path", lambda i: i.get('path', '')),
+        ("Type", lambda i: i.get('entity_type', '')),
+        ("Identifier", lambda i: i.get('identifier', '')),
+        ("Label", lambda i: i.get('label', '')),
+        ("Description", lambda i: i.get('label_description', '')),
+        ("Reserved", lambda i: i.get('reserved', False)),
+        ("Size", lambda i: i.get('size', 0)),
+        ("Checksum", lambda i: i.get('checksum', '')),
+    ],
+    "mappings": [
+        ("Agency Slug", lambda i: i.get('agency_slug', '')),
+        ("Agency Name", lambda i: i.get('agency_name', '')),
+        ("Title", lambda i: i.get('title_number', '')),
+        ("Chapter", lambda i: i.get('chapter', '')),
+        ("Updated Date", lambda i: i.get('updated_date', '')),
+    ],
+}
+
+
+def _export_pages(kind: str, title_num: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    if kind == "agencies":
+        return _iter_entity_pages('agency')
+    if kind == "titles":
+        return _iter_entity_pages('title')
+    if kind == "mappings":
+        return _iter_entity_pages('agency_title_mapping')
+    return _iter_structure_pages(title_num)
+
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _export_lines(kind: str, format: str, pages: Iterable[List[Dict[str, Any]]]) -> Iterator[str]:
+    # One chunk per DynamoDB page, so no buffer grows past a page
+    if format == "ndjson":
+        for page in pages:
+            if page:
+                yield "".join(json.dumps(item, default=paging.json_default) + "\n" for item in page)
+        return
+    import csv
+    import io
+    columns = EXPORT_COLUMNS[kind]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([header for header, _ in columns])
+    for page in pages:
+        for item in page:
+            writer.writerow([getter(item) for _, getter in columns])
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+    yield output.getvalue()
+
+
+def _export_filename(kind: str, format: str, title_num: Optional[int] = None) -> str:
+    suffix = f"-title-{title_num}" if title_num else ""
+    return f"ecfr-{kind}{suffix}.{format}"
+
+
+async def _build_export(kind: str, format: str, title_num: Optional[int] = None) -> str:
+    # Uploads the export for the current generation unless it is already
+    # there; returns its S3 key. Reading and uploading block, so both run on
+    # the DynamoDB pool.
+    filename = _export_filename(kind, format, title_num)
+    key = exports.object_key(await _current_generation(), filename)
+    lines = _export_lines(kind, format, _export_pages(kind, title_num))
+    await db.run(lambda: exports.ensure(key, lines, EXPORT_FORMATS[format], filename))
+    return key
+
+
+async def _export_response(kind: str, format: str, title_num: Optional[int] = None) -> Response:
+    if exports.EXPORT_BUCKET:
+        key = await _build_export(kind, format, title_num)
+        return RedirectResponse(exports.download_url(key), status_code=303)
+    # No bucket (local runs): stream it. Behind API Gateway the response
+    # would be buffered and fail past 6 MB.
+    return StreamingResponse(
+        _export_lines(kind, format, _export_pages(kind, title_num)),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{_export_filename(kind, format, title_num)}"'}
+    )
+
+
+@app.get("/api/export/{kind}")
+async def export(request: Request, kind: str, format: str = "ndjson", title_num: Optional[int] = None):
+    _auth_or_403(request)
+    
+    if kind not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=404, detail=f"Unknown export; use one of {', '.join(EXPORT_COLUMNS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    return await _export_response(kind, format, title_num)
+
+
+HISTORY_GRANULARITIES = ("day", "month", "year")
+
+@app.get("/api/history")
+async def history(request: Request,
+                  title_num: Optional[int] = None,
+                  agency_slug: Optional[str] = None,
+                  granularity: str = "month",
+                  start: Optional[str] = None,
+                  end: Optional[str] = None):
+    _auth_or_403(request)
+    
+    if bool(title_num) == bool(agency_slug):
+        raise HTTPException(status_code=400, detail="Provide exactly one of title_num or agency_slug")
+    if granularity not in HISTORY_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(HISTORY_GRANULARITIES)}")
+    
+    # Buckets are pre-aggregated at ingest; sk order is chronological, so the
+    # whole series is one key-range query. "~" sorts after any date digit.
+    pk = f'TITLE#{title_num}' if title_num else f'AGENCY#{agency_slug}'
+    prefix = f'HISTORY#{granularity.upper()}#'
+    kwargs = {
+        'KeyConditionExpression': Key('pk').eq(pk) & Key('sk').between(prefix + (start or ''), prefix + (end or '') + '~')
+    }
+    
+    async def load():
+        return [
+            {
+                "period": item["period"],
+                "changes": int(item.get("changes", 0)),
+                "substantive": int(item.get("substantive", 0)),
+                "removed": int(item.get("removed", 0)),
+                "sections_amended": int(item.get("sections_amended", 0))
+            }
+            for item in await db.query_all(**kwargs)
+        ]
+    
+    series = await _cached(request, load)
+    
+    return JSONResponse(content={
+        "title_num": title_num,
+        "agency_slug": agency_slug,
+        "granularity": granularity,
+        "series": series,
+        "count": len(series)
     })
 
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return JSONResponse(content={"status": "healthy", "timestamp": datetime.utcnow().isoformat()})
+    return JSONResponse(content={"status": "healthy", "environment": PROJECT_ENV, "timestamp": datetime.utcnow().isoformat()})
 
 handler = Mangum(app)
\ No newline at end of file
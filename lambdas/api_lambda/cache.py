@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_MAX_ENTRIES = int(os.environ.get("API_CACHE_SIZE", "256"))
+CACHE_TTL_SECONDS = float(os.environ.get("API_CACHE_TTL", "900"))
+# How often a warm container re-reads the ingest generation marker
+GENERATION_CHECK_SECONDS = float(os.environ.get("API_GENERATION_CHECK", "30"))
+GENERATION_KEY = {"pk": "META", "sk": "GENERATION"}
+# Decoded title structure blobs; a large title is a few MB once inflated
+BLOB_CACHE_ENTRIES = int(os.environ.get("API_BLOB_CACHE_SIZE", "8"))
+# Search index pointer, shards, decoded postings, ranked matches and doc chunks
+SEARCH_CACHE_ENTRIES = int(os.environ.get("API_SEARCH_CACHE_SIZE", "512"))
+
+
+# Data only changes when ingest runs, which bumps META/GENERATION. Entries are
+# keyed by generation + route + query string and survive warm invocations.
+# Shared by the FastAPI app and the fast-path router in main.py.
+class LRUCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+responses = LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+# Keyed by (generation, title number), so a subtree request after a listing
+# doesn't fetch and inflate the same chunks again
+blobs = LRUCache(BLOB_CACHE_ENTRIES, CACHE_TTL_SECONDS)
+# Keyed by index generation, whose items never change once the pointer names
+# it, so a data generation change doesn't clear it
+search = LRUCache(SEARCH_CACHE_ENTRIES, CACHE_TTL_SECONDS)
+_generation = {"value": None, "checked": 0.0}
+
+
+def stats() -> Dict[str, Any]:
+    return {"generation": _generation["value"], "responses": responses.stats(), "blobs": blobs.stats(), "search": search.stats()}
+
+
+def fresh_generation() -> Optional[str]:
+    # The last generation read, or None once it is due for a re-check
+    if _generation["value"] is None or time.monotonic() - _generation["checked"] > GENERATION_CHECK_SECONDS:
+        return None
+    return _generation["value"]
+
+
+def set_generation(resp: Dict[str, Any]) -> str:
+    # Takes the GetItem response for GENERATION_KEY
+    value = str(resp.get("Item", {}).get("generation", ""))
+    if value != _generation["value"]:
+        responses.clear()
+        blobs.clear()
+    _generation.update(value=value, checked=time.monotonic())
+    return value
+
+
+def etag(route: Tuple, data: Any) -> str:
+    # Built from the route (path and sorted params) and the stored checksums
+    # where items have one, so it is cheap and only changes when the
+    # underlying data does. The generation stays out of it: an ingest that
+    # changed nothing a response covers keeps that response's ETag.
+    h = hashlib.sha256(repr(route).encode("utf-8"))
+
+    def feed(value: Any) -> None:
+        if isinstance(value, dict) and "pk" in value and "checksum" in value:
+            h.update(f"{value['pk']}|{value['sk']}|{value['checksum']}".encode("utf-8"))
+        elif isinstance(value, dict):
+            for k in sorted(value, key=str):
+                h.update(str(k).encode("utf-8"))
+                feed(value[k])
+        elif isinstance(value, (list, tuple)):
+            h.update(b"[")
+            for v in value:
+                feed(v)
+            h.update(b"]")
+        else:
+            h.update(repr(value).encode("utf-8"))
+
+    feed(data)
+    return f'"{h.hexdigest()[:32]}"'
+
+
+def not_modified(if_none_match: str, current: str) -> bool:
+    return if_none_match.strip() == "*" or current in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
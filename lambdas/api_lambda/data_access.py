@@ -0,0 +1,73 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, TypeVar
+
+import telemetry
+
+TABLE_NAME = os.environ.get("DDB_TABLE")
+# Upper bound on DynamoDB calls in flight per container
+POOL_SIZE = int(os.environ.get("DDB_POOL_SIZE", "8"))
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="ddb")
+_local = threading.local()
+
+
+def table():
+    # boto3 resources are not thread safe; each pool thread builds its own once.
+    # boto3 itself is imported on first use so routes that never touch
+    # DynamoDB don't pay for it on a cold start.
+    if not hasattr(_local, "table"):
+        import boto3
+        telemetry.instrument_dynamodb(boto3)
+        _local.table = boto3.resource("dynamodb").Table(TABLE_NAME)
+    return _local.table
+
+
+async def run(fn: Callable[[], T]) -> T:
+    # Runs blocking boto3 work on the DynamoDB pool instead of the event loop.
+    # asyncio is imported here, not at module level: the sync fast path in
+    # main.py never needs it and it is a large share of a cold import.
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn)
+
+
+async def query(**kwargs) -> Dict[str, Any]:
+    return await run(lambda: table().query(**kwargs))
+
+
+async def scan(**kwargs) -> Dict[str, Any]:
+    return await run(lambda: table().scan(**kwargs))
+
+
+async def get_item(**kwargs) -> Dict[str, Any]:
+    return await run(lambda: table().get_item(**kwargs))
+
+
+async def query_all(**kwargs) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    while True:
+        resp = await query(**kwargs)
+        items.extend(resp.get("Items", []))
+        if "LastEvaluatedKey" not in resp:
+            return items
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+async def gather(*calls: Awaitable[Any]) -> List[Any]:
+    # Independent reads run side by side; latency tracks the slowest one
+    import asyncio
+    return list(await asyncio.gather(*calls))
+
+
+def iter_query(**kwargs) -> Iterator[List[Dict[str, Any]]]:
+    # Blocking page iterator for streaming responses, which Starlette already
+    # drives from a worker thread
+    while True:
+        resp = table().query(**kwargs)
+        yield resp.get("Items", [])
+        if "LastEvaluatedKey" not in resp:
+            return
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
@@ -0,0 +1,92 @@
+"""Bulk exports, written to S3 once per ingest generation.
+
+API Gateway and Mangum buffer a whole response, and a Lambda response tops
+out at 6 MB, which the structure export passes easily. So an export is
+uploaded to EXPORT_BUCKET instead, streamed page by page through a
+multipart upload, and the route answers with a redirect to a presigned URL.
+
+Objects are keyed by generation, so every request after the first (or
+after publish.py built it) only checks the object is there. Old
+generations expire through the bucket's lifecycle rule.
+"""
+import io
+import os
+from typing import Iterable, Iterator, Optional
+
+EXPORT_BUCKET = os.environ.get("EXPORT_BUCKET", "")
+EXPORT_PREFIX = os.environ.get("EXPORT_PREFIX", "exports").strip("/")
+# How long a presigned download link stays valid
+EXPORT_URL_TTL = int(os.environ.get("EXPORT_URL_TTL", "900"))
+# Multipart part size; each part is held in memory while it uploads
+PART_BYTES = 8 * 1024 * 1024
+
+_client = {"s3": None}
+
+
+def _s3():
+    # Imported on first use, like boto3 in data_access.py
+    if _client["s3"] is None:
+        import boto3
+        _client["s3"] = boto3.client("s3")
+    return _client["s3"]
+
+
+class ChunkStream(io.RawIOBase):
+    # A read-only file over an iterator of text chunks, encoded as UTF-8, so
+    # upload_fileobj can pull parts without the whole export in memory
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks: Iterator[str] = iter(chunks)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = chunk.encode("utf-8")
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def object_key(generation: str, filename: str) -> str:
+    return f"{EXPORT_PREFIX}/{generation or 'none'}/{filename}"
+
+
+def exists(key: str) -> bool:
+    from botocore.exceptions import ClientError
+    try:
+        _s3().head_object(Bucket=EXPORT_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return True
+
+
+def write(key: str, chunks: Iterable[str], media_type: str, filename: str) -> None:
+    from boto3.s3.transfer import TransferConfig
+    _s3().upload_fileobj(
+        io.BufferedReader(ChunkStream(chunks), PART_BYTES), EXPORT_BUCKET, key,
+        ExtraArgs={"ContentType": media_type, "ContentDisposition": f'attachment; filename="{filename}"'},
+        Config=TransferConfig(multipart_chunksize=PART_BYTES, max_concurrency=2),
+    )
+
+
+def ensure(key: str, chunks: Iterable[str], media_type: str, filename: str) -> bool:
+    # Uploads the export unless this generation already has it; returns
+    # whether it wrote. Two racing writers upload the same bytes.
+    if exists(key):
+        return False
+    write(key, chunks, media_type, filename)
+    return True
+
+
+def download_url(key: str, expires_in: Optional[int] = None) -> str:
+    return _s3().generate_presigned_url(
+        "get_object", Params={"Bucket": EXPORT_BUCKET, "Key": key}, ExpiresIn=expires_in or EXPORT_URL_TTL
+    )
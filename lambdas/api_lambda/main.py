@@ -0,0 +1,235 @@
+import os
+import json
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import cache
+import data_access as db
+import paging
+import telemetry
+
+# Lambda entry point. The hot JSON routes are answered here with nothing but
+# the stdlib and boto3; everything else goes to the FastAPI app in app.py,
+# which (with pydantic, Starlette, the HTML pages and csv) is only imported on
+# the first request that needs it.
+
+API_AUTH_TOKEN = os.environ.get("API_AUTH_TOKEN", "")
+PROJECT_ENV = os.environ.get("PROJECT_ENV", "dev")
+LIST_INDEX = os.environ.get("LIST_INDEX", "list-index")
+INGEST_LAMBDA_NAME = os.environ.get("INGEST_LAMBDA_NAME", "danny-ecfr-ingest-dev")
+# Ingest and orchestrator invocations record their timings here
+INGEST_METRICS_PK = "INGEST_METRICS"
+METRICS_RUNS_MAX = 50
+
+Event = Dict[str, Any]
+Response = Dict[str, Any]
+
+_lazy: Dict[str, Any] = {}
+
+
+def _app_handler() -> Callable[[Event, Any], Response]:
+    if "app" not in _lazy:
+        from app import handler as app_handler
+        _lazy["app"] = app_handler
+    return _lazy["app"]
+
+
+def _lambda_client():
+    if "lambda" not in _lazy:
+        import boto3
+        _lazy["lambda"] = boto3.client("lambda")
+    return _lazy["lambda"]
+
+
+def _json(status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json", **(headers or {})},
+        "body": json.dumps(body, default=paging.json_default),
+    }
+
+
+def _authorized(event: Event) -> bool:
+    token = (event.get("headers") or {}).get("x-api-key", "")
+    return bool(API_AUTH_TOKEN) and token == API_AUTH_TOKEN
+
+
+def _current_generation() -> str:
+    value = cache.fresh_generation()
+    if value is None:
+        value = cache.set_generation(db.table().get_item(Key=cache.GENERATION_KEY, ProjectionExpression="generation"))
+    return value
+
+
+def _entity_page(event: Event, path: str, list_type: str, result_key: str, default_limit: int) -> Optional[Response]:
+    # Same data, cache entries and ETags as the FastAPI route's format=json.
+    # Returns None for anything it doesn't handle so the app can answer it.
+    params = event.get("queryStringParameters") or {}
+    if params.get("format") != "json":
+        return None
+    try:
+        limit = paging.clamp_limit(int(params.get("limit", default_limit)))
+    except ValueError:
+        return None
+    if not _authorized(event):
+        return _json(403, {"detail": "Forbidden"})
+
+    route = (path, tuple(sorted(params.items())))
+    key = (_current_generation(),) + route
+    entry = cache.responses.get(key)
+    if entry is None:
+        from boto3.dynamodb.conditions import Key
+        kwargs = {
+            "IndexName": LIST_INDEX,
+            "KeyConditionExpression": Key("list_type").eq(list_type),
+            "Limit": limit,
+        }
+        try:
+            start_key = paging.decode_cursor(params.get("next"))
+        except ValueError:
+            return _json(400, {"detail": "Invalid cursor"})
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        resp = db.table().query(**kwargs)
+        data = (resp.get("Items", []), paging.encode_cursor(resp.get("LastEvaluatedKey")))
+        entry = (data, cache.etag(route, data))
+        cache.responses.put(key, entry)
+
+    (items, next_cursor), etag = entry
+    if cache.not_modified((event.get("headers") or {}).get("if-none-match", ""), etag):
+        return {"statusCode": 304, "headers": {"ETag": etag}, "body": ""}
+    if list_type == "title":
+        items = sorted(items, key=lambda x: x.get("number", 0))
+    return _json(
+        200,
+        {result_key: items, "count": len(items), "next": next_cursor},
+        {"ETag": etag, "Cache-Control": "private, no-cache"}
+    )
+
+
+def _agencies(event: Event) -> Optional[Response]:
+    return _entity_page(event, "/agencies", "agency", "agencies", 25)
+
+
+def _titles(event: Event) -> Optional[Response]:
+    return _entity_page(event, "/titles", "title", "titles", 10)
+
+
+def _search(event: Event) -> Optional[Response]:
+    # Text queries (?q=) against the search index, e.g. search-as-you-type.
+    # Same body, cache entries and ETags as the FastAPI route; filtered
+    # listings without q, and anything malformed, go to the app.
+    params = event.get("queryStringParameters") or {}
+    if "q" not in params or params.get("agency_slug"):
+        return None
+    try:
+        limit = int(params.get("limit", 25))
+        title_num = int(params["title_num"]) if params.get("title_num") else None
+    except ValueError:
+        return None
+    prefix = params.get("prefix", "true").lower() not in ("false", "0", "no", "off")
+    if not _authorized(event):
+        return _json(403, {"detail": "Forbidden"})
+
+    import search_index
+    route = ("/api/search", tuple(sorted(params.items())))
+    key = (_current_generation(),) + route
+    entry = cache.responses.get(key)
+    if entry is None:
+        try:
+            body = search_index.run_query(
+                db.table(), key[0], params["q"], prefix, params.get("entity_type") or None, title_num, limit, params.get("next")
+            )
+        except ValueError:
+            return _json(400, {"detail": "Invalid cursor"})
+        entry = (body, cache.etag(route, body))
+        cache.responses.put(key, entry)
+
+    body, etag = entry
+    if body is None:
+        return _json(503, {"detail": "Search index has not been built yet"})
+    if cache.not_modified((event.get("headers") or {}).get("if-none-match", ""), etag):
+        return {"statusCode": 304, "headers": {"ETag": etag}, "body": ""}
+    return _json(200, body, {"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+def _health(event: Event) -> Response:
+    return _json(200, {"status": "healthy", "environment": PROJECT_ENV, "timestamp": datetime.utcnow().isoformat()})
+
+
+def _ingest(event: Event) -> Response:
+    if not _authorized(event):
+        return _json(403, {"detail": "Forbidden"})
+    try:
+        _lambda_client().invoke(
+            FunctionName=INGEST_LAMBDA_NAME,
+            InvocationType="Event",  # Async
+            # Same event as the EventBridge schedule in lambda_ingest.tf
+            Payload=json.dumps({"stage": "orchestrate"})
+        )
+    except Exception as e:
+        return _json(500, {"error": f"Failed to trigger ingest: {str(e)}"})
+    return _json(200, {"message": "Ingest triggered successfully"})
+
+
+def _metrics(event: Event) -> Response:
+    # This container's request latencies, DynamoDB capacity and cache hit
+    # rates, its recent x-profile captures, and the latest ingest runs
+    if not _authorized(event):
+        return _json(403, {"detail": "Forbidden"})
+    params = event.get("queryStringParameters") or {}
+    try:
+        runs = min(max(int(params.get("runs", 10)), 0), METRICS_RUNS_MAX)
+    except ValueError:
+        return _json(400, {"detail": "runs must be an integer"})
+    body = telemetry.snapshot(profiles=True)
+    body["cache"] = cache.stats()
+    body["ingest_runs"] = []
+    if runs:
+        from boto3.dynamodb.conditions import Key
+        resp = db.table().query(
+            KeyConditionExpression=Key("pk").eq(INGEST_METRICS_PK),
+            ScanIndexForward=False,
+            Limit=runs,
+        )
+        body["ingest_runs"] = [
+            dict(json.loads(item["data"]), at=item.get("updated_date")) for item in resp.get("Items", [])
+        ]
+    return _json(200, body, {"Cache-Control": "no-store"})
+
+
+FAST_ROUTES: Dict[tuple, Callable[[Event], Optional[Response]]] = {
+    ("GET", "/health"): _health,
+    ("GET", "/agencies"): _agencies,
+    ("GET", "/titles"): _titles,
+    ("GET", "/api/search"): _search,
+    ("POST", "/ingest"): _ingest,
+    ("GET", "/api/metrics"): _metrics,
+}
+
+
+def handler(event: Event, context: Any) -> Response:
+    started = time.perf_counter()
+    units = telemetry.capacity.units
+    path = event.get("rawPath") or event.get("path") or "/"
+    method = event.get("requestContext", {}).get("http", {}).get("method") or event.get("httpMethod", "GET")
+    # x-profile samples this request's stacks; only for callers with the API key
+    profiler = telemetry.Profiler().start() if (event.get("headers") or {}).get("x-profile") and _authorized(event) else None
+    route = FAST_ROUTES.get((method, path))
+    label = path if route else None
+    response = None
+    try:
+        response = route(event) if route else None
+        if response is None:
+            response = _app_handler()(event, context)
+            # Unmatched paths share one label, so a scan of random URLs can't
+            # grow the route table
+            label = telemetry.take_route() or "(unmatched)"
+        return response
+    finally:
+        telemetry.record_request(
+            method, label or "(unmatched)", (response or {}).get("statusCode", 500),
+            (time.perf_counter() - started) * 1000, telemetry.capacity.units - units,
+            profiler.stop() if profiler else None, getattr(context, "aws_request_id", ""),
+        )
@@ -0,0 +1,39 @@
+import base64
+import json
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+# Page size and cursor helpers shared by the fast path in main.py, app.py
+# and search_index.py. Stdlib only, like the rest of the fast path.
+
+# Largest page any listing returns; DynamoDB pages stop at 1 MB regardless
+MAX_LIMIT = 1000
+
+
+def clamp_limit(limit: int, maximum: int = MAX_LIMIT) -> int:
+    # DynamoDB rejects a Limit below 1, which would otherwise surface as a 500
+    return max(1, min(limit, maximum))
+
+
+# Opaque pagination cursors wrap DynamoDB's LastEvaluatedKey or an offset
+def encode_cursor(state: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not state:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    # Raises ValueError for anything that isn't one of ours
+    if not cursor:
+        return None
+    state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    return state
+
+
+def json_default(value):
+    # DynamoDB numbers come back as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,349 @@
+"""Publishes the read-only dashboard as a static bundle.
+
+Every page and JSON payload is rendered once, in-process, through the same
+FastAPI app the API Lambda serves, so the bundle is byte-for-byte what a
+request would have returned. Links between published pages are rewritten
+to relative ones; everything else (pagination, drill-downs past
+SITE_TREE_DEPTH, search, exports) keeps pointing at the dynamic routes.
+With EXPORT_BUCKET set, the full exports for the current generation are
+built here too, so no export request has to build one inside API
+Gateway's timeout.
+
+Layout under SITE_BUNDLE (a local directory or s3://bucket/prefix):
+
+    v/<version>/...   immutable, gzip-compressed files; <version> hashes the
+                      content of every file, so an unchanged corpus
+                      republishes nothing
+    current.json      the pointer: version, generation and file manifest,
+                      replaced in a single write once the version is complete
+    index.html        redirect to the current version's home page
+
+Runs as its own Lambda (handler below), invoked by ingest after a run that
+changed data, or locally:
+
+    DDB_TABLE=ecfr-local API_AUTH_TOKEN=dev AWS_ENDPOINT_URL_DYNAMODB=http://localhost:8000 \\
+        python publish.py --out ./site
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+SITE_BUNDLE = os.environ.get("SITE_BUNDLE", "")
+# Title drill-down levels published as pages; deeper ones stay dynamic
+SITE_TREE_DEPTH = int(os.environ.get("SITE_TREE_DEPTH", "2"))
+# Rows per published listing; well past the number of agencies and titles
+LIST_LIMIT = 1000
+TOP_LIMIT = 200
+RENDER_CONCURRENCY = 8
+IMMUTABLE = "public, max-age=31536000, immutable"
+POINTER_CACHE = "public, max-age=60"
+# Node paths that are safe as file names and URLs without escaping
+SAFE_PATH = re.compile(r"^[A-Za-z0-9._-]+(/[A-Za-z0-9._-]+)*$")
+HREF = re.compile(r"href='(/[^']*)'")
+
+Route = Tuple[str, Dict[str, str]]
+
+
+class LocalDirStore:
+    # Writes each file plain and as <name>.gz, the layout gzip_static-style
+    # servers expect; `python -m http.server` serves the plain copies
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, key: str, body: bytes, content_type: str, cache_control: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for name, data in ((path, body), (path + ".gz", gzip.compress(body, 9, mtime=0))):
+            # Write-then-rename, so current.json is swapped atomically
+            tmp = f"{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, name)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def versions(self) -> List[str]:
+        try:
+            return sorted(os.listdir(self._path("v")))
+        except FileNotFoundError:
+            return []
+
+    def delete_version(self, version: str) -> None:
+        import shutil
+        shutil.rmtree(self._path(f"v/{version}"), ignore_errors=True)
+
+
+class S3Store:
+    # Stores gzip bodies with Content-Encoding set, so a CDN serves them as is
+    def __init__(self, bucket: str, prefix: str = ""):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.s3 = boto3.client("s3")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key: str, body: bytes, content_type: str, cache_control: str) -> None:
+        self.s3.put_object(
+            Bucket=self.bucket, Key=self._key(key), Body=gzip.compress(body, 9, mtime=0),
+            ContentType=content_type, ContentEncoding="gzip", CacheControl=cache_control
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            body = self.s3.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return gzip.decompress(body)
+
+    def versions(self) -> List[str]:
+        found = []
+        pages = self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self._key("v/"), Delimiter="/")
+        for page in pages:
+            found.extend(p["Prefix"].rstrip("/").rsplit("/", 1)[-1] for p in page.get("CommonPrefixes", []))
+        return sorted(found)
+
+    def delete_version(self, version: str) -> None:
+        pages = self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self._key(f"v/{version}/"))
+        for page in pages:
+            keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if keys:
+                self.s3.delete_objects(Bucket=self.bucket, Delete={"Objects": keys, "Quiet": True})
+
+
+def open_store(spec: str):
+    # "s3://bucket/prefix" or a local directory
+    if spec.startswith("s3://"):
+        bucket, _, prefix = spec[len("s3://"):].partition("/")
+        return S3Store(bucket, prefix)
+    return LocalDirStore(spec)
+
+
+async def render(path: str, query: Dict[str, str]) -> Tuple[int, str, bytes]:
+    # One GET through the ASGI app -> (status, content type, body)
+    from app import app, API_AUTH_TOKEN
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "https", "path": path, "raw_path": path.encode("utf-8"), "root_path": "",
+        "query_string": urlencode(query).encode("utf-8"),
+        "headers": [(b"host", b"static"), (b"x-api-key", API_AUTH_TOKEN.encode("utf-8"))],
+        "client": ("127.0.0.1", 0), "server": ("static", 443),
+    }
+    messages: List[Dict[str, Any]] = []
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in start.get("headers", [])}
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return start["status"], headers.get("content-type", "application/octet-stream"), body
+
+
+async def _json(path: str, query: Dict[str, str]) -> Dict[str, Any]:
+    status, _, body = await render(path, query)
+    if status != 200:
+        raise RuntimeError(f"GET {path} answered {status}")
+    return json.loads(body)
+
+
+async def _all_pages(path: str, query: Dict[str, str], key: str) -> List[Dict[str, Any]]:
+    items, cursor = [], None
+    while True:
+        page = await _json(path, dict(query, **({"next": cursor} if cursor else {})))
+        items.extend(page.get(key, []))
+        cursor = page.get("next")
+        if not cursor:
+            return items
+
+
+async def plan() -> Dict[str, Route]:
+    # File path in the bundle -> the route that renders it
+    from app import RANK_METRICS
+    files: Dict[str, Route] = {
+        "index.html": ("/", {}),
+        "agencies.html": ("/agencies", {"limit": str(LIST_LIMIT)}),
+        "api/agencies.json": ("/agencies", {"format": "json", "limit": str(LIST_LIMIT)}),
+        "titles.html": ("/titles", {"limit": str(LIST_LIMIT)}),
+        "api/titles.json": ("/titles", {"format": "json", "limit": str(LIST_LIMIT)}),
+    }
+    for metric in RANK_METRICS:
+        files[f"top/{metric}.html"] = ("/agencies/top", {"metric": metric, "limit": str(TOP_LIMIT)})
+        files[f"api/rankings/{metric}.json"] = (f"/api/rankings/{metric}", {"limit": str(TOP_LIMIT)})
+
+    agencies = await _all_pages("/agencies", {"format": "json", "limit": str(LIST_LIMIT)}, "agencies")
+    slugs = {a["slug"] for a in agencies if a.get("slug")}
+    # Sub-agencies are only reachable through their parents
+    for agency in agencies:
+        slugs.update(child["slug"] for child in agency.get("children") or [] if child.get("slug"))
+    for slug in sorted(s for s in slugs if SAFE_PATH.match(s)):
+        files[f"agency/{slug}.html"] = ("/agency/cfr", {"agency_slug": slug})
+        files[f"api/agency/{slug}.json"] = ("/agency/cfr", {"agency_slug": slug, "format": "json"})
+
+    titles = await _all_pages("/titles", {"format": "json", "limit": str(LIST_LIMIT)}, "titles")
+    for title in sorted(titles, key=lambda t: int(t.get("number", 0))):
+        if title.get("reserved"):
+            continue
+        n = str(int(title["number"]))
+        files[f"api/title/{n}/structure.json"] = ("/title/structure", {"title_num": n, "format": "json"})
+        files[f"api/history/title/{n}.json"] = ("/api/history", {"title_num": n})
+        if SITE_TREE_DEPTH <= 0:
+            continue
+        nodes = await _all_pages(f"/api/title/{n}/tree", {"depth": str(SITE_TREE_DEPTH - 1), "limit": "1000"}, "nodes")
+        for node in nodes:
+            path = node.get("path", "")
+            if SAFE_PATH.match(path):
+                files[f"title/{path}.html"] = ("/title/structure", {"title_num": n, "path": path})
+    return files
+
+
+def _canonical(path: str, query: Dict[str, str]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    # Different spellings of the same page map to one key
+    query = {k: v for k, v in query.items() if not (k == "format" and v == "html")}
+    if path == "/title/structure" and "format" not in query:
+        query.setdefault("path", query.get("title_num", ""))
+    return path, tuple(sorted(query.items()))
+
+
+def rewrite_links(html: str, name: str, targets: Dict[Tuple, str]) -> str:
+    # Absolute links to published pages -> relative links within the bundle
+    base = posixpath.dirname(name) or "."
+
+    def replace(match: "re.Match") -> str:
+        url = urlsplit(match.group(1))
+        target = targets.get(_canonical(url.path, dict(parse_qsl(url.query))))
+        return f"href='{posixpath.relpath(target, base)}'" if target else match.group(0)
+
+    return HREF.sub(replace, html)
+
+
+def _snapshot_nav(files: Dict[str, Route]) -> str:
+    links = [("agencies.html", "Agencies"), ("titles.html", "Titles")]
+    links += [(name, "Top by " + name[4:-5].replace("_", " ")) for name in sorted(files) if name.startswith("top/")]
+    return "<p class='muted'>Snapshot: " + " · ".join(f"<a href='{name}'>{label}</a>" for name, label in links) + "</p>"
+
+
+async def render_bundle() -> Dict[str, Tuple[str, bytes]]:
+    # File path -> (content type, body), links already rewritten
+    files = await plan()
+    targets = {_canonical(path, query): name for name, (path, query) in files.items()}
+    limit = asyncio.Semaphore(RENDER_CONCURRENCY)
+
+    async def one(name: str, route: Route) -> Tuple[str, int, str, bytes]:
+        async with limit:
+            return (name,) + await render(*route)
+
+    bundle = {}
+    for name, status, content_type, body in await asyncio.gather(*(one(n, r) for n, r in files.items())):
+        if status != 200:
+            # e.g. an agency whose references no longer resolve; its links stay dynamic
+            print(f"Skipping {name}: {files[name][0]} answered {status}")
+            continue
+        if content_type.startswith("text/html"):
+            html = body.decode("utf-8")
+            if name == "index.html":
+                # The home page only has forms, which stay dynamic
+                html = html.replace("</h1>", "</h1>\n" + _snapshot_nav(files), 1)
+            body = rewrite_links(html, name, targets).encode("utf-8")
+        bundle[name] = (content_type, body)
+    return bundle
+
+
+def manifest(bundle: Dict[str, Tuple[str, bytes]]) -> Tuple[str, Dict[str, Any]]:
+    files = {
+        name: {"sha256": hashlib.sha256(body).hexdigest(), "bytes": len(body), "content_type": content_type}
+        for name, (content_type, body) in sorted(bundle.items())
+    }
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return version, files
+
+
+async def build_exports() -> List[str]:
+    # Every full export in every format, one at a time: the structure export
+    # reads every title. Returns their S3 keys.
+    from app import EXPORT_COLUMNS, EXPORT_FORMATS, _build_export
+    return [await _build_export(kind, format) for kind in EXPORT_COLUMNS for format in EXPORT_FORMATS]
+
+
+def publish(store, generation: str = "", force: bool = False) -> Dict[str, Any]:
+    bundle = asyncio.run(render_bundle())
+    version, files = manifest(bundle)
+    current = json.loads(store.get("current.json") or b"{}")
+    if current.get("version") == version and not force:
+        return {"published": False, "version": version, "files": len(files)}
+
+    # The version is complete before anything points at it
+    for name, (content_type, body) in bundle.items():
+        store.put(f"v/{version}/{name}", body, content_type, IMMUTABLE)
+    pointer = {
+        "version": version,
+        "generation": generation,
+        "published_at": datetime.now(timezone.utc).isoformat(),
+        "previous": current.get("version"),
+        "files": files,
+    }
+    store.put("current.json", json.dumps(pointer, indent=1).encode("utf-8"), "application/json", POINTER_CACHE)
+    redirect = f"<!doctype html><meta charset='utf-8'><meta http-equiv='refresh' content='0; url=v/{version}/index.html'><a href='v/{version}/index.html'>eCFR Analytics</a>"
+    store.put("index.html", redirect.encode("utf-8"), "text/html; charset=utf-8", POINTER_CACHE)
+
+    # Keep the previous version for clients that loaded the old pointer
+    removed = [v for v in store.versions() if v not in (version, current.get("version"))]
+    for old in removed:
+        store.delete_version(old)
+    return {
+        "published": True,
+        "version": version,
+        "files": len(files),
+        "bytes": sum(f["bytes"] for f in files.values()),
+        "deleted_versions": len(removed),
+    }
+
+
+def handler(event, context):
+    # {"publish": {"generation": "...", "force": false}}, sent by ingest
+    options = (event or {}).get("publish") or {}
+    if not SITE_BUNDLE:
+        return {"ok": False, "message": "SITE_BUNDLE is not set"}
+    try:
+        result = publish(open_store(SITE_BUNDLE), str(options.get("generation", "")), bool(options.get("force")))
+        import exports
+        if exports.EXPORT_BUCKET:
+            result["exports"] = asyncio.run(build_exports())
+    except Exception as e:
+        return {"ok": False, "message": f"Publish failed: {e}", "error": str(e)}
+    print(json.dumps(result))
+    return {"ok": True, **result}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render the dashboard into a static bundle")
+    parser.add_argument("--out", default=SITE_BUNDLE or "site", help="local directory or s3://bucket/prefix")
+    parser.add_argument("--force", action="store_true", help="publish even if nothing changed")
+    args = parser.parse_args()
+    print(json.dumps(publish(open_store(args.out), force=args.force), indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import json
+import math
+import re
+import zlib
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+import cache
+import paging
+
+# Reader for the inverted index written by ingest_lambda's search_index.py
+# (see there for the layout). A query reads the META / SEARCH_INDEX pointer,
+# one shard per term prefix and the doc chunks of the page it returns; all of
+# them are immutable per index generation, so a warm container caches them
+# without invalidation. Shared by the fast path in main.py and app.py.
+
+MAGIC = b"CFRI"
+VERSION = 1
+POINTER_KEY = {"pk": "META", "sk": "SEARCH_INDEX"}
+MAX_LIMIT = 100
+
+# Must match ingest's tokenizer
+MIN_TERM = 2
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+STOPWORDS = frozenset(("an", "and", "as", "at", "by", "for", "from", "in", "of", "on", "or", "the", "to", "with"))
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) >= MIN_TERM and t not in STOPWORDS]
+
+
+def _varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _join(items: List[Dict[str, Any]]) -> bytes:
+    # boto3 wraps binary attributes in Binary; .value is the bytes
+    chunks = sorted(items, key=lambda item: int(item.get("chunk", 0)))
+    return zlib.decompress(b"".join(bytes(getattr(c["data"], "value", c["data"])) for c in chunks))
+
+
+class Shard:
+    """Terms sharing a prefix. Postings stay encoded until a term is asked for."""
+
+    def __init__(self, data: bytes):
+        if data[:4] != MAGIC or data[4] != VERSION:
+            raise ValueError("Not a version %d index shard" % VERSION)
+        self.data = data
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        count, pos = _varint(data, 5)
+        for _ in range(count):
+            length, pos = _varint(data, pos)
+            term = data[pos:pos + length].decode("utf-8")
+            length, pos = _varint(data, pos + length)
+            self.offsets[term] = (pos, pos + length)
+            pos += length
+        self.terms = sorted(self.offsets)
+
+    def prefixed(self, prefix: str) -> List[str]:
+        start = bisect_left(self.terms, prefix)
+        end = start
+        while end < len(self.terms) and self.terms[end].startswith(prefix):
+            end += 1
+        return self.terms[start:end]
+
+    def postings(self, term: str) -> Dict[int, int]:
+        # doc id -> weight << type_bits | type code
+        start, end = self.offsets.get(term, (0, 0))
+        result = {}
+        doc_id, pos = 0, start
+        while pos < end:
+            delta, pos = _varint(self.data, pos)
+            packed, pos = _varint(self.data, pos)
+            doc_id += delta
+            result[doc_id] = packed
+        return result
+
+
+class SearchIndex:
+    def __init__(self, table, pointer: Dict[str, Any]):
+        self.table = table
+        self.generation = str(pointer["generation"])
+        self.pk = f"SEARCH#{self.generation}"
+        self.docs = int(pointer["docs"])
+        self.docs_per_chunk = int(pointer["docs_per_chunk"])
+        self.prefix_len = int(pointer["prefix_len"])
+        self.type_bits = int(pointer["type_bits"])
+        self.doc_types = list(pointer["doc_types"])
+        self.title_ranges = {int(k): (int(v[0]), int(v[1])) for k, v in pointer.get("title_ranges", {}).items()}
+
+    @classmethod
+    def load(cls, table, data_generation: str) -> Optional["SearchIndex"]:
+        # The pointer only moves when ingest runs, which also bumps the data generation
+        key = ("pointer", data_generation)
+        index = cache.search.get(key)
+        if index is None:
+            pointer = table.get_item(Key=POINTER_KEY).get("Item")
+            index = cls(table, pointer) if pointer else False
+            cache.search.put(key, index)
+        return index or None
+
+    def shard(self, prefix: str) -> Optional[Shard]:
+        key = (self.generation, "shard", prefix)
+        shard = cache.search.get(key)
+        if shard is None:
+            from boto3.dynamodb.conditions import Key
+            kwargs = {"KeyConditionExpression": Key("pk").eq(self.pk) & Key("sk").begins_with(f"TERMS#{prefix}#")}
+            items = []
+            while True:
+                resp = self.table.query(**kwargs)
+                items.extend(resp.get("Items", []))
+                if "LastEvaluatedKey" not in resp:
+                    break
+                kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+            shard = Shard(_join(items)) if items else False
+            cache.search.put(key, shard)
+        return shard or None
+
+    def term_postings(self, term: str, prefix: bool) -> Dict[int, int]:
+        # A prefix term matches every indexed term it starts, keeping each
+        # doc's best weight
+        key = (self.generation, "postings", term, prefix)
+        postings = cache.search.get(key)
+        if postings is None:
+            shard = self.shard(term[:self.prefix_len])
+            postings = {}
+            if shard:
+                for indexed in (shard.prefixed(term) if prefix else [term]):
+                    for doc_id, packed in shard.postings(indexed).items():
+                        if packed > postings.get(doc_id, -1):
+                            postings[doc_id] = packed
+            cache.search.put(key, postings)
+        return postings
+
+    def match(self, terms: List[str], prefix: bool, types: Optional[List[str]], title_num: Optional[int]) -> List[Tuple[float, int]]:
+        # AND of all terms, smallest postings first; (score, doc id), best first.
+        # Score sums weight * idf over the terms.
+        key = (self.generation, "match", tuple(terms), prefix, tuple(types or ()), title_num)
+        ranked = cache.search.get(key)
+        if ranked is not None:
+            return ranked
+        lists = [self.term_postings(term, prefix and i == len(terms) - 1) for i, term in enumerate(terms)]
+        lists.sort(key=len)
+        candidates = set(lists[0]) if lists else set()
+        for postings in lists[1:]:
+            candidates.intersection_update(postings)
+            if not candidates:
+                break
+        if title_num is not None:
+            start, end = self.title_ranges.get(title_num, (0, 0))
+            candidates = {d for d in candidates if start <= d < end}
+        mask = (1 << self.type_bits) - 1
+        if types:
+            codes = {self.doc_types.index(t) for t in types if t in self.doc_types}
+            candidates = {d for d in candidates if lists[0][d] & mask in codes}
+        idfs = [math.log(1 + self.docs / max(1, len(postings))) for postings in lists]
+        ranked = sorted(
+            ((round(sum((postings[d] >> self.type_bits) * idf for postings, idf in zip(lists, idfs)), 4), d) for d in candidates),
+            key=lambda pair: (-pair[0], pair[1])
+        )
+        cache.search.put(key, ranked)
+        return ranked
+
+    def load_docs(self, doc_ids: List[int]) -> Dict[int, List[Any]]:
+        # doc id -> [title, path, type, label, label_description]
+        found = {}
+        for chunk_index in sorted({d // self.docs_per_chunk for d in doc_ids}):
+            key = (self.generation, "docs", chunk_index)
+            docs = cache.search.get(key)
+            if docs is None:
+                item = self.table.get_item(Key={"pk": self.pk, "sk": f"DOCS#{chunk_index:05d}"}).get("Item")
+                docs = _join([item]) if item else b"[]"
+                docs = json.loads(docs)
+                cache.search.put(key, docs)
+            base = chunk_index * self.docs_per_chunk
+            for d in doc_ids:
+                if base <= d < base + len(docs):
+                    found[d] = docs[d - base]
+        return found
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    # Raises ValueError for anything that isn't one of ours
+    offset = (paging.decode_cursor(cursor) or {}).get("offset", 0)
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def run_query(table, data_generation: str, q: str, prefix: bool = True, entity_type: Optional[str] = None,
+              title_num: Optional[int] = None, limit: int = 25, cursor: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    # One page of the /api/search response, or None when no index has been
+    # built yet. Raises ValueError for a bad cursor.
+    offset = _decode_cursor(cursor)
+    index = SearchIndex.load(table, data_generation)
+    if index is None:
+        return None
+    # Repeated terms add nothing to an AND; keep the last occurrence so the
+    # word being typed stays last for prefix matching
+    terms = list(reversed(dict.fromkeys(reversed(tokenize(q)))))
+    # A trailing space means the last word is finished
+    prefix = prefix and bool(terms) and not q.endswith(" ")
+    ranked = index.match(terms, prefix, [entity_type] if entity_type else None, title_num) if terms else []
+    limit = paging.clamp_limit(limit, MAX_LIMIT)
+    page = ranked[offset:offset + limit]
+    docs = index.load_docs([d for _, d in page])
+    results = []
+    for score, doc_id in page:
+        doc = docs.get(doc_id)
+        if doc:
+            title, path, node_type, label, description = doc
+            results.append({"title": title, "path": path, "type": node_type, "label": label,
+                            "label_description": description, "score": score})
+    return {
+        "query": q,
+        "terms": terms,
+        "prefix": prefix,
+        "results": results,
+        "count": len(results),
+        "total": len(ranked),
+        "next": paging.encode_cursor({"offset": offset + limit}) if offset + limit < len(ranked) else None,
+        "filters_applied": {"entity_type": entity_type, "title_num": title_num},
+        "index_generation": index.generation,
+    }
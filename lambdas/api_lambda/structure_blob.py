@@ -0,0 +1,152 @@
+import json
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Reader for the compact title structure written by ingest_lambda's
+# structure_blob.py (see there for the layout). Nothing is decoded up front
+# beyond the string table offsets: records are read as they are visited, and
+# the child byte length stored with every node lets whole subtrees be skipped.
+MAGIC = b"CFRT"
+VERSION = 1
+
+FLAG_RESERVED = 1
+FLAG_EXTRA = 2
+
+
+def _varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class StructureBlob:
+    def __init__(self, data: bytes, checksum: Optional[str] = None):
+        if data[:4] != MAGIC or data[4] != VERSION:
+            raise ValueError("Not a version %d structure blob" % VERSION)
+        self.data = data
+        self.checksum = checksum
+        count, pos = _varint(data, 5)
+        self._offsets: List[Tuple[int, int]] = []
+        for _ in range(count):
+            length, pos = _varint(data, pos)
+            self._offsets.append((pos, length))
+            pos += length
+        self._strings: Dict[int, str] = {}
+        self.root = pos
+
+    @classmethod
+    def from_items(cls, items: List[Dict[str, Any]]) -> Optional["StructureBlob"]:
+        # Takes the TITLE#n / BLOB#k items. Raises ValueError when they come
+        # from two different ingest runs, i.e. the read raced a rewrite.
+        if not items:
+            return None
+        chunks = sorted(items, key=lambda item: int(item["chunk"]))
+        checksum = chunks[0]["checksum"]
+        if len(chunks) != int(chunks[0]["chunks"]) or any(c["checksum"] != checksum for c in chunks):
+            raise ValueError("Structure blob chunks are from different ingest runs")
+        # boto3 wraps binary attributes in Binary; .value is the bytes
+        data = b"".join(bytes(getattr(c["data"], "value", c["data"])) for c in chunks)
+        return cls(zlib.decompress(data), checksum)
+
+    def _string(self, index: int) -> str:
+        value = self._strings.get(index)
+        if value is None:
+            start, length = self._offsets[index]
+            value = self._strings[index] = self.data[start:start + length].decode("utf-8")
+        return value
+
+    def _record(self, pos: int) -> Tuple[Dict[str, Any], int, int, int]:
+        # -> (fields, child count, offset of the first child, offset after the subtree)
+        data = self.data
+        ids = []
+        for _ in range(5):
+            value, pos = _varint(data, pos)
+            ids.append(value)
+        flags, pos = _varint(data, pos)
+        size, pos = _varint(data, pos)
+        volume_count, pos = _varint(data, pos)
+        volumes = []
+        for _ in range(volume_count):
+            value, pos = _varint(data, pos)
+            volumes.append(self._string(value))
+        fields = {
+            "entity_type": self._string(ids[0]),
+            "identifier": self._string(ids[1]),
+            "label": self._string(ids[2]),
+            "label_level": self._string(ids[3]),
+            "label_description": self._string(ids[4]),
+            "reserved": bool(flags & FLAG_RESERVED),
+            "size": size,
+            "volumes": volumes,
+        }
+        if flags & FLAG_EXTRA:
+            value, pos = _varint(data, pos)
+            fields.update(json.loads(self._string(value)))
+        child_count, pos = _varint(data, pos)
+        body_length, pos = _varint(data, pos)
+        return fields, child_count, pos, pos + body_length
+
+    def _layout(self, pos: int) -> Tuple[int, int, int]:
+        # Same as _record's last three values, skipping over the fields
+        data = self.data
+        for _ in range(5):
+            _, pos = _varint(data, pos)
+        flags, pos = _varint(data, pos)
+        _, pos = _varint(data, pos)
+        volume_count, pos = _varint(data, pos)
+        for _ in range(volume_count + (1 if flags & FLAG_EXTRA else 0)):
+            _, pos = _varint(data, pos)
+        child_count, pos = _varint(data, pos)
+        body_length, pos = _varint(data, pos)
+        return child_count, pos, pos + body_length
+
+    def _identifier(self, pos: int) -> str:
+        # Second string id of a record, without decoding the rest
+        _, pos = _varint(self.data, pos)
+        value, _ = _varint(self.data, pos)
+        return self._string(value)
+
+    def _children(self, pos: int) -> Iterator[int]:
+        count, child, _ = self._layout(pos)
+        for _ in range(count):
+            yield child
+            child = self._layout(child)[2]
+
+    def find(self, path: str) -> Optional[int]:
+        # `path` as stored on node items, e.g. "40/I/C/60"; "" is the root
+        parts = [p for p in path.split("/") if p]
+        if not parts:
+            return self.root
+        if self._identifier(self.root) != parts[0]:
+            return None
+        pos = self.root
+        for identifier in parts[1:]:
+            pos = next((c for c in self._children(pos) if self._identifier(c) == identifier), None)
+            if pos is None:
+                return None
+        return pos
+
+    def iter_nodes(self, types: Optional[set] = None, path: str = "", depth: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        # Nodes in document order, flattened like the per-node items: the
+        # node at `path` and its descendants down to `depth` levels below it.
+        # Records of other types are only walked through, not decoded.
+        start = self.find(path)
+        if start is None:
+            return
+        parts = [p for p in path.split("/") if p] or [self._identifier(self.root)]
+        limit = None if depth is None else len(parts) - 1 + depth
+        stack = [(start, "/".join(parts), len(parts) - 1)]
+        while stack:
+            pos, node_path, node_depth = stack.pop()
+            if types is None or self._string(_varint(self.data, pos)[0]) in types:
+                fields = self._record(pos)[0]
+                fields["path"] = node_path
+                fields["depth"] = node_depth
+                yield fields
+            if limit is None or node_depth < limit:
+                stack.extend(reversed([(c, f"{node_path}/{self._identifier(c)}", node_depth + 1) for c in self._children(pos)]))
@@ -0,0 +1,285 @@
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from typing import Any, Dict, Optional, Tuple
+
+# Request instrumentation for the API Lambda: per-route latency histograms,
+# DynamoDB consumed capacity and an on-demand sampling profiler. Every
+# request is logged as a CloudWatch Embedded Metric Format (EMF) line, which
+# is where fleet-wide numbers come from; /api/metrics shows this container's
+# view plus the INGEST_METRICS items ingest's telemetry.py writes. Stdlib
+# only, so main.py's fast path can use it.
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "eCFR")
+FUNCTION = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "api-local")
+EMF_ENABLED = os.environ.get("METRICS_LOGS", "true").lower() == "true"
+# Operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = frozenset((
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems",
+))
+THROTTLE_CODES = frozenset(("ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded"))
+# Histogram bucket upper bounds in ms: 20% apart from 0.1 ms to a minute,
+# so a percentile read off the buckets is within 20% of the true value
+BUCKETS_MS: Tuple[float, ...] = tuple(round(0.1 * 1.2 ** i, 3) for i in range(74))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_TOP_STACKS = 50
+# Profiles kept for /api/metrics; each is also logged in full
+PROFILES_KEPT = 5
+
+_STARTED = time.time()
+
+
+def _unit(name: str) -> str:
+    if name.endswith("_ms"):
+        return "Milliseconds"
+    if name.endswith("_bytes"):
+        return "Bytes"
+    return "Count"
+
+
+def emit(metrics: Dict[str, float], dimensions: Optional[Dict[str, str]] = None, **properties: Any) -> None:
+    # One EMF log line. Properties are logged alongside but aren't metrics.
+    if not EMF_ENABLED or not metrics:
+        return
+    dimensions = dict({"Function": FUNCTION}, **(dimensions or {}))
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": _unit(name)} for name in metrics],
+            }],
+        },
+        **dimensions,
+        **metrics,
+        **properties,
+    }, default=str))
+
+
+class Histogram:
+    """Latency distribution over fixed log-spaced buckets."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th value, capped at the max seen
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50), 2),
+            "p90_ms": round(self.percentile(0.90), 2),
+            "p99_ms": round(self.percentile(0.99), 2),
+            "max_ms": round(self.max, 2),
+        }
+
+
+class Capacity:
+    """Consumed capacity, calls, retries and throttles per DynamoDB operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[str, Dict[str, float]] = {}
+        self._indexes: Dict[str, float] = {}
+        self.units = 0.0
+
+    def record(self, operation: str, consumed: Any, retries: int, throttled: bool) -> None:
+        entries = consumed if isinstance(consumed, list) else [consumed] if consumed else []
+        with self._lock:
+            op = self._ops.setdefault(operation, {"calls": 0, "capacity_units": 0.0, "retries": 0, "throttled": 0})
+            op["calls"] += 1
+            op["retries"] += retries
+            op["throttled"] += 1 if throttled else 0
+            for entry in entries:
+                units = float(entry.get("CapacityUnits", 0))
+                op["capacity_units"] += units
+                self.units += units
+                table = entry.get("Table", {}).get("CapacityUnits")
+                if table is not None:
+                    self._indexes["table"] = self._indexes.get("table", 0.0) + float(table)
+                for name, index in entry.get("GlobalSecondaryIndexes", {}).items():
+                    self._indexes[name] = self._indexes.get(name, 0.0) + float(index.get("CapacityUnits", 0))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "capacity_units": round(self.units, 2),
+                "operations": {name: dict(op, capacity_units=round(op["capacity_units"], 2)) for name, op in self._ops.items()},
+                "by_index": {name: round(units, 2) for name, units in self._indexes.items()},
+            }
+
+
+capacity = Capacity()
+
+
+def _request_capacity(params: Dict[str, Any], model: Any, **kwargs: Any) -> None:
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "INDEXES")
+
+
+def _collect_capacity(parsed: Dict[str, Any], model: Any, **kwargs: Any) -> None:
+    if model.name in CAPACITY_OPERATIONS:
+        capacity.record(
+            model.name,
+            parsed.get("ConsumedCapacity"),
+            int(parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)),
+            parsed.get("Error", {}).get("Code") in THROTTLE_CODES,
+        )
+
+
+def instrument_dynamodb(boto3: Any) -> None:
+    # Takes the already imported module: boto3 is imported lazily to keep
+    # cold starts short. Registers on the default session, so every DynamoDB
+    # client or resource created afterwards is covered.
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    events = boto3.DEFAULT_SESSION.events
+    events.register("provide-client-params.dynamodb", _request_capacity, unique_id="telemetry-capacity-request")
+    events.register("after-call.dynamodb", _collect_capacity, unique_id="telemetry-capacity-collect")
+
+
+class Profiler:
+    """Statistical profiler: a background thread samples every other
+    thread's stack at a fixed interval and counts identical stacks.
+
+    Idle pool workers are skipped, so the counts show where time went
+    rather than where threads waited for work.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._started = 0.0
+
+    def start(self) -> "Profiler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.reverse()
+                # A pool worker blocked on its work queue is idle
+                if len(stack) > 1 and stack[-1].startswith(("threading.py:", "queue.py:")) and any(
+                        s.endswith("thread.py:_worker") for s in stack):
+                    continue
+                self._stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self) -> Dict[str, Any]:
+        # Collapsed stacks ("a;b;c" -> samples), the input flame graph tools take
+        self._stop.set()
+        self._thread.join()
+        return {
+            "duration_ms": round((time.perf_counter() - self._started) * 1000, 1),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stacks": [[stack, count] for stack, count in self._stacks.most_common(PROFILE_TOP_STACKS)],
+        }
+
+
+class Requests:
+    """Per-route latency histograms for this container."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Histogram] = {}
+        self._statuses: Dict[str, Counter] = {}
+        self.profiles: deque = deque(maxlen=PROFILES_KEPT)
+        self.invocations = 0
+
+    def record(self, route: str, status: int, ms: float) -> None:
+        with self._lock:
+            self._routes.setdefault(route, Histogram()).add(ms)
+            self._statuses.setdefault(route, Counter())[f"{status // 100}xx"] += 1
+            self.invocations += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {route: dict(hist.summary(), statuses=dict(self._statuses[route]))
+                    for route, hist in sorted(self._routes.items())}
+
+
+requests = Requests()
+# The FastAPI route template of the request app.py just answered, set by its
+# middleware; one Lambda container handles one request at a time
+_matched: Dict[str, Optional[str]] = {"route": None}
+
+
+def match_route(template: Optional[str]) -> None:
+    _matched["route"] = template
+
+
+def take_route() -> Optional[str]:
+    route, _matched["route"] = _matched["route"], None
+    return route
+
+
+def record_request(method: str, route: str, status: int, ms: float, capacity_units: float,
+                   profile: Optional[Dict[str, Any]] = None, request_id: str = "") -> None:
+    label = f"{method} {route}"
+    requests.record(label, status, ms)
+    cold = requests.invocations == 1
+    emit({"latency_ms": round(ms, 2), "capacity_units": round(capacity_units, 2)}, {"Route": label},
+         status=status, cold_start=cold, request_id=request_id)
+    if profile is not None:
+        profile = dict(profile, route=label, request_id=request_id, at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+        requests.profiles.append(profile)
+        print(json.dumps({"profile": profile}))
+
+
+def container() -> Dict[str, Any]:
+    return {
+        "function": FUNCTION,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(_STARTED)),
+        "uptime_s": round(time.time() - _STARTED, 1),
+        "invocations": requests.invocations,
+    }
+
+
+def snapshot(profiles: bool = False) -> Dict[str, Any]:
+    # This container's numbers; the EMF logs hold every container's
+    body: Dict[str, Any] = {
+        "container": container(),
+        "routes": requests.snapshot(),
+        "dynamodb": capacity.snapshot(),
+    }
+    if profiles:
+        body["profiles"] = list(requests.profiles)
+    return body
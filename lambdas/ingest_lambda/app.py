@@ -1,35 +1,166 @@
 import os
 import json
+import time
 import hashlib
+import re
+import tempfile
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Dict, List, Any
+from typing import BinaryIO, Callable, Dict, Iterable, List, Any, Optional, Tuple
 
 import boto3
-import requests
+from boto3.dynamodb.conditions import Key
+
+from batch_writer import BatchWriter, thread_resource
+from ecfr_client import EcfrClient
+from download_cache import DownloadCache, open_store
+from merkle import TreeNode, agency_checksum, iter_tree, ref_unit_key
+from structure_blob import TreeEncoder, blob_items, blob_sk
+from structure_stream import TreeTally, iter_json_tree
+from fulltext import agency_word_count, count_title_words
+from text_metrics import Metric, enabled as enabled_metrics, finalize as finalize_metrics, merge as merge_metrics
+from search_index import INDEX_VERSION, IndexBuilder, fragment_sk, read_fragment
+from structure_diff import Snapshot, diff_snapshots, fit_item
+from rollups import RANK_METRICS, agency_rollup, iter_agencies, rank_sk, ranking_items
+import telemetry
+from history import affected_buckets, agency_contributions, bucket_versions, history_item, history_sk, merge_agency_item
 
 table_name = os.environ["DDB_TABLE"]
 ecfr_base = os.environ.get("ECFR_BASE_URL", "https://www.ecfr.gov/api")
+write_workers = int(os.environ.get("DDB_WRITE_WORKERS", "8"))
+fetch_concurrency = int(os.environ.get("ECFR_FETCH_CONCURRENCY", "8"))
+ingest_mode = os.environ.get("INGEST_MODE", "incremental")
+word_counts_enabled = os.environ.get("INGEST_WORD_COUNTS", "false").lower() == "true"
+# Full-text documents run to hundreds of MB, so fewer of them are parsed at once
+fulltext_concurrency = int(os.environ.get("ECFR_FULLTEXT_CONCURRENCY", "2"))
+history_enabled = os.environ.get("INGEST_HISTORY", "true").lower() == "true"
+# Custom text metrics measured in the word count pass: "all", "none" or a list
+metric_names = os.environ.get("INGEST_METRICS", "all")
+# Section results per METRICS#<part>#SECTIONS#k item, well under the item size limit
+SECTIONS_PER_ITEM = 400
+# "nodes": one item per structure node. "blob": each title's tree as compressed
+# BLOB#k chunks, with node items kept only for the referenceable units.
+structure_storage = os.environ.get("STRUCTURE_STORAGE", "nodes")
+# Bumped when node items gain attributes; titles stored under an older layout
+# are re-stored by the next incremental run. 2: tree_key and depth.
+# 3: UNIT_STATS item for agency rollups. 4: SEARCH#k search index fragments.
+# 5: level_key. 6: no tree_key; level-index serves whole subtrees too.
+STRUCTURE_LAYOUT = 6
+# Raw download cache: a local directory or s3://bucket/prefix; unset disables it
+download_cache_spec = os.environ.get("ECFR_CACHE", "")
+download_cache_max_mb = int(os.environ.get("ECFR_CACHE_MAX_MB", "512"))
+# Seconds a cached body is trusted without revalidating; 0 always revalidates
+download_cache_max_age = float(os.environ.get("ECFR_CACHE_MAX_AGE", "0"))
+# Structure bodies are spooled to /tmp past this size while they wait to be parsed
+structure_spool_bytes = int(os.environ.get("STRUCTURE_SPOOL_KB", "1024")) * 1024
+# Static dashboard publisher (api_lambda/publish.py), invoked after runs that changed data
+publish_function = os.environ.get("PUBLISH_FUNCTION_NAME", "")
+# Hashed title structures kept by a warm container for diffs, e.g. A..B then B..C
+snapshot_cache_size = int(os.environ.get("DIFF_SNAPSHOT_CACHE", "4"))
+# INGEST_METRICS items (one per invocation) expire through the table's TTL
+metrics_ttl_days = int(os.environ.get("INGEST_METRICS_TTL_DAYS", "30"))
+ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
+# Before any DynamoDB client exists, so every call reports its consumed capacity
+telemetry.instrument_dynamodb()
 ddb = boto3.resource("dynamodb")
 table = ddb.Table(table_name)
 
+# Module level so keep-alive connections survive warm invocations
+ecfr = EcfrClient(
+    ecfr_base,
+    pool_size=fetch_concurrency,
+    cache=DownloadCache(
+        open_store(download_cache_spec),
+        max_bytes=download_cache_max_mb * 1024 * 1024,
+        max_age=download_cache_max_age,
+    ) if download_cache_spec else None,
+)
+
 def fetch_agencies() -> Dict[str, Any]:
-    url = f"{ecfr_base}/admin/v1/agencies.json"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return ecfr.get_json("admin/v1/agencies.json")
 
 def fetch_titles() -> Dict[str, Any]:
-    url = f"{ecfr_base}/versioner/v1/titles.json"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return ecfr.get_json("versioner/v1/titles.json")
 
 def fetch_title_structure(title_num: int, date: str = "2024-01-01") -> Dict[str, Any]:
-    url = f"{ecfr_base}/versioner/v1/structure/{date}/title-{title_num}.json"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return ecfr.get_json(f"versioner/v1/structure/{date}/title-{title_num}.json")
+
+def download_title_structure(title_num: int, sink: BinaryIO, date: str = "2024-01-01") -> str:
+    # The raw document, for structure_stream to parse; returns its sha256
+    return ecfr.download(f"versioner/v1/structure/{date}/title-{title_num}.json", sink)
+
+def fetch_title_word_counts(title_num: int, date: str, metrics: List[Metric] = ()) -> Dict[str, Any]:
+    # The body is parsed straight off the socket and never held in memory
+    r = ecfr.get(f"versioner/v1/full/{date}/title-{title_num}.xml", stream=True)
+    try:
+        r.raw.decode_content = True
+        return count_title_words(r.raw, metrics)
+    finally:
+        r.close()
+
+def fetch_title_versions(title_num: int) -> List[Dict[str, Any]]:
+    return ecfr.get_json(f"versioner/v1/versions/title-{title_num}.json").get("content_versions", [])
+
+def title_date(title: Dict[str, Any]) -> Optional[str]:
+    return title.get("up_to_date_as_of") or title.get("latest_issue_date")
+
+
+def load_stored_items(keys: List[Dict[str, str]], attributes: List[str]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    # BatchGetItem in chunks of 100, projecting only what the caller compares
+    names = {f"#a{i}": name for i, name in enumerate(["pk", "sk"] + attributes)}
+    found = {}
+    for start in range(0, len(keys), 100):
+        request = {table_name: {
+            "Keys": keys[start:start + 100],
+            "ProjectionExpression": ", ".join(names),
+            "ExpressionAttributeNames": names,
+        }}
+        attempt = 0
+        while request:
+            resp = ddb.batch_get_item(RequestItems=request)
+            for item in resp.get("Responses", {}).get(table_name, []):
+                found[(item["pk"], item["sk"])] = item
+            request = resp.get("UnprocessedKeys") or None
+            if request:
+                time.sleep(min(5.0, 0.05 * (2 ** attempt)))
+                attempt += 1
+    return found
+
+
+def load_title_node_checksums(title_num: int) -> Dict[str, str]:
+    # Runs on fetch worker threads, so it uses a thread-local resource
+    node_table = thread_resource().Table(table_name)
+    kwargs = {
+        "KeyConditionExpression": Key("pk").eq(f"TITLE#{title_num}"),
+        "ProjectionExpression": "sk, checksum, #path, level_key, tree_key",
+        "ExpressionAttributeNames": {"#path": "path"},
+    }
+    checksums = {}
+    while True:
+        resp = node_table.query(**kwargs)
+        for item in resp.get("Items", []):
+            # Only structure nodes carry a path; METADATA and friends are left alone
+            if "path" in item:
+                # Nodes from before layout 6 (no level_key, or a leftover
+                # tree_key) never match, so they are rewritten
+                current = "level_key" in item and "tree_key" not in item
+                checksums[item["sk"]] = item.get("checksum") if current else None
+        if "LastEvaluatedKey" not in resp:
+            return checksums
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def title_changed(title: Dict[str, Any], stored: Optional[Dict[str, Any]]) -> bool:
+    if not stored:
+        return True
+    return (
+        stored.get("latest_amended_on") != title.get("latest_amended_on")
+        or stored.get("up_to_date_as_of") != title.get("up_to_date_as_of")
+        # Switching STRUCTURE_STORAGE or STRUCTURE_LAYOUT re-stores every title once
+        or stored.get("structure_storage", "nodes") != structure_storage
+        or stored.get("structure_layout", 1) != STRUCTURE_LAYOUT
+    )
 
 
 def compute_checksum(data: Any) -> str:
@@ -37,7 +168,7 @@ def compute_checksum(data: Any) -> str:
     return hashlib.sha256(json_str.encode("utf-8")).hexdigest()
 
 
-def store_agency_data(agency: Dict[str, Any]) -> Dict[str, Any]:
+def store_agency_data(agency: Dict[str, Any], writer: BatchWriter) -> Dict[str, Any]:
     now = datetime.now(timezone.utc)
     date_str = now.strftime("%Y-%m-%d")
     
@@ -45,6 +176,8 @@ def store_agency_data(agency: Dict[str, Any]) -> Dict[str, Any]:
         "pk": f"AGENCY#{agency['slug']}",
         "sk": "METADATA",
         "entity_type": "agency",
+        # list-index key: only listable items carry it, so the index stays sparse
+        "list_type": "agency",
         "name": agency["name"],
         "short_name": agency.get("short_name", ""),
         "display_name": agency["display_name"],
@@ -53,10 +186,10 @@ def store_agency_data(agency: Dict[str, Any]) -> Dict[str, Any]:
         "updated_date": date_str,
         "checksum": compute_checksum(agency)
     }
-    table.put_item(Item=item)
+    writer.put(item)
     return item
 
-def store_title_data(title: Dict[str, Any]) -> Dict[str, Any]:
+def store_title_data(title: Dict[str, Any], writer: BatchWriter) -> Dict[str, Any]:
     now = datetime.now(timezone.utc)
     date_str = now.strftime("%Y-%m-%d")
     
@@ -64,29 +197,45 @@ def store_title_data(title: Dict[str, Any]) -> Dict[str, Any]:
         "pk": f"TITLE#{title['number']}",
         "sk": "METADATA",
         "entity_type": "title",
+        "list_type": "title",
         "number": title["number"],
         "name": title["name"],
         "latest_amended_on": title.get("latest_amended_on"),
         "latest_issue_date": title.get("latest_issue_date"),
         "up_to_date_as_of": title.get("up_to_date_as_of"),
         "reserved": title.get("reserved", False),
+        "structure_storage": structure_storage,
+        "structure_layout": STRUCTURE_LAYOUT,
         "updated_date": date_str,
         "checksum": compute_checksum(title)
     }
-    table.put_item(Item=item)
+    writer.put(item)
     return item
 
-def store_title_structure(title_num: int, structure: Dict[str, Any]) -> List[Dict[str, Any]]:
+def store_title_structure(
+    title_num: int,
+    nodes: Iterable[TreeNode],
+    writer: BatchWriter,
+    existing: Optional[Dict[str, str]] = None,
+) -> Dict[str, int]:
+    # `nodes` comes from merkle.iter_tree or structure_stream and is consumed
+    # once. With `existing` (sk -> stored checksum) only changed nodes are
+    # written; every node seen is popped from it, and whatever is left over
+    # has vanished and is deleted.
     now = datetime.now(timezone.utc)
     date_str = now.strftime("%Y-%m-%d")
-    stored_items = []
+    counts = {"written": 0, "unchanged": 0, "deleted": 0}
     
-    def process_node(node: Dict[str, Any], parent_path: str = ""):
-        current_path = f"{parent_path}/{node['identifier']}" if parent_path else node['identifier']
+    for tree_node in nodes:
+        node = tree_node.node
+        sk = f"{node['type'].upper()}#{tree_node.path}"
+        if existing is not None and existing.pop(sk, None) == tree_node.checksum:
+            counts["unchanged"] += 1
+            continue
         
         item = {
             "pk": f"TITLE#{title_num}",
-            "sk": f"{node['type'].upper()}#{current_path}",
+            "sk": sk,
             "entity_type": node['type'],
             "identifier": node['identifier'],
             "label": node['label'],
@@ -95,21 +244,706 @@ def store_title_structure(title_num: int, structure: Dict[str, Any]) -> List[Dic
             "reserved": node.get('reserved', False),
             "size": node.get('size', 0),
             "volumes": node.get('volumes', []),
-            "path": current_path,
+            "path": tree_node.path,
+            # level-index sort key: the nodes at one depth below a path share
+            # the "<depth>#<path>/" prefix, so each level of a subtree is one
+            # contiguous range
+            "level_key": f"{tree_node.depth:03d}#{tree_node.path}/",
+            "depth": tree_node.depth,
             "updated_date": date_str,
-            "checksum": compute_checksum(node)
+            "checksum": tree_node.checksum
         }
-        
-        table.put_item(Item=item)
-        stored_items.append(item)
-        
-        for child in node.get('children', []):
-            process_node(child, current_path)
+        writer.put(item)
+        counts["written"] += 1
+    
+    for sk in existing or {}:
+        writer.delete({"pk": f"TITLE#{title_num}", "sk": sk})
+        counts["deleted"] += 1
+    return counts
+
+def store_title_blob(
+    title_num: int,
+    nodes: Iterable[TreeNode],
+    writer: BatchWriter,
+    existing: Optional[Dict[str, str]] = None,
+    previous_chunks: int = 0,
+) -> Dict[str, int]:
+    # Blob storage mode: the full tree goes into a handful of chunk items.
+    # Node items are kept for the units agencies reference, which the
+    # chapter/part listings and point lookups read directly; section-level
+    # items from an earlier "nodes" run drop out through `existing`.
+    now = datetime.now(timezone.utc)
+    date_str = now.strftime("%Y-%m-%d")
+    encoder = TreeEncoder()
+    counts = store_title_structure(title_num, (n for n in encoder.tap(nodes) if n.unit), writer, existing)
+    chunks = blob_items(title_num, encoder, date_str)
+    for item in chunks:
+        writer.put(item)
+    # A smaller blob leaves chunks of the previous one behind
+    for k in range(len(chunks), previous_chunks):
+        writer.delete({"pk": f"TITLE#{title_num}", "sk": blob_sk(k)})
+        counts["deleted"] += 1
+    counts["blob_chunks"] = len(chunks)
+    counts["blob_bytes"] = sum(len(item["data"]) for item in chunks)
+    return counts
+
+def store_title_tree(
+    title_num: int,
+    nodes: Iterable[TreeNode],
+    source: str,
+    writer: BatchWriter,
+    existing: Optional[Dict[str, str]],
+    previous: Dict[str, Any],
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    # One pass over a streamed title: node items (or blob chunks) are written
+    # as the nodes arrive, and only the tally the SUMMARY, UNIT_STATS and
+    # search fragment are built from is kept. `previous` is the stored SUMMARY.
+    tally = TreeTally()
+    nodes = tally.tap(nodes)
+    if structure_storage == "blob":
+        counts = store_title_blob(title_num, nodes, writer, existing, int(previous.get("blob_chunks", 0)))
+    else:
+        counts = store_title_structure(title_num, nodes, writer, existing)
+    summary = build_title_summary(title_num, tally, source)
+    if structure_storage == "blob":
+        summary["blob_chunks"] = counts["blob_chunks"]
+    summary["search_chunks"] = store_search_fragment(title_num, tally, writer, int(previous.get("search_chunks", 0)))
+    writer.put(summary)
+    writer.put(build_unit_stats(title_num, tally))
+    return summary, counts
+
+def build_title_summary(title_num: int, tally: TreeTally, source: str) -> Dict[str, Any]:
+    # Root Merkle hash plus the hash of every unit agencies can reference.
+    # `source` is the sha256 of the structure document it was parsed from.
+    now = datetime.now(timezone.utc)
+    return {
+        "pk": f"TITLE#{title_num}",
+        "sk": "SUMMARY",
+        "entity_type": "title_summary",
+        "title_number": title_num,
+        "checksum": tally.checksum,
+        "units": tally.units,
+        "part_scopes": tally.part_scopes,
+        "nodes": tally.nodes,
+        "source": source,
+        "storage": structure_storage,
+        "layout": STRUCTURE_LAYOUT,
+        "updated_date": now.strftime("%Y-%m-%d")
+    }
+
+def build_unit_stats(title_num: int, tally: TreeTally) -> Dict[str, Any]:
+    # Kept apart from SUMMARY, which is already large for big titles
+    now = datetime.now(timezone.utc)
+    return {
+        "pk": f"TITLE#{title_num}",
+        "sk": "UNIT_STATS",
+        "title_number": title_num,
+        "units": tally.unit_stats,
+        "updated_date": now.strftime("%Y-%m-%d")
+    }
+
+def store_agency_checksums(
+    agencies: List[Dict[str, Any]],
+    units_by_title: Dict[int, Dict[str, str]],
+    writer: BatchWriter,
+    stored: Dict[Tuple[str, str], Dict[str, Any]],
+) -> int:
+    now = datetime.now(timezone.utc)
+    date_str = now.strftime("%Y-%m-%d")
+    written = 0
+    for agency in agencies:
+        refs = agency.get("cfr_references", [])
+        checksum, missing = agency_checksum(refs, units_by_title)
+        key = (f"AGENCY#{agency['slug']}", "CHECKSUM")
+        if stored.get(key, {}).get("checksum") == checksum:
+            continue
+        writer.put({
+            "pk": key[0],
+            "sk": key[1],
+            "entity_type": "agency_checksum",
+            "agency_slug": agency["slug"],
+            "checksum": checksum,
+            "references": len(refs),
+            "unresolved_references": missing,
+            "updated_date": date_str
+        })
+        written += 1
+    return written
+
+def load_metric_keys(title_num: int) -> set:
+    # Sort keys of a title's stored METRICS items
+    kwargs = {
+        "KeyConditionExpression": Key("pk").eq(f"TITLE#{title_num}") & Key("sk").begins_with("METRICS"),
+        "ProjectionExpression": "sk",
+    }
+    keys = set()
+    while True:
+        resp = table.query(**kwargs)
+        keys.update(item["sk"] for item in resp.get("Items", []))
+        if "LastEvaluatedKey" not in resp:
+            return keys
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def title_metric_items(title: Dict[str, Any], measured: Dict[str, Any], date_str: str) -> List[Dict[str, Any]]:
+    # `measured` is the "metrics" part of count_title_words' result. Items:
+    #   METRICS                    title totals
+    #   METRICS#<unit>             one per subtitle/chapter/subchapter/part
+    #   METRICS#<part>#SECTIONS#k  section results, SECTIONS_PER_ITEM at a time
+    # Counters are kept next to the results so agencies can be rolled up
+    # exactly. Only the title item has an entity_type.
+    pk = f"TITLE#{title['number']}"
+    items = [{
+        "pk": pk,
+        "sk": "METRICS",
+        "entity_type": "title_metrics",
+        "title_number": title["number"],
+        "metrics": finalize_metrics(measured["title"]),
+        "counters": measured["title"],
+        "latest_amended_on": title.get("latest_amended_on"),
+        "as_of": title_date(title),
+        "updated_date": date_str
+    }]
+    for unit, counters in measured["units"].items():
+        sections = sorted(measured["sections"].get(unit, {}).items())
+        chunks = [sections[i:i + SECTIONS_PER_ITEM] for i in range(0, len(sections), SECTIONS_PER_ITEM)]
+        items.append({
+            "pk": pk,
+            "sk": f"METRICS#{unit}",
+            "title_number": title["number"],
+            "unit": unit,
+            "metrics": finalize_metrics(counters),
+            "counters": counters,
+            "section_chunks": len(chunks),
+            "updated_date": date_str
+        })
+        for k, chunk in enumerate(chunks):
+            items.append({
+                "pk": pk,
+                "sk": f"METRICS#{unit}#SECTIONS#{k:04d}",
+                "title_number": title["number"],
+                "unit": unit,
+                "sections": {section: finalize_metrics(c) for section, c in chunk},
+                "updated_date": date_str
+            })
+    return items
+
+
+def store_word_counts(
+    titles: List[Dict[str, Any]],
+    agencies: List[Dict[str, Any]],
+    writer: BatchWriter,
+    incremental: bool,
+    concurrency: int,
+    wanted: Optional[set] = None,
+    recount: bool = True,
+    stop: Optional[Callable[[], bool]] = None,
+    done: Optional[List[int]] = None,
+    metrics: Optional[List[Metric]] = None,
+) -> Dict[str, int]:
+    # Full-text word counts per unit, recomputed only for titles amended since
+    # the last count, then rolled up to agencies through cfr_references.
+    # recount=False only rolls up the stored title counts; `stop` and `done`
+    # let a shard worker end early and record the titles it counted.
+    # The custom text metrics (INGEST_METRICS) ride along in the same pass.
+    now = datetime.now(timezone.utc)
+    date_str = now.strftime("%Y-%m-%d")
+    metrics = enabled_metrics(metric_names) if metrics is None else metrics
+    names = sorted(m.name for m in metrics)
+    counts = {"titles": 0, "agencies": 0, "failed": 0, "metric_items": 0}
+    stored = load_stored_items(
+        [{"pk": f"TITLE#{t['number']}", "sk": "WORDCOUNT"} for t in titles]
+        + [{"pk": f"AGENCY#{a['slug']}", "sk": "WORDCOUNT"} for a in agencies],
+        ["latest_amended_on", "units", "word_count", "metrics"]
+    )
+    units_by_title = {}
+    # Unit metric counters of the titles recounted here; the rest are read back for the agency rollup
+    metric_units_by_title: Dict[int, Dict[str, Dict[str, Dict[str, int]]]] = {}
+    pending = []
+    for title in titles:
+        previous = stored.get((f"TITLE#{title['number']}", "WORDCOUNT"))
+        if previous:
+            units_by_title[title["number"]] = previous.get("units", {})
+        if not recount or title.get("reserved") or not title_date(title) or (wanted and title["number"] not in wanted):
+            continue
+        if (
+            not incremental or not previous
+            or previous.get("latest_amended_on") != title.get("latest_amended_on")
+            # A newly enabled metric needs the text once more
+            or sorted(previous.get("metrics", [])) != names
+        ):
+            pending.append(title)
+    
+    for title, result, error in ecfr.map(
+        lambda t: fetch_title_word_counts(t["number"], title_date(t), metrics), pending, concurrency=concurrency
+    ):
+        if stop and stop():
+            break
+        if error:
+            telemetry.error("word_counts", f"Failed to count words for title {title['number']}: {error}", title=title["number"])
+            counts["failed"] += 1
+            continue
+        if metrics:
+            items = title_metric_items(title, result["metrics"], date_str)
+            for item in items:
+                writer.put(item)
+            for sk in load_metric_keys(title["number"]) - {item["sk"] for item in items}:
+                writer.delete({"pk": f"TITLE#{title['number']}", "sk": sk})
+            metric_units_by_title[title["number"]] = result["metrics"]["units"]
+            counts["metric_items"] += len(items)
+        writer.put({
+            "pk": f"TITLE#{title['number']}",
+            "sk": "WORDCOUNT",
+            "entity_type": "title_word_count",
+            "title_number": title["number"],
+            "word_count": result["total"],
+            "units": result["units"],
+            "metrics": names,
+            "latest_amended_on": title.get("latest_amended_on"),
+            "as_of": title_date(title),
+            "updated_date": date_str
+        })
+        units_by_title[title["number"]] = result["units"]
+        counts["titles"] += 1
+        # Only titles that succeeded are checkpointed; a resumed shard retries the rest
+        if done is not None:
+            done.append(title["number"])
     
-    process_node(structure)
-    return stored_items
+    for agency in agencies:
+        total, by_title = agency_word_count(agency.get("cfr_references", []), units_by_title)
+        previous = stored.get((f"AGENCY#{agency['slug']}", "WORDCOUNT"))
+        if incremental and previous and previous.get("word_count") == total:
+            continue
+        writer.put({
+            "pk": f"AGENCY#{agency['slug']}",
+            "sk": "WORDCOUNT",
+            "entity_type": "agency_word_count",
+            "agency_slug": agency["slug"],
+            "word_count": total,
+            "by_title": by_title,
+            "updated_date": date_str
+        })
+        counts["agencies"] += 1
+    
+    if metrics and agencies:
+        counts["agency_metrics"] = store_agency_metrics(agencies, metric_units_by_title, writer, incremental, date_str)
+    return counts
+
+def store_agency_metrics(
+    agencies: List[Dict[str, Any]],
+    metric_units_by_title: Dict[int, Dict[str, Dict[str, Dict[str, int]]]],
+    writer: BatchWriter,
+    incremental: bool,
+    date_str: str,
+) -> int:
+    # Sums the counters of every unit an agency references, once per unit,
+    # like agency_word_count. Units of titles not recounted in this run are
+    # read from their METRICS#<unit> items.
+    refs = {
+        agency["slug"]: {(ref.get("title"), ref_unit_key(ref)) for ref in agency.get("cfr_references", []) if ref_unit_key(ref)}
+        for agency in agencies
+    }
+    missing = {
+        (title_num, unit) for units in refs.values() for title_num, unit in units
+        if unit not in metric_units_by_title.get(title_num, {})
+    }
+    stored = load_stored_items(
+        [{"pk": f"TITLE#{title_num}", "sk": f"METRICS#{unit}"} for title_num, unit in sorted(missing, key=str)]
+        + [{"pk": f"AGENCY#{slug}", "sk": "METRICS"} for slug in refs],
+        ["counters"]
+    )
+    written = 0
+    for agency in agencies:
+        counters: Dict[str, Dict[str, int]] = {}
+        for title_num, unit in refs[agency["slug"]]:
+            unit_counters = metric_units_by_title.get(title_num, {}).get(unit)
+            if unit_counters is None:
+                unit_counters = stored.get((f"TITLE#{title_num}", f"METRICS#{unit}"), {}).get("counters", {})
+            merge_metrics(counters, unit_counters)
+        previous = stored.get((f"AGENCY#{agency['slug']}", "METRICS"))
+        if incremental and previous and previous.get("counters") == counters:
+            continue
+        writer.put({
+            "pk": f"AGENCY#{agency['slug']}",
+            "sk": "METRICS",
+            "entity_type": "agency_metrics",
+            "agency_slug": agency["slug"],
+            "metrics": finalize_metrics(counters),
+            "counters": counters,
+            "units": len(refs[agency["slug"]]),
+            "updated_date": date_str
+        })
+        written += 1
+    return written
+
+def index_agencies_by_unit(agencies: List[Dict[str, Any]]) -> Dict[Tuple[int, str], List[str]]:
+    agencies_by_unit: Dict[Tuple[int, str], List[str]] = {}
+    for agency in agencies:
+        for ref in agency.get("cfr_references", []):
+            key = ref_unit_key(ref)
+            if key and ref.get("title"):
+                agencies_by_unit.setdefault((ref["title"], key), []).append(agency["slug"])
+    return agencies_by_unit
+
+def merge_agency_history(
+    agency_stats: Dict[Tuple[str, Tuple[str, str]], Dict[int, Dict[str, Any]]],
+    writer: BatchWriter,
+    date_str: str,
+) -> int:
+    stored = load_stored_items(
+        [{"pk": f"AGENCY#{slug}", "sk": history_sk(*bucket)} for slug, bucket in agency_stats],
+        ["by_title"]
+    )
+    for (slug, bucket), title_stats in agency_stats.items():
+        previous = stored.get((f"AGENCY#{slug}", history_sk(*bucket)))
+        writer.put(merge_agency_item(slug, bucket, title_stats, previous, date_str))
+    return len(agency_stats)
+
+def store_history(
+    titles: List[Dict[str, Any]],
+    agencies: List[Dict[str, Any]],
+    part_scopes_by_title: Dict[int, Dict[str, List[str]]],
+    writer: BatchWriter,
+    incremental: bool,
+    wanted: Optional[set] = None,
+    run_id: Optional[str] = None,
+    stop: Optional[Callable[[], bool]] = None,
+    done: Optional[List[int]] = None,
+) -> Dict[str, int]:
+    # Append-only change history. Each title keeps a HISTORY cursor with the
+    # last version date seen; only buckets touched by newer versions are
+    # (re)computed, and day buckets before the cursor are never rewritten.
+    # Sharded runs pass no agencies and tag cursors with run_id instead, so
+    # the agency buckets are merged once by store_agency_history.
+    now = datetime.now(timezone.utc)
+    date_str = now.strftime("%Y-%m-%d")
+    counts = {"titles": 0, "buckets": 0, "agency_buckets": 0, "failed": 0}
+    cursors = load_stored_items(
+        [{"pk": f"TITLE#{t['number']}", "sk": "HISTORY"} for t in titles],
+        ["last_date", "latest_amended_on", "run_id", "previous_last_date"]
+    )
+    pending = []
+    for title in titles:
+        if title.get("reserved") or (wanted and title["number"] not in wanted):
+            continue
+        cursor = cursors.get((f"TITLE#{title['number']}", "HISTORY"))
+        if not incremental or not cursor or cursor.get("latest_amended_on") != title.get("latest_amended_on"):
+            pending.append(title)
+    
+    agencies_by_unit = index_agencies_by_unit(agencies)
+    agency_stats: Dict[Tuple[str, Tuple[str, str]], Dict[int, Dict[str, Any]]] = {}
+    cursor_items = []
+    for title, versions, error in ecfr.map(lambda t: fetch_title_versions(t["number"]), pending):
+        if stop and stop():
+            break
+        if error:
+            telemetry.error("history", f"Failed to fetch versions for title {title['number']}: {error}", title=title["number"])
+            counts["failed"] += 1
+            continue
+        title_num = title["number"]
+        cursor = cursors.get((f"TITLE#{title_num}", "HISTORY"), {})
+        only = affected_buckets(versions, cursor.get("last_date") if incremental else None)
+        for bucket, stats in bucket_versions(versions, only).items():
+            writer.put(history_item(f"TITLE#{title_num}", bucket, stats, date_str))
+            counts["buckets"] += 1
+        contributions = agency_contributions(
+            title_num, versions, only, part_scopes_by_title.get(title_num, {}), agencies_by_unit
+        )
+        for key, stats in contributions.items():
+            agency_stats.setdefault(key, {})[title_num] = stats
+        cursor_item = {
+            "pk": f"TITLE#{title_num}",
+            "sk": "HISTORY",
+            "entity_type": "history_cursor",
+            "last_date": max((v["date"] for v in versions), default=cursor.get("last_date")),
+            "latest_amended_on": title.get("latest_amended_on"),
+            "updated_date": date_str
+        }
+        if run_id:
+            # Where this run started from, kept across retries within the run
+            cursor_item["run_id"] = run_id
+            cursor_item["previous_last_date"] = (
+                cursor.get("previous_last_date") if cursor.get("run_id") == run_id else cursor.get("last_date")
+            )
+        cursor_items.append(cursor_item)
+        counts["titles"] += 1
+        if done is not None:
+            done.append(title_num)
+    
+    counts["agency_buckets"] = merge_agency_history(agency_stats, writer, date_str)
+    
+    # Cursors move only after the buckets they cover are written
+    writer.flush()
+    for item in cursor_items:
+        writer.put(item)
+    return counts
+
+def store_agency_history(
+    run_id: str,
+    titles: List[Dict[str, Any]],
+    agencies: List[Dict[str, Any]],
+    part_scopes_by_title: Dict[int, Dict[str, List[str]]],
+    writer: BatchWriter,
+    incremental: bool,
+) -> Dict[str, int]:
+    # Agency side of a sharded history run. Titles whose cursor this run moved
+    # are re-read from their starting point and merged in one pass, so shards
+    # never race on the same agency bucket.
+    now = datetime.now(timezone.utc)
+    date_str = now.strftime("%Y-%m-%d")
+    counts = {"titles": 0, "agency_buckets": 0, "failed": 0}
+    cursors = load_stored_items(
+        [{"pk": f"TITLE#{t['number']}", "sk": "HISTORY"} for t in titles],
+        ["run_id", "previous_last_date"]
+    )
+    changed = [
+        t for t in titles
+        if cursors.get((f"TITLE#{t['number']}", "HISTORY"), {}).get("run_id") == run_id
+    ]
+    agencies_by_unit = index_agencies_by_unit(agencies)
+    agency_stats: Dict[Tuple[str, Tuple[str, str]], Dict[int, Dict[str, Any]]] = {}
+    for title, versions, error in ecfr.map(lambda t: fetch_title_versions(t["number"]), changed):
+        if error:
+            telemetry.error("history", f"Failed to fetch versions for title {title['number']}: {error}", title=title["number"])
+            counts["failed"] += 1
+            continue
+        title_num = title["number"]
+        after = cursors[(f"TITLE#{title_num}", "HISTORY")].get("previous_last_date")
+        only = affected_buckets(versions, after if incremental else None)
+        contributions = agency_contributions(
+            title_num, versions, only, part_scopes_by_title.get(title_num, {}), agencies_by_unit
+        )
+        for key, stats in contributions.items():
+            agency_stats.setdefault(key, {})[title_num] = stats
+        counts["titles"] += 1
+    counts["agency_buckets"] = merge_agency_history(agency_stats, writer, date_str)
+    return counts
 
-def create_agency_title_mapping(agency: Dict[str, Any]) -> List[Dict[str, Any]]:
+def store_agency_rollups(
+    titles: List[Dict[str, Any]],
+    agencies: List[Dict[str, Any]],
+    writer: BatchWriter,
+    incremental: bool,
+) -> Dict[str, int]:
+    # Runs after structures (and word counts, when enabled) are stored: the
+    # rollups read back every title's UNIT_STATS, SUMMARY and WORDCOUNT.
+    # Sub-agencies get their own rollups and count towards their parent's.
+    now = datetime.now(timezone.utc)
+    date_str = now.strftime("%Y-%m-%d")
+    writer.flush()
+    title_keys = [t for t in titles if not t.get("reserved")]
+    stored_titles = load_stored_items(
+        [{"pk": f"TITLE#{t['number']}", "sk": sk} for t in title_keys for sk in ("UNIT_STATS", "SUMMARY", "WORDCOUNT")],
+        ["units"]
+    )
+    by_title = {"UNIT_STATS": {}, "SUMMARY": {}, "WORDCOUNT": {}}
+    for (pk, sk), item in stored_titles.items():
+        by_title[sk][int(pk.split("#", 1)[1])] = item.get("units", {})
+    amended = {t["number"]: t.get("latest_amended_on") for t in titles}
+    
+    everyone = list(iter_agencies(agencies))
+    compared = ["name", "parent_slug", "sub_agencies", "units", "unresolved_references", "checksum", "last_amended_on"] + list(RANK_METRICS)
+    # Previous values are also needed outside incremental mode, to find stale ranking keys
+    previous_rollups = load_stored_items(
+        [{"pk": f"AGENCY#{agency['slug']}", "sk": "ROLLUP"} for agency, _ in everyone], compared
+    )
+    
+    counts = {"rollups": 0, "rankings": 0}
+    for agency, parent in everyone:
+        rollup = agency_rollup(
+            agency, parent, by_title["UNIT_STATS"], by_title["WORDCOUNT"], by_title["SUMMARY"], amended, date_str
+        )
+        previous = previous_rollups.get((rollup["pk"], "ROLLUP"))
+        if incremental and previous and all(previous.get(k) == rollup.get(k) for k in compared):
+            continue
+        writer.put(rollup)
+        counts["rollups"] += 1
+        current = ranking_items(rollup)
+        for item in current:
+            writer.put(item)
+        counts["rankings"] += len(current)
+        # A changed value moves the agency to a new sort key; drop the old one
+        current_keys = {(item["pk"], item["sk"]) for item in current}
+        for metric in RANK_METRICS:
+            if previous and metric in previous:
+                key = (f"RANKING#{metric}", rank_sk(previous[metric], agency["slug"]))
+                if key not in current_keys:
+                    writer.delete({"pk": key[0], "sk": key[1]})
+    return counts
+
+def store_search_fragment(title_num: int, tally: TreeTally, writer: BatchWriter, previous_chunks: int) -> int:
+    # The title's searchable headings, merged into the index by store_search_index
+    chunks = tally.fragment.items(title_num, tally.checksum, datetime.now(timezone.utc).strftime("%Y-%m-%d"))
+    for item in chunks:
+        writer.put(item)
+    for k in range(len(chunks), previous_chunks):
+        writer.delete({"pk": f"TITLE#{title_num}", "sk": fragment_sk(k)})
+    return len(chunks)
+
+def delete_partition(pk: str, writer: BatchWriter) -> int:
+    kwargs = {"KeyConditionExpression": Key("pk").eq(pk), "ProjectionExpression": "pk, sk"}
+    deleted = 0
+    while True:
+        resp = table.query(**kwargs)
+        for item in resp.get("Items", []):
+            writer.delete({"pk": item["pk"], "sk": item["sk"]})
+            deleted += 1
+        if "LastEvaluatedKey" not in resp:
+            return deleted
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+def store_search_index(titles: List[Dict[str, Any]], writer: BatchWriter, incremental: bool) -> Dict[str, Any]:
+    # Rebuilt whole from the title fragments when any title's tree changed.
+    # The new generation is written in full before META / SEARCH_INDEX points
+    # at it; the previous one is kept for readers that still hold the old
+    # pointer, and the one before that is deleted.
+    writer.flush()
+    numbers = sorted(t["number"] for t in titles if not t.get("reserved"))
+    summaries = load_stored_items(
+        [{"pk": f"TITLE#{n}", "sk": "SUMMARY"} for n in numbers], ["checksum", "search_chunks"]
+    )
+    fragments = {
+        n: summaries[(f"TITLE#{n}", "SUMMARY")] for n in numbers
+        if summaries.get((f"TITLE#{n}", "SUMMARY"), {}).get("search_chunks")
+    }
+    source = compute_checksum({
+        "index_version": INDEX_VERSION,
+        "titles": [[n, item.get("checksum")] for n, item in fragments.items()],
+    })
+    pointer = table.get_item(Key={"pk": "META", "sk": "SEARCH_INDEX"}, ConsistentRead=True).get("Item")
+    if incremental and pointer and pointer.get("source") == source:
+        return {"rebuilt": False}
+    
+    builder = IndexBuilder()
+    for title_num in fragments:
+        items = []
+        kwargs = {"KeyConditionExpression": Key("pk").eq(f"TITLE#{title_num}") & Key("sk").begins_with("SEARCH#")}
+        while True:
+            resp = table.query(**kwargs)
+            items.extend(resp.get("Items", []))
+            if "LastEvaluatedKey" not in resp:
+                break
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+        try:
+            builder.add_title(title_num, read_fragment(items))
+        except (ValueError, IndexError) as e:
+            telemetry.error("search_index", f"Skipping search fragment for title {title_num}: {e}", title=title_num)
+    
+    now = datetime.now(timezone.utc)
+    date_str = now.strftime("%Y-%m-%d")
+    generation = now.strftime("%Y%m%dT%H%M%S%fZ")
+    written = 0
+    for item in builder.items(generation, date_str):
+        writer.put(item)
+        written += 1
+    writer.flush()
+    writer.put(dict(builder.pointer(generation, source, date_str), previous=pointer["generation"] if pointer else ""))
+    writer.flush()
+    deleted = delete_partition(f"SEARCH#{pointer['previous']}", writer) if pointer and pointer.get("previous") else 0
+    return {"rebuilt": True, "generation": generation, "docs": len(builder.docs),
+            "terms": len(builder.postings), "items": written, "deleted": deleted}
+
+_snapshots: "OrderedDict[Tuple[int, str], Snapshot]" = OrderedDict()
+
+def load_snapshot(title_num: int, date: str) -> Snapshot:
+    # The raw download is reused through the download cache; the hashed tree
+    # is reused in-process
+    key = (title_num, date)
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        snapshot = Snapshot(list(iter_tree(fetch_title_structure(title_num, date))))
+        _snapshots[key] = snapshot
+        while len(_snapshots) > snapshot_cache_size:
+            _snapshots.popitem(last=False)
+    _snapshots.move_to_end(key)
+    return snapshot
+
+def diff_key(title_num: int, from_date: str, to_date: str) -> Dict[str, str]:
+    return {"pk": f"DIFF#{title_num}", "sk": f"{from_date}#{to_date}"}
+
+def store_title_diff(title_num: int, from_date: str, to_date: str, force: bool = False) -> Dict[str, Any]:
+    # Structures for past dates don't change, so a stored diff is reused
+    # unless forced. No entity_type: diffs are only ever read by key.
+    for date in (from_date, to_date):
+        if not ISO_DATE_RE.match(date):
+            raise ValueError(f"Invalid date: {date}")
+    key = diff_key(title_num, from_date, to_date)
+    if not force and "Item" in table.get_item(Key=key, ProjectionExpression="pk"):
+        return {"stored": False, **key}
+    started = time.monotonic()
+    diff = diff_snapshots(load_snapshot(title_num, from_date), load_snapshot(title_num, to_date))
+    table.put_item(Item=fit_item({
+        **key,
+        "title_number": title_num,
+        "from_date": from_date,
+        "to_date": to_date,
+        **diff,
+        "elapsed_ms": int((time.monotonic() - started) * 1000),
+        "updated_date": datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    }))
+    return {"stored": True, **key, "counts": diff["counts"]}
+
+def run_diff(request: Dict[str, Any]) -> Dict[str, Any]:
+    # {"title": 40, "from": "2023-01-01", "to": "2024-01-01", "force": false};
+    # "status" tells the synchronous API caller how to answer
+    try:
+        result = store_title_diff(int(request["title"]), str(request["from"]), str(request["to"]), bool(request.get("force")))
+        return {"ok": True, "status": 200, **result}
+    except (KeyError, ValueError) as e:
+        return {"ok": False, "status": 400, "message": f"Invalid diff request: {e}"}
+    except Exception as e:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        # eCFR answers 404 for dates before a title's first version or after its latest
+        return {"ok": False, "status": 404 if status == 404 else 502, "message": f"Diff failed: {e}"}
+
+def generation_marker() -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    return {
+        "pk": "META",
+        "sk": "GENERATION",
+        "entity_type": "generation",
+        "generation": now.strftime("%Y%m%dT%H%M%S%fZ"),
+        "updated_date": now.strftime("%Y-%m-%d")
+    }
+
+def request_publish(marker: Dict[str, Any]) -> bool:
+    # Fire-and-forget: a publish that fails leaves the previous bundle current,
+    # so it never fails the ingest
+    if not publish_function:
+        return False
+    try:
+        boto3.client("lambda").invoke(
+            FunctionName=publish_function,
+            InvocationType="Event",
+            Payload=json.dumps({"publish": {"generation": marker["generation"]}}).encode("utf-8")
+        )
+        return True
+    except Exception as e:
+        telemetry.error("publish", f"Failed to request publish: {e}")
+        return False
+
+def store_run_metrics(label: str, extra: Dict[str, Any], profiler: Optional[telemetry.Profiler] = None) -> Dict[str, Any]:
+    # Logs the invocation's metrics and keeps them as INGEST_METRICS / <time>#<label>
+    # for the API's /api/metrics. Stored as one JSON string, since DynamoDB
+    # won't take the floats as numbers.
+    summary = telemetry.run_summary(label, extra)
+    if profiler is not None:
+        summary["profile"] = profiler.stop()
+    now = datetime.now(timezone.utc)
+    try:
+        table.put_item(Item={
+            "pk": "INGEST_METRICS",
+            "sk": f"{now.strftime('%Y-%m-%dT%H:%M:%S.%fZ')}#{label}",
+            "label": label,
+            "data": json.dumps(summary, default=str),
+            "ttl": int(now.timestamp()) + metrics_ttl_days * 86400,
+            "updated_date": now.strftime("%Y-%m-%d"),
+        })
+    except Exception as e:
+        telemetry.error("metrics", f"Failed to store run metrics: {e}")
+    return summary
+
+def create_agency_title_mapping(agency: Dict[str, Any], writer: BatchWriter) -> List[Dict[str, Any]]:
     now = datetime.now(timezone.utc)
     date_str = now.strftime("%Y-%m-%d")
     mappings = []
@@ -121,53 +955,256 @@ def create_agency_title_mapping(agency: Dict[str, Any]) -> List[Dict[str, Any]]:
                 "pk": f"AGENCY#{agency['slug']}",
                 "sk": f"TITLE#{title_num}",
                 "entity_type": "agency_title_mapping",
+                "list_type": "agency_title_mapping",
                 "agency_slug": agency['slug'],
                 "agency_name": agency['name'],
                 "title_number": title_num,
                 "chapter": cfr_ref.get('chapter', ''),
                 "updated_date": date_str
             }
-            table.put_item(Item=item)
+            writer.put(item)
             mappings.append(item)
     
     return mappings
 
+def delete_stale_mappings(agency: Dict[str, Any], previous_refs: List[Dict[str, Any]], writer: BatchWriter) -> int:
+    current = {f"TITLE#{ref['title']}" for ref in agency.get('cfr_references', []) if ref.get('title')}
+    previous = {f"TITLE#{ref['title']}" for ref in previous_refs if ref.get('title')}
+    for sk in previous - current:
+        writer.delete({"pk": f"AGENCY#{agency['slug']}", "sk": sk})
+    return len(previous - current)
+
+
+def new_counts() -> Dict[str, Any]:
+    return {
+        "agencies": 0,
+        "titles": 0,
+        "structures": 0,
+        "mappings": 0,
+        "unchanged_agencies": 0,
+        "skipped_titles": 0,
+        "unchanged_nodes": 0,
+        "deleted": 0,
+        "blob_chunks": 0,
+        "agency_checksums": 0
+    }
+
+
+def ingest_agencies(agencies: List[Dict[str, Any]], writer: BatchWriter, incremental: bool, counts: Dict[str, Any]) -> None:
+    stored_agencies = load_stored_items(
+        [{"pk": f"AGENCY#{a['slug']}", "sk": "METADATA"} for a in agencies],
+        ["checksum", "cfr_references"]
+    ) if incremental else {}
+    
+    for agency in agencies:
+        previous = stored_agencies.get((f"AGENCY#{agency['slug']}", "METADATA"))
+        if previous and previous.get("checksum") == compute_checksum(agency):
+            counts["unchanged_agencies"] += 1
+            continue
+        store_agency_data(agency, writer)
+        mappings = create_agency_title_mapping(agency, writer)
+        if previous:
+            counts["deleted"] += delete_stale_mappings(agency, previous.get("cfr_references", []), writer)
+        counts["agencies"] += 1
+        counts["mappings"] += len(mappings)
+
+
+def load_title_summaries(
+    titles: List[Dict[str, Any]],
+) -> Tuple[Dict[Tuple[str, str], Dict[str, Any]], Dict[int, Dict[str, str]], Dict[int, Dict[str, List[str]]]]:
+    # Stored summaries carry each title's root and unit hashes
+    stored_summaries = load_stored_items(
+        [{"pk": f"TITLE#{t['number']}", "sk": "SUMMARY"} for t in titles],
+        ["checksum", "units", "part_scopes", "storage", "layout", "blob_chunks", "search_chunks", "nodes", "source"]
+    )
+    units_by_title = {
+        int(key[0].split("#", 1)[1]): item.get("units", {})
+        for key, item in stored_summaries.items()
+    }
+    part_scopes_by_title = {
+        int(key[0].split("#", 1)[1]): item.get("part_scopes", {})
+        for key, item in stored_summaries.items()
+    }
+    return stored_summaries, units_by_title, part_scopes_by_title
+
+
+def ingest_titles(
+    titles: List[Dict[str, Any]],
+    stored_summaries: Dict[Tuple[str, str], Dict[str, Any]],
+    units_by_title: Dict[int, Dict[str, str]],
+    part_scopes_by_title: Dict[int, Dict[str, List[str]]],
+    writer: BatchWriter,
+    incremental: bool,
+    counts: Dict[str, Any],
+    concurrency: int,
+    stop: Optional[Callable[[], bool]] = None,
+    done: Optional[List[int]] = None,
+) -> None:
+    # Title metadata and structures. units_by_title and part_scopes_by_title
+    # are updated in place for every title whose structure is rewritten.
+    stored_titles = load_stored_items(
+        [{"pk": f"TITLE#{t['number']}", "sk": "METADATA"} for t in titles],
+        ["latest_amended_on", "up_to_date_as_of", "structure_storage", "structure_layout"]
+    ) if incremental else {}
+    
+    pending = []
+    for title in titles:
+        if incremental and not title_changed(title, stored_titles.get((f"TITLE#{title['number']}", "METADATA"))):
+            counts["skipped_titles"] += 1
+        elif title.get("reserved"):
+            store_title_data(title, writer)
+            counts["titles"] += 1
+        else:
+            pending.append(title)
+            continue
+        if done is not None:
+            done.append(title["number"])
+    
+    def fetch_structure(title: Dict[str, Any]):
+        # Only downloads: the body goes to a spool file, parsed when it is stored
+        date = title_date(title)
+        body = tempfile.SpooledTemporaryFile(max_size=structure_spool_bytes)
+        try:
+            with telemetry.stages.time(title["number"], "fetch"):
+                source = download_title_structure(title["number"], body, date) if date else download_title_structure(title["number"], body)
+            stored = stored_summaries.get((f"TITLE#{title['number']}", "SUMMARY"), {})
+            # The same document always parses to the same tree. A storage mode
+            # or layout change rewrites the title even if its tree is the same.
+            unchanged = (
+                stored.get("source") == source
+                and stored.get("storage", "nodes") == structure_storage
+                and stored.get("layout", 1) == STRUCTURE_LAYOUT
+            )
+            existing = None
+            if incremental:
+                # An unchanged document is never parsed, so skip reading its nodes
+                with telemetry.stages.time(title["number"], "load"):
+                    existing = {} if unchanged else load_title_node_checksums(title["number"])
+        except Exception:
+            body.close()
+            raise
+        body.seek(0)
+        return body, source, existing, unchanged
+    
+    # Structures download concurrently and are stored as each one completes
+    for title, result, error in ecfr.map(fetch_structure, pending, concurrency=concurrency):
+        if stop and stop():
+            if result:
+                result[0].close()
+            break
+        if error:
+            telemetry.error("fetch", f"Failed to fetch structure for title {title['number']}: {error}", title=title["number"])
+            continue
+        body, source, existing, unchanged = result
+        previous = stored_summaries.get((f"TITLE#{title['number']}", "SUMMARY"), {})
+        started = time.perf_counter()
+        timings = {"parse": 0.0, "checksum": 0.0}
+        try:
+            if incremental and unchanged:
+                node_counts = {"written": 0, "unchanged": int(previous.get("nodes", 0)), "deleted": 0}
+            else:
+                summary, node_counts = store_title_tree(
+                    title["number"], iter_json_tree(body, timings), source, writer, existing, previous
+                )
+                units_by_title[title["number"]] = summary["units"]
+                part_scopes_by_title[title["number"]] = summary["part_scopes"]
+            # Title metadata is the "already ingested" marker, so only write it once its nodes landed
+            writer.flush()
+        except Exception as e:
+            telemetry.error("write", f"Failed to store structure for title {title['number']}: {e}", title=title["number"])
+            continue
+        finally:
+            body.close()
+            for stage, seconds in timings.items():
+                telemetry.stages.add(title["number"], stage, seconds)
+            telemetry.stages.add(title["number"], "write", time.perf_counter() - started - sum(timings.values()))
+        store_title_data(title, writer)
+        counts["titles"] += 1
+        counts["structures"] += node_counts["written"]
+        counts["unchanged_nodes"] += node_counts["unchanged"]
+        counts["deleted"] += node_counts["deleted"]
+        counts["blob_chunks"] += node_counts.get("blob_chunks", 0)
+        if done is not None:
+            done.append(title["number"])
+        telemetry.emit(
+            dict(telemetry.stages.title(title["number"]), nodes_written=node_counts["written"]),
+            {"Stage": "title"}, title=title["number"], unchanged=bool(incremental and unchanged)
+        )
+
 
 def handler(event, context):
+    event = event or {}
+    if event.get("stage"):
+        # Sharded runs: orchestrate, shard, finalize, resume
+        from orchestrator import dispatch
+        return dispatch(event, context)
+    if event.get("diff"):
+        return run_diff(event["diff"])
+    telemetry.reset()
+    # {"profile": true} samples the whole run; the stacks land in its INGEST_METRICS item
+    profiler = telemetry.Profiler().start() if event.get("profile") else None
     try:
-        ingested_counts = {
-            "agencies": 0,
-            "titles": 0,
-            "structures": 0,
-            "mappings": 0
-        }
-        
-        # Fetch and store agency data
-        agencies_data = fetch_agencies()
-        agencies = agencies_data.get("agencies", [])
-        
-        for agency in agencies[:10]:  # Limit for demo
-            store_agency_data(agency)
-            mappings = create_agency_title_mapping(agency)
-            ingested_counts["agencies"] += 1
-            ingested_counts["mappings"] += len(mappings)
-        
-        # Fetch and store title metadata
-        titles_data = fetch_titles()
-        titles = titles_data.get("titles", [])
+        ecfr.reset_stats()
+        incremental = event.get("mode", ingest_mode) == "incremental"
+        ingested_counts = new_counts()
+        marker = None
         
-        for title in titles[:5]:  # Limit for demo
-            store_title_data(title)
-            ingested_counts["titles"] += 1
+        with BatchWriter(table_name, max_workers=write_workers) as writer:
+            # Fetch and store agency data
+            agencies = fetch_agencies().get("agencies", [])
+            ingest_agencies(agencies, writer, incremental, ingested_counts)
             
-            # Fetch and store structure for major titles
-            if title["number"] in [40, 21, 29, 7]:  # EPA, FDA, Labor, Agriculture
-                try:
-                    structure = fetch_title_structure(title["number"])
-                    stored_structures = store_title_structure(title["number"], structure)
-                    ingested_counts["structures"] += len(stored_structures)
-                except Exception as e:
-                    print(f"Failed to fetch structure for title {title['number']}: {e}")
+            # Fetch title metadata and work out which titles changed since the last run
+            titles = fetch_titles().get("titles", [])
+            # Optional event override, e.g. {"titles": [40, 21]}
+            wanted = set(event.get("titles") or [])
+            stored_summaries, units_by_title, part_scopes_by_title = load_title_summaries(titles)
+            ingest_titles(
+                [t for t in titles if not wanted or t["number"] in wanted],
+                stored_summaries, units_by_title, part_scopes_by_title,
+                writer, incremental, ingested_counts,
+                event.get("concurrency", fetch_concurrency)
+            )
+            
+            # Per-agency checksums combine the Merkle hashes of the units each agency references
+            stored_checksums = load_stored_items(
+                [{"pk": f"AGENCY#{a['slug']}", "sk": "CHECKSUM"} for a in agencies], ["checksum"]
+            ) if incremental else {}
+            ingested_counts["agency_checksums"] = store_agency_checksums(agencies, units_by_title, writer, stored_checksums)
+            
+            if event.get("word_counts", word_counts_enabled):
+                ingested_counts["word_counts"] = store_word_counts(
+                    titles, agencies, writer, incremental,
+                    event.get("fulltext_concurrency", fulltext_concurrency), wanted
+                )
+            
+            if event.get("history", history_enabled):
+                ingested_counts["history"] = store_history(
+                    titles, agencies, part_scopes_by_title, writer, incremental, wanted
+                )
+            
+            # Agency rollups and rankings read back the title items written above
+            ingested_counts["rollups"] = store_agency_rollups(titles, agencies, writer, incremental)
+            ingested_counts["search_index"] = store_search_index(titles, writer, incremental)
+            
+            # Bump the generation marker only when data changed, after it is
+            # durably written, so API caches invalidate exactly once per change
+            write_stats = writer.stats()
+            if write_stats["puts"] + write_stats["deletes"]:
+                writer.flush()
+                marker = generation_marker()
+                writer.put(marker)
+        
+        ingested_counts["writes"] = writer.stats()
+        # Only once the marker is written, so the bundle renders the new data
+        ingested_counts["publish_requested"] = request_publish(marker) if marker else False
+        fetch_stats = ecfr.stats()
+        # Per-request latencies go to the logs; the summary stays in the result
+        print(json.dumps({"fetch_latency": fetch_stats.pop("per_request")}))
+        ingested_counts["fetch"] = fetch_stats
+        summary = store_run_metrics("run", {"fetch": fetch_stats, "writes": ingested_counts["writes"]}, profiler)
+        ingested_counts["timings_ms"] = summary["stages"]["totals_ms"]
+        ingested_counts["capacity_units"] = summary["dynamodb"]["capacity_units"]
         
         return {
             "ok": True,
@@ -176,8 +1213,10 @@ def handler(event, context):
         }
         
     except Exception as e:
+        telemetry.error("run", f"Ingestion failed: {e}")
+        store_run_metrics("run", {"ok": False, "error": str(e)}, profiler)
         return {
             "ok": False,
             "message": f"Ingestion failed: {str(e)}",
             "error": str(e)
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+# DynamoDB hard limit for a single BatchWriteItem call
+BATCH_SIZE = 25
+THROTTLE_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+
+_local = threading.local()
+
+
+def thread_resource():
+    # boto3 resources are not thread safe, so every worker gets its own
+    if not hasattr(_local, "ddb"):
+        _local.ddb = boto3.resource("dynamodb")
+    return _local.ddb
+
+
+class BatchWriter:
+    """Buffers puts/deletes into BatchWriteItem calls spread over a worker pool.
+
+    Unprocessed items and throttled batches are retried with jittered
+    exponential backoff. Call ``flush`` (or use as a context manager) before
+    reading ``stats``.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        max_workers: int = 8,
+        max_retries: int = 8,
+        base_delay: float = 0.05,
+        max_delay: float = 5.0,
+        resource_factory: Optional[Callable[[], Any]] = None,
+    ):
+        self.table_name = table_name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._resource = resource_factory or thread_resource
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ddb-writer")
+        # Bound the number of queued batches so a huge title can't buffer everything in memory
+        self._slots = threading.BoundedSemaphore(max_workers * 2)
+        self._buffer: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+        self._buffer_lock = threading.Lock()
+        self._started = time.monotonic()
+        self._stats = {
+            "items": 0,
+            "puts": 0,
+            "deletes": 0,
+            "batches": 0,
+            "retries": 0,
+            "throttles": 0,
+            "failed": 0,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def put(self, item: Dict[str, Any]) -> None:
+        self._add((item["pk"], item["sk"]), {"PutRequest": {"Item": item}}, "puts")
+
+    def delete(self, key: Dict[str, Any]) -> None:
+        self._add((key["pk"], key["sk"]), {"DeleteRequest": {"Key": key}}, "deletes")
+
+    def _add(self, key: Tuple[str, str], request: Dict[str, Any], kind: str) -> None:
+        with self._buffer_lock:
+            self._stats[kind] += 1
+            # BatchWriteItem rejects duplicate keys in one call; the last write wins
+            self._buffer[key] = request
+            if len(self._buffer) >= BATCH_SIZE:
+                self._submit()
+
+    def _submit(self) -> None:
+        if not self._buffer:
+            return
+        batch = list(self._buffer.values())
+        self._buffer = {}
+        self._slots.acquire()
+        future = self._pool.submit(self._write_batch, batch)
+        future.add_done_callback(lambda _: self._slots.release())
+        # Keep failed futures around for flush() to re-raise, drop the finished ones
+        self._futures = [f for f in self._futures if not f.done() or f.exception() is not None]
+        self._futures.append(future)
+
+    def _backoff(self, attempt: int) -> None:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        time.sleep(random.uniform(0, delay))
+
+    def _write_batch(self, requests: List[Dict[str, Any]]) -> None:
+        ddb = self._resource()
+        pending = requests
+        attempt = 0
+        while pending:
+            try:
+                resp = ddb.batch_write_item(RequestItems={self.table_name: pending})
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in THROTTLE_CODES:
+                    self._record(failed=len(pending))
+                    raise
+                self._record(throttles=1)
+            else:
+                written = len(pending)
+                pending = resp.get("UnprocessedItems", {}).get(self.table_name, [])
+                self._record(written=written - len(pending), batches=1)
+                if not pending:
+                    return
+                self._record(retries=len(pending))
+            if attempt >= self.max_retries:
+                self._record(failed=len(pending))
+                raise RuntimeError(f"BatchWriteItem gave up on {len(pending)} items after {attempt} retries")
+            self._backoff(attempt)
+            attempt += 1
+
+    def _record(self, written: int = 0, batches: int = 0, retries: int = 0,
+                throttles: int = 0, failed: int = 0) -> None:
+        with self._lock:
+            self._stats["items"] += written
+            self._stats["batches"] += batches
+            self._stats["retries"] += retries
+            self._stats["throttles"] += throttles
+            self._stats["failed"] += failed
+
+    def flush(self) -> None:
+        with self._buffer_lock:
+            self._submit()
+            futures, self._futures = self._futures, []
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = time.monotonic() - self._started
+        stats["elapsed_s"] = round(elapsed, 3)
+        stats["items_per_s"] = round(stats["items"] / elapsed, 1) if elapsed > 0 else 0.0
+        return stats
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, BinaryIO, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Content-addressed cache for raw eCFR downloads. Bodies are stored once per
+# distinct payload as blobs/<sha256>.zz (zlib); each URL has a small meta
+# record naming its blob and the validators to revalidate it with.
+
+# Read/inflate size when a body is streamed instead of returned whole
+STREAM_CHUNK = 64 * 1024
+
+
+class LocalDirStore:
+    """Cache backend on local disk, e.g. Lambda's /tmp or a dev checkout.
+
+    File mtimes double as last-access times: reads touch the file, so
+    eviction is true LRU.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted by another thread in between; the bytes are still good
+        return data
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix: str) -> List[Tuple[str, int, float]]:
+        # (key, size, last access) for every entry under prefix
+        entries = []
+        base = self._path(prefix)
+        for dirpath, _, filenames in os.walk(base):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                entries.append((key, st.st_size, st.st_mtime))
+        return entries
+
+
+class S3Store:
+    """Cache backend in S3, shared by every container and run.
+
+    S3 can't record reads cheaply, so eviction falls back to oldest-written
+    first; a bucket lifecycle rule is the usual backstop.
+    """
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.s3 = boto3.client("s3")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+        except self.s3.exceptions.NoSuchKey:
+            return None
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self.s3.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, key: str, data: bytes) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def delete(self, key: str) -> None:
+        self.s3.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self, prefix: str) -> List[Tuple[str, int, float]]:
+        entries = []
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                entries.append((obj["Key"][strip:], obj["Size"], obj["LastModified"].timestamp()))
+        return entries
+
+
+def open_store(spec: str):
+    # "s3://bucket/prefix" or a local directory
+    if spec.startswith("s3://"):
+        bucket, _, prefix = spec[len("s3://"):].partition("/")
+        return S3Store(bucket, prefix)
+    return LocalDirStore(spec)
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    meta: Dict[str, Any]
+
+
+class DownloadCache:
+    """Maps URLs to compressed, content-addressed response bodies.
+
+    ``max_bytes`` bounds the stored (compressed) blob size; the least recently
+    used blobs are evicted past it. Entries validated less than ``max_age``
+    seconds ago are served without asking the server at all.
+    """
+
+    def __init__(self, store: Any, max_bytes: int = 512 * 1024 * 1024, max_age: float = 0):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {"fresh": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0, "bytes_saved": 0}
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    @staticmethod
+    def _meta_key(url: str) -> str:
+        return f"meta/{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    @staticmethod
+    def _blob_key(digest: str) -> str:
+        return f"blobs/{digest[:2]}/{digest}.zz"
+
+    def lookup_meta(self, url: str) -> Optional[Dict[str, Any]]:
+        raw = self.store.get(self._meta_key(url))
+        return json.loads(raw) if raw is not None else None
+
+    def lookup(self, url: str) -> Optional[CachedBody]:
+        meta = self.lookup_meta(url)
+        if meta is None:
+            return None
+        blob = self.store.get(self._blob_key(meta["sha256"]))
+        if blob is None:
+            return None  # blob evicted; the stale meta is overwritten on the next save
+        return CachedBody(zlib.decompress(blob), meta)
+
+    def is_fresh(self, meta: Dict[str, Any]) -> bool:
+        return self.max_age > 0 and time.time() - meta.get("validated", 0) < self.max_age
+
+    @staticmethod
+    def conditional_headers(meta: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def hit(self, url: str, entry: CachedBody, revalidated: bool) -> bytes:
+        self._touch(url, entry.meta, revalidated)
+        return entry.body
+
+    def hit_stream(self, url: str, meta: Dict[str, Any], revalidated: bool, sink: BinaryIO) -> bool:
+        # Inflates the stored body into `sink` a chunk at a time. False if the
+        # blob has been evicted since the meta record was read.
+        blob = self.store.get(self._blob_key(meta["sha256"]))
+        if blob is None:
+            return False
+        inflate = zlib.decompressobj()
+        for start in range(0, len(blob), STREAM_CHUNK):
+            sink.write(inflate.decompress(blob[start:start + STREAM_CHUNK]))
+        sink.write(inflate.flush())
+        self._touch(url, meta, revalidated)
+        return True
+
+    def _touch(self, url: str, meta: Dict[str, Any], revalidated: bool) -> None:
+        self._count("revalidated" if revalidated else "fresh")
+        self._count("bytes_saved", int(meta.get("size", 0)))
+        if revalidated:
+            self.store.put(self._meta_key(url), json.dumps(dict(meta, validated=time.time())).encode("utf-8"))
+
+    def save(self, url: str, body: bytes, headers: Dict[str, str]) -> None:
+        self._count("misses")
+        self._save(url, hashlib.sha256(body).hexdigest(), len(body), lambda: zlib.compress(body, 6), headers)
+
+    def save_stream(self, url: str, source: BinaryIO, headers: Dict[str, str], sink: BinaryIO) -> str:
+        # Copies `source` into `sink` while hashing and compressing it, so the
+        # body is never held whole; only its compressed blob is. Returns the sha256.
+        self._count("misses")
+        h = hashlib.sha256()
+        deflate = zlib.compressobj(6)
+        parts = []
+        size = 0
+        for chunk in iter(lambda: source.read(STREAM_CHUNK), b""):
+            h.update(chunk)
+            parts.append(deflate.compress(chunk))
+            sink.write(chunk)
+            size += len(chunk)
+        parts.append(deflate.flush())
+        digest = h.hexdigest()
+        self._save(url, digest, size, lambda: b"".join(parts), headers)
+        return digest
+
+    def _save(self, url: str, digest: str, size: int, compress: Callable[[], bytes], headers: Dict[str, str]) -> None:
+        blob_key = self._blob_key(digest)
+        added = 0
+        # Identical payloads under different URLs share one blob
+        if not self.store.exists(blob_key):
+            blob = compress()
+            self.store.put(blob_key, blob)
+            added = len(blob)
+            self._count("stored")
+        self.store.put(self._meta_key(url), json.dumps({
+            "url": url,
+            "sha256": digest,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "size": size,
+            "validated": time.time(),
+        }).encode("utf-8"))
+        if added:
+            self._account(added)
+
+    def _account(self, added: int) -> None:
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self.store.list("blobs"))
+            else:
+                self._total += added
+            if self._total <= self.max_bytes:
+                return
+            # Evict least recently used blobs down to 90% so this doesn't run on every save
+            blobs = sorted(self.store.list("blobs"), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in blobs)
+            target = int(self.max_bytes * 0.9)
+            for key, size, _ in blobs:
+                if total <= target:
+                    break
+                self.store.delete(key)
+                total -= size
+                self._stats["evicted"] += 1
+            self._total = total
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
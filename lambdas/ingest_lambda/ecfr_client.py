@@ -0,0 +1,183 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from download_cache import STREAM_CHUNK, DownloadCache
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class EcfrClient:
+    """Keep-alive HTTP client for the eCFR API.
+
+    A single pooled session is shared by all worker threads. 429/5xx
+    responses and connection errors are retried with jittered exponential
+    backoff, honoring ``Retry-After`` when the server sends one. With a
+    ``cache``, ``get_bytes``/``get_json`` revalidate stored bodies with
+    conditional GETs instead of downloading them again; ``download`` does the
+    same for bodies too large to hold in memory.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = 16,
+        timeout: float = 30,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        cache: Optional[DownloadCache] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._requests: List[Dict[str, Any]] = []
+            self._retries = 0
+        if self.cache is not None:
+            self.cache.reset_stats()
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass  # HTTP-date form, fall back to our own backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.session.get(url, **kwargs)
+                retryable = response.status_code in RETRY_STATUSES
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                retryable = True
+            if not retryable or attempt >= self.max_retries:
+                break
+            if response is not None:
+                response.close()
+            with self._lock:
+                self._retries += 1
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+        with self._lock:
+            self._requests.append({
+                "path": path,
+                "status": response.status_code,
+                "attempts": attempt + 1,
+                "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            })
+        response.raise_for_status()
+        return response
+
+    def get_bytes(self, path: str) -> bytes:
+        if self.cache is None:
+            return self.get(path).content
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        entry = self.cache.lookup(url)
+        if entry is not None and self.cache.is_fresh(entry.meta):
+            return self.cache.hit(url, entry, revalidated=False)
+        response = self.get(path, headers=self.cache.conditional_headers(entry.meta) if entry else {})
+        if response.status_code == 304 and entry is not None:
+            return self.cache.hit(url, entry, revalidated=True)
+        body = response.content
+        self.cache.save(url, body, response.headers)
+        return body
+
+    def get_json(self, path: str) -> Any:
+        return json.loads(self.get_bytes(path))
+
+    def download(self, path: str, sink: BinaryIO) -> str:
+        # Copies the body into `sink` a chunk at a time and returns its sha256
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        meta = self.cache.lookup_meta(url) if self.cache is not None else None
+        if meta is not None and self.cache.is_fresh(meta):
+            if self.cache.hit_stream(url, meta, False, sink):
+                return meta["sha256"]
+            meta = None  # blob evicted, so don't ask for a 304 we can't serve
+        response = self.get(path, stream=True, headers=self.cache.conditional_headers(meta) if meta else {})
+        try:
+            if response.status_code == 304 and meta is not None:
+                if self.cache.hit_stream(url, meta, True, sink):
+                    return meta["sha256"]
+                response.close()
+                response = self.get(path, stream=True)
+            response.raw.decode_content = True
+            if self.cache is not None:
+                return self.cache.save_stream(url, response.raw, response.headers, sink)
+            h = hashlib.sha256()
+            for chunk in iter(lambda: response.raw.read(STREAM_CHUNK), b""):
+                h.update(chunk)
+                sink.write(chunk)
+            return h.hexdigest()
+        finally:
+            response.close()
+
+    def map(
+        self,
+        fn: Callable[[Any], Any],
+        args: Iterable[Any],
+        concurrency: Optional[int] = None,
+    ) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+        # Yields (arg, result, error) in completion order
+        workers = concurrency or self.pool_size
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ecfr-fetch") as pool:
+            futures = {pool.submit(fn, arg): arg for arg in args}
+            try:
+                for future in as_completed(futures):
+                    arg = futures.pop(future)
+                    error = future.exception()
+                    yield arg, (None if error else future.result()), error
+            finally:
+                # A caller that stops early only waits for fetches already running
+                for future in futures:
+                    future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests_made = list(self._requests)
+            retries = self._retries
+        latencies = sorted(r["latency_ms"] for r in requests_made)
+
+        def pct(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "requests": len(requests_made),
+            "retries": retries,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": latencies[-1] if latencies else 0.0,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "per_request": requests_made,
+        }
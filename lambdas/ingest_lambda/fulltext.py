@@ -0,0 +1,134 @@
+import xml.etree.ElementTree as ET
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+from merkle import ref_unit_key, unit_key
+from text_metrics import WORD_RE, Metric, TextBatch, measure, merge
+
+# Text is measured in batches of about this many characters. A batch never
+# spans a DIV boundary, so each one belongs to a single section and unit chain.
+BATCH_CHARS = 64 * 1024
+
+# DIV TYPE attribute in the versioner XML -> structure node type
+DIV_TYPES = {
+    "TITLE": "title",
+    "SUBTITLE": "subtitle",
+    "CHAPTER": "chapter",
+    "SUBCHAP": "subchapter",
+    "PART": "part",
+    "SUBPART": "subpart",
+    "SUBJGRP": "subject_group",
+    "SECTION": "section",
+    "APPENDIX": "appendix",
+}
+
+
+def count_words(text: Optional[str]) -> int:
+    return len(WORD_RE.findall(text)) if text else 0
+
+
+def count_title_words(source: BinaryIO, metrics: Sequence[Metric] = ()) -> Dict[str, Any]:
+    # Streams a full-text title document and counts words per referenceable
+    # unit (subtitle, chapter, subchapter, part). Elements are cleared as soon
+    # as they close, so memory is bounded by the nesting depth plus the
+    # cleared shells of the currently open part.
+    #
+    # The same pass feeds `metrics` (see text_metrics.py). Their counters come
+    # back per title, per unit and per section (grouped by enclosing part).
+    units: Dict[str, int] = {}
+    total = 0
+    open_units: List[Optional[str]] = []
+    chapters: List[Optional[str]] = [None]
+    parts: List[Optional[str]] = [None]
+    sections: List[Optional[str]] = [None]
+    title_counters: Dict[str, Dict[str, int]] = {}
+    unit_counters: Dict[str, Dict[str, Dict[str, int]]] = {}
+    section_counters: Dict[str, Dict[str, Dict[str, Dict[str, int]]]] = {}
+    pending: List[str] = []
+    pending_chars = 0
+
+    def flush() -> None:
+        nonlocal total, pending_chars
+        if not pending:
+            return
+        batch = TextBatch(" ".join(pending))
+        pending.clear()
+        pending_chars = 0
+        n = len(batch.words)
+        total += n
+        for key in open_units:
+            if key:
+                units[key] = units.get(key, 0) + n
+        if not metrics:
+            return
+        measured = measure(metrics, batch)
+        merge(title_counters, measured)
+        for key in open_units:
+            if key:
+                merge(unit_counters.setdefault(key, {}), measured)
+        if sections[-1] and parts[-1]:
+            merge(section_counters.setdefault(parts[-1], {}).setdefault(sections[-1], {}), measured)
+
+    def add(text: Optional[str]) -> None:
+        nonlocal pending_chars
+        if not text or text.isspace():
+            return
+        pending.append(text)
+        pending_chars += len(text)
+        if pending_chars >= BATCH_CHARS:
+            flush()
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        is_div = elem.tag.startswith("DIV")
+        if event == "start":
+            if is_div:
+                # Buffered text belongs to the enclosing DIV
+                flush()
+                node_type = DIV_TYPES.get(elem.get("TYPE", "").upper(), "")
+                identifier = elem.get("N", "")
+                if node_type == "chapter":
+                    chapters.append(identifier)
+                else:
+                    chapters.append(chapters[-1])
+                key = unit_key(node_type, identifier, chapters[-1])
+                open_units.append(key)
+                parts.append(key if node_type == "part" else parts[-1])
+                sections.append(identifier.lstrip("§ ") if node_type == "section" else sections[-1])
+            continue
+
+        # Text before the first child is complete now, and so is every child's tail
+        add(elem.text)
+        for child in elem:
+            add(child.tail)
+        if is_div:
+            flush()
+            open_units.pop()
+            chapters.pop()
+            parts.pop()
+            sections.pop()
+        # The tail is text after this element, inside its parent; it is
+        # counted at the parent's end, so it has to outlive clear()
+        tail = elem.tail
+        elem.clear()
+        elem.tail = tail
+
+    flush()
+    return {
+        "total": total,
+        "units": units,
+        "metrics": {"title": title_counters, "units": unit_counters, "sections": section_counters},
+    }
+
+
+def agency_word_count(refs: List[Dict[str, Any]], units_by_title: Dict[int, Dict[str, int]]) -> Tuple[int, Dict[str, int]]:
+    # Sums the word counts of every unit an agency references, once per unit
+    seen = set()
+    by_title: Dict[str, int] = {}
+    for ref in refs:
+        key = ref_unit_key(ref)
+        title_num = ref.get("title")
+        if not key or (title_num, key) in seen:
+            continue
+        seen.add((title_num, key))
+        count = int(units_by_title.get(title_num, {}).get(key, 0))
+        by_title[str(title_num)] = by_title.get(str(title_num), 0) + count
+    return sum(by_title.values()), by_title
@@ -0,0 +1,129 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Granularity -> length of the ISO date prefix that names its bucket
+GRANULARITIES = {"day": 10, "month": 7, "year": 4}
+# Day buckets list the amended sections; keep them well under the item size limit
+MAX_SECTIONS = 200
+
+Bucket = Tuple[str, str]
+
+
+def buckets_for(date: str) -> List[Bucket]:
+    return [(g, date[:n]) for g, n in GRANULARITIES.items()]
+
+
+def history_sk(granularity: str, period: str) -> str:
+    return f"HISTORY#{granularity.upper()}#{period}"
+
+
+def new_stats() -> Dict[str, Any]:
+    return {"changes": 0, "substantive": 0, "removed": 0, "sections": set()}
+
+
+def add_version(stats: Dict[str, Any], version: Dict[str, Any]) -> None:
+    stats["changes"] += 1
+    stats["substantive"] += 1 if version.get("substantive") else 0
+    stats["removed"] += 1 if version.get("removed") else 0
+    if version.get("identifier"):
+        stats["sections"].add(version["identifier"])
+
+
+def affected_buckets(versions: Iterable[Dict[str, Any]], after: Optional[str]) -> Set[Bucket]:
+    # Buckets touched by versions newer than the stored cursor. Older day
+    # buckets are final and never rewritten.
+    affected = set()
+    for version in versions:
+        if not after or version["date"] > after:
+            affected.update(buckets_for(version["date"]))
+    return affected
+
+
+def bucket_versions(
+    versions: Iterable[Dict[str, Any]],
+    only: Set[Bucket],
+) -> Dict[Bucket, Dict[str, Any]]:
+    # Recomputes the affected buckets from the full listing, so re-running
+    # after a partial failure never double counts.
+    buckets: Dict[Bucket, Dict[str, Any]] = {}
+    for version in versions:
+        for bucket in buckets_for(version["date"]):
+            if bucket in only:
+                add_version(buckets.setdefault(bucket, new_stats()), version)
+    return buckets
+
+
+def history_item(pk: str, bucket: Bucket, stats: Dict[str, Any], date_str: str) -> Dict[str, Any]:
+    granularity, period = bucket
+    item = {
+        "pk": pk,
+        "sk": history_sk(granularity, period),
+        "entity_type": "history",
+        "granularity": granularity,
+        "period": period,
+        "changes": stats["changes"],
+        "substantive": stats["substantive"],
+        "removed": stats["removed"],
+        "sections_amended": len(stats["sections"]),
+        "updated_date": date_str,
+    }
+    if granularity == "day":
+        sections = sorted(stats["sections"])
+        item["sections"] = sections[:MAX_SECTIONS]
+        item["sections_truncated"] = len(sections) > MAX_SECTIONS
+    return item
+
+
+def agency_contributions(
+    title_num: int,
+    versions: Iterable[Dict[str, Any]],
+    only: Set[Bucket],
+    part_scopes: Dict[str, List[str]],
+    agencies_by_unit: Dict[Tuple[int, str], List[str]],
+) -> Dict[Tuple[str, Bucket], Dict[str, Any]]:
+    # Attributes each version to the agencies whose referenced units contain
+    # its part. Returns (agency slug, bucket) -> this title's stats.
+    contributions: Dict[Tuple[str, Bucket], Dict[str, Any]] = {}
+    for version in versions:
+        scope = part_scopes.get(str(version.get("part") or ""), [])
+        slugs = {slug for unit in scope for slug in agencies_by_unit.get((title_num, unit), [])}
+        if not slugs:
+            continue
+        for bucket in buckets_for(version["date"]):
+            if bucket not in only:
+                continue
+            for slug in slugs:
+                add_version(contributions.setdefault((slug, bucket), new_stats()), version)
+    return contributions
+
+
+def merge_agency_item(
+    slug: str,
+    bucket: Bucket,
+    title_stats: Dict[int, Dict[str, Any]],
+    stored: Optional[Dict[str, Any]],
+    date_str: str,
+) -> Dict[str, Any]:
+    # Agency buckets keep a per-title breakdown so the titles refreshed in
+    # this run replace their own share without touching the others'.
+    by_title = dict((stored or {}).get("by_title", {}))
+    for title_num, stats in title_stats.items():
+        by_title[str(title_num)] = {
+            "changes": stats["changes"],
+            "substantive": stats["substantive"],
+            "removed": stats["removed"],
+            "sections_amended": len(stats["sections"]),
+        }
+    granularity, period = bucket
+    return {
+        "pk": f"AGENCY#{slug}",
+        "sk": history_sk(granularity, period),
+        "entity_type": "history",
+        "granularity": granularity,
+        "period": period,
+        "changes": sum(int(t["changes"]) for t in by_title.values()),
+        "substantive": sum(int(t["substantive"]) for t in by_title.values()),
+        "removed": sum(int(t["removed"]) for t in by_title.values()),
+        "sections_amended": sum(int(t["sections_amended"]) for t in by_title.values()),
+        "by_title": by_title,
+        "updated_date": date_str,
+    }
@@ -0,0 +1,98 @@
+"""Runs a sharded ingest in this process.
+
+Thread-pool tasks stand in for the async Lambda invocations between the
+orchestrator, the shard workers and finalize. Each task gets a fake context
+with its own time budget. A short --time-budget makes the workers checkpoint
+and continue, which is the path a timed-out shard takes in Lambda.
+
+    DDB_TABLE=ecfr-local AWS_ENDPOINT_URL_DYNAMODB=http://localhost:8000 \\
+        python local_runner.py --shards 4 --time-budget 120 --time-margin 30
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class LocalContext:
+    def __init__(self, budget_s: float):
+        self.function_name = "ingest-local"
+        self.invoked_function_arn = "local"
+        self._deadline = time.monotonic() + budget_s
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class LocalInvoker:
+    # Mirrors InvocationType="Event": invoke() returns at once, failures are
+    # retried like Lambda's async retries, and wait() returns once nothing
+    # is queued or running.
+    def __init__(self, budget_s: float, workers: int, retries: int = 2):
+        self.budget_s = budget_s
+        self.retries = retries
+        self.results: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-local")
+        self._pending = 0
+        self._cond = threading.Condition()
+
+    def __call__(self, event: Dict[str, Any], attempt: int = 0) -> None:
+        with self._cond:
+            self._pending += 1
+        self._pool.submit(self._run, event, attempt)
+
+    def _run(self, event: Dict[str, Any], attempt: int) -> None:
+        from orchestrator import dispatch
+        try:
+            result = dispatch(event, LocalContext(self.budget_s), self)
+        except Exception as e:
+            result = {"ok": False, "error": repr(e), "attempt": attempt}
+            if attempt < self.retries:
+                self(event, attempt + 1)
+        with self._cond:
+            self.results.append((event, result))
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def wait(self) -> None:
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+        self._pool.shutdown()
+
+
+def run_local(event: Optional[Dict[str, Any]] = None, budget_s: float = 840, workers: int = 4) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    invoker = LocalInvoker(budget_s, workers)
+    invoker(dict(event or {}, stage="orchestrate"))
+    invoker.wait()
+    return invoker.results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a sharded ingest in-process")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--mode", default="incremental")
+    parser.add_argument("--workers", type=int, default=4, help="shard invocations running at once")
+    parser.add_argument("--time-budget", type=float, default=840, help="seconds per simulated invocation")
+    parser.add_argument("--time-margin", type=float, help="seconds; overrides INGEST_TIME_MARGIN_MS")
+    parser.add_argument("--no-word-counts", action="store_true")
+    parser.add_argument("--no-history", action="store_true")
+    args = parser.parse_args()
+
+    import orchestrator
+    if args.time_margin is not None:
+        orchestrator.time_margin_ms = int(args.time_margin * 1000)
+    event = {"shards": args.shards, "mode": args.mode}
+    if args.no_word_counts:
+        event["word_counts"] = False
+    if args.no_history:
+        event["history"] = False
+
+    for sent, result in run_local(event, args.time_budget, args.workers):
+        print(json.dumps({"event": sent, "result": result}, default=str))
+
+
+if __name__ == "__main__":
+    main()
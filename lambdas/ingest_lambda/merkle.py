@@ -0,0 +1,101 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Structure levels that agency cfr_references can point at
+UNIT_TYPES = ("subtitle", "chapter", "subchapter", "part")
+
+
+class TreeNode(NamedTuple):
+    node: Dict[str, Any]
+    path: str
+    depth: int
+    checksum: str
+    unit: Optional[str]
+    # Unit keys of this node and every unit above it, outermost first
+    scope: Tuple[str, ...]
+    # Position in document (pre-order) order; nodes themselves arrive post-order
+    order: int
+
+
+def own_fields(node: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in node.items() if k != "children"}
+
+
+def node_hash(fields: Dict[str, Any], child_hashes: Iterable[str]) -> str:
+    # Merkle hash: the node's own fields plus its children's hashes, in order
+    h = hashlib.sha256(json.dumps(fields, sort_keys=True, separators=(',', ':')).encode("utf-8"))
+    for child in child_hashes:
+        h.update(child.encode("ascii"))
+    return h.hexdigest()
+
+
+def unit_key(node_type: str, identifier: str, chapter: Optional[str]) -> Optional[str]:
+    if node_type not in UNIT_TYPES:
+        return None
+    if node_type == "subchapter":
+        # Subchapter letters restart in every chapter
+        return f"chapter:{chapter}/subchapter:{identifier}"
+    return f"{node_type}:{identifier}"
+
+
+def ref_unit_key(ref: Dict[str, Any]) -> Optional[str]:
+    if ref.get("part"):
+        return f"part:{ref['part']}"
+    if ref.get("subchapter") and ref.get("chapter"):
+        return f"chapter:{ref['chapter']}/subchapter:{ref['subchapter']}"
+    if ref.get("chapter"):
+        return f"chapter:{ref['chapter']}"
+    if ref.get("subtitle"):
+        return f"subtitle:{ref['subtitle']}"
+    return None
+
+
+def iter_tree(root: Dict[str, Any]) -> Iterator[TreeNode]:
+    # Iterative post-order walk: children are yielded (and hashed) before their
+    # parent, so every node is serialized exactly once.
+    stack: List[Tuple[Dict[str, Any], str, int, Optional[str], Optional[str], Tuple[str, ...], Iterator, List[str], int]] = []
+    pushed = 0
+
+    def push(node: Dict[str, Any], parent_path: str, depth: int, chapter: Optional[str], scope: Tuple[str, ...]) -> None:
+        nonlocal pushed
+        path = f"{parent_path}/{node['identifier']}" if parent_path else node['identifier']
+        if node.get("type") == "chapter":
+            chapter = node["identifier"]
+        unit = unit_key(node.get("type", ""), node["identifier"], chapter)
+        if unit:
+            scope = scope + (unit,)
+        stack.append((node, path, depth, chapter, unit, scope, iter(node.get("children", [])), [], pushed))
+        pushed += 1
+
+    push(root, "", 0, None, ())
+    while stack:
+        node, path, depth, chapter, unit, scope, children, hashes, order = stack[-1]
+        child = next(children, None)
+        if child is not None:
+            push(child, path, depth + 1, chapter, scope)
+            continue
+        stack.pop()
+        checksum = node_hash(own_fields(node), hashes)
+        if stack:
+            stack[-1][7].append(checksum)
+        yield TreeNode(node, path, depth, checksum, unit, scope, order)
+
+
+def agency_checksum(refs: List[Dict[str, Any]], units_by_title: Dict[int, Dict[str, str]]) -> Tuple[str, int]:
+    # Combines the Merkle hashes of every unit an agency references.
+    # Returns the checksum and how many references could not be resolved.
+    missing = 0
+    parts = []
+    for ref in refs:
+        key = ref_unit_key(ref)
+        units = units_by_title.get(ref.get("title"), {})
+        unit_hash = units.get(key) if key else None
+        if unit_hash is None:
+            missing += 1
+        parts.append(f"{ref.get('title')}|{key}|{unit_hash or 'missing'}")
+    h = hashlib.sha256()
+    for part in sorted(parts):
+        h.update(part.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest(), missing
@@ -0,0 +1,346 @@
+import os
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import app as ingest
+import telemetry
+from batch_writer import BatchWriter
+from shards import Deadline, in_shard, plan_shards, run_item, run_pk, shard_agencies, shard_item, shard_sk
+
+# Sharded ingest. "orchestrate" splits the corpus into title ranges and agency
+# slices and invokes one worker per shard. Workers checkpoint under
+# INGEST#<run_id>/SHARD#k and re-invoke themselves before the Lambda limit;
+# the last shard to finish invokes "finalize", which does the cross-title
+# agency rollups once. "resume" re-invokes whatever a failed run left behind.
+
+shard_count = int(os.environ.get("INGEST_SHARDS", "8"))
+# Workers stop starting new titles once less than this is left of the invocation
+time_margin_ms = int(os.environ.get("INGEST_TIME_MARGIN_MS", "180000"))
+
+Invoke = Callable[[Dict[str, Any]], None]
+
+_lambda_client = None
+
+
+def lambda_invoker(context: Any) -> Invoke:
+    # Fire-and-forget invocations of this same function
+    global _lambda_client
+    if _lambda_client is None:
+        _lambda_client = boto3.client("lambda")
+    function_name = os.environ.get("INGEST_FUNCTION_NAME") or context.invoked_function_arn
+
+    def invoke(event: Dict[str, Any]) -> None:
+        _lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps(event).encode("utf-8")
+        )
+    return invoke
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def load_item(run_id: str, sk: str) -> Optional[Dict[str, Any]]:
+    return ingest.table.get_item(Key={"pk": run_pk(run_id), "sk": sk}, ConsistentRead=True).get("Item")
+
+
+def spec_from_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    # Stored numbers come back as Decimal; events need plain JSON
+    shard = item["shard"]
+    return {
+        "index": int(shard["index"]),
+        "titles": [int(n) for n in shard.get("titles", [])],
+        "agencies": [int(n) for n in shard.get("agencies", [])],
+    }
+
+
+def save_checkpoint(run_id: str, index: int, status: str, stages: List[str], done: Dict[str, List[int]]) -> None:
+    # Only called after the writer flushed, so everything recorded is durable
+    ingest.table.update_item(
+        Key={"pk": run_pk(run_id), "sk": shard_sk(index)},
+        UpdateExpression="SET #status = :status, stages = :stages, done = :done, updated_date = :date",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={":status": status, ":stages": stages, ":done": done, ":date": today()}
+    )
+
+
+def mark_running(run_id: str, index: int) -> None:
+    ingest.table.update_item(
+        Key={"pk": run_pk(run_id), "sk": shard_sk(index)},
+        UpdateExpression="SET #status = :running, updated_date = :date ADD attempts :one",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={":running": "running", ":date": today(), ":one": 1}
+    )
+
+
+def mark_failed(run_id: str, index: int, error: str) -> None:
+    ingest.table.update_item(
+        Key={"pk": run_pk(run_id), "sk": shard_sk(index)},
+        UpdateExpression="SET #status = :failed, last_error = :error, updated_date = :date",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={":failed": "failed", ":error": error[:1000], ":date": today()}
+    )
+
+
+def record_writes(run_id: str, writes: int) -> None:
+    # Finalize bumps the generation marker only if some shard changed data
+    if writes:
+        ingest.table.update_item(
+            Key={"pk": run_pk(run_id), "sk": "RUN"},
+            UpdateExpression="ADD writes :n",
+            ExpressionAttributeValues={":n": writes}
+        )
+
+
+def complete_shard(run_id: str, index: int) -> bool:
+    # Returns True for the call that completed the last shard. Both updates
+    # are idempotent, so a retried worker can't finish a shard twice.
+    try:
+        ingest.table.update_item(
+            Key={"pk": run_pk(run_id), "sk": shard_sk(index)},
+            UpdateExpression="SET #status = :done, updated_date = :date",
+            ConditionExpression="#status <> :done",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":done": "done", ":date": today()}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+    resp = ingest.table.update_item(
+        Key={"pk": run_pk(run_id), "sk": "RUN"},
+        UpdateExpression="ADD done_shards :k",
+        ExpressionAttributeValues={":k": {index}},
+        ReturnValues="ALL_NEW"
+    )
+    run = resp["Attributes"]
+    return len(run.get("done_shards", set())) >= int(run["shards"])
+
+
+def orchestrate(event: Dict[str, Any], context: Any, invoke: Invoke) -> Dict[str, Any]:
+    run_id = event.get("run_id") or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    options = {
+        "mode": event.get("mode", ingest.ingest_mode),
+        "word_counts": bool(event.get("word_counts", ingest.word_counts_enabled)),
+        "history": bool(event.get("history", ingest.history_enabled)),
+        "concurrency": int(event.get("concurrency", ingest.fetch_concurrency)),
+        "fulltext_concurrency": int(event.get("fulltext_concurrency", ingest.fulltext_concurrency)),
+    }
+    titles = ingest.fetch_titles().get("titles", [])
+    agencies = ingest.fetch_agencies().get("agencies", [])
+    specs = plan_shards([t["number"] for t in titles], len(agencies), int(event.get("shards", shard_count)))
+
+    date_str = today()
+    with BatchWriter(ingest.table_name, max_workers=ingest.write_workers) as writer:
+        writer.put(run_item(run_id, len(specs), options, date_str))
+        for spec in specs:
+            writer.put(shard_item(run_id, spec, date_str))
+    for spec in specs:
+        invoke({"stage": "shard", "run_id": run_id, "shard": spec})
+    return {
+        "ok": True,
+        "message": f"Started {len(specs)} shards",
+        "run_id": run_id,
+        "shards": specs
+    }
+
+
+def run_shard(event: Dict[str, Any], context: Any, invoke: Invoke) -> Dict[str, Any]:
+    run_id, spec = event["run_id"], event["shard"]
+    index = spec["index"]
+    run = load_item(run_id, "RUN")
+    checkpoint = load_item(run_id, shard_sk(index))
+    if not run or not checkpoint:
+        return {"ok": False, "message": f"Unknown shard {index} of run {run_id}"}
+    if checkpoint["status"] == "done":
+        return {"ok": True, "message": f"Shard {index} already complete"}
+
+    options = run["options"]
+    incremental = options["mode"] == "incremental"
+    deadline = Deadline(context, time_margin_ms)
+    stages = list(checkpoint.get("stages", []))
+    done = {stage: [int(n) for n in titles] for stage, titles in checkpoint.get("done", {}).items()}
+    progress = (len(stages), sum(len(titles) for titles in done.values()))
+    counts = ingest.new_counts()
+    mark_running(run_id, index)
+    ingest.ecfr.reset_stats()
+    telemetry.reset()
+
+    try:
+        with BatchWriter(ingest.table_name, max_workers=ingest.write_workers) as writer:
+            if "agencies" not in stages:
+                agencies = shard_agencies(ingest.fetch_agencies().get("agencies", []), spec)
+                ingest.ingest_agencies(agencies, writer, incremental, counts)
+                writer.flush()
+                stages.append("agencies")
+                save_checkpoint(run_id, index, "running", stages, done)
+
+            titles = [t for t in ingest.fetch_titles().get("titles", []) if in_shard(t["number"], spec)]
+
+            def structures(todo: List[Dict[str, Any]], finished: List[int]) -> None:
+                stored_summaries, units_by_title, part_scopes_by_title = ingest.load_title_summaries(todo)
+                ingest.ingest_titles(
+                    todo, stored_summaries, units_by_title, part_scopes_by_title,
+                    writer, incremental, counts, int(options["concurrency"]),
+                    stop=deadline, done=finished
+                )
+
+            def word_counts(todo: List[Dict[str, Any]], finished: List[int]) -> None:
+                # Title counts only; agency rollups need every title and run in finalize
+                counts["word_counts"] = ingest.store_word_counts(
+                    todo, [], writer, incremental, int(options["fulltext_concurrency"]),
+                    stop=deadline, done=finished
+                )
+
+            def history(todo: List[Dict[str, Any]], finished: List[int]) -> None:
+                counts["history"] = ingest.store_history(
+                    todo, [], {}, writer, incremental, run_id=run_id, stop=deadline, done=finished
+                )
+
+            for stage, work, enabled in (
+                ("structures", structures, True),
+                ("word_counts", word_counts, bool(options["word_counts"])),
+                ("history", history, bool(options["history"])),
+            ):
+                if stage in stages:
+                    continue
+                if enabled:
+                    if deadline():
+                        break
+                    finished = done.setdefault(stage, [])
+                    work([t for t in titles if t["number"] not in set(finished)], finished)
+                    writer.flush()
+                if not deadline.hit:
+                    stages.append(stage)
+                save_checkpoint(run_id, index, "running", stages, done)
+                if deadline.hit:
+                    break
+    except Exception as e:
+        # Left for Lambda's async retry (or "resume"), which starts from the checkpoint
+        mark_failed(run_id, index, str(e))
+        raise
+
+    write_stats = writer.stats()
+    record_writes(run_id, write_stats["puts"] + write_stats["deletes"])
+    counts["writes"] = write_stats
+    fetch_stats = ingest.ecfr.stats()
+    print(json.dumps({"run_id": run_id, "shard": index, "fetch_latency": fetch_stats.pop("per_request")}))
+    counts["fetch"] = fetch_stats
+    ingest.store_run_metrics("shard", {"run_id": run_id, "shard": index, "fetch": fetch_stats, "writes": write_stats})
+
+    if deadline.hit and progress == (len(stages), sum(len(titles) for titles in done.values())):
+        # Re-invoking would stop at the same point forever
+        message = f"Shard {index} made no progress within INGEST_TIME_MARGIN_MS ({time_margin_ms} ms)"
+        mark_failed(run_id, index, message)
+        return {"ok": False, "message": message, "counts": counts}
+    if deadline.hit:
+        # Out of time: a fresh invocation carries on from the checkpoint
+        invoke({"stage": "shard", "run_id": run_id, "shard": spec})
+        return {"ok": True, "message": f"Shard {index} continues in a new invocation", "counts": counts}
+    if complete_shard(run_id, index):
+        invoke({"stage": "finalize", "run_id": run_id})
+    return {"ok": True, "message": f"Shard {index} complete", "counts": counts}
+
+
+def finalize(event: Dict[str, Any], context: Any, invoke: Invoke) -> Dict[str, Any]:
+    run_id = event["run_id"]
+    try:
+        ingest.table.update_item(
+            Key={"pk": run_pk(run_id), "sk": "RUN"},
+            UpdateExpression="SET #status = :finalizing, updated_date = :date",
+            ConditionExpression="attribute_exists(pk) AND #status <> :done",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":finalizing": "finalizing", ":done": "done", ":date": today()}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return {"ok": True, "message": f"Run {run_id} already finalized"}
+        raise
+
+    run = load_item(run_id, "RUN")
+    options = run["options"]
+    incremental = options["mode"] == "incremental"
+    telemetry.reset()
+    agencies = ingest.fetch_agencies().get("agencies", [])
+    titles = ingest.fetch_titles().get("titles", [])
+    counts: Dict[str, Any] = {}
+    marker = None
+
+    with BatchWriter(ingest.table_name, max_workers=ingest.write_workers) as writer:
+        stored_summaries, units_by_title, part_scopes_by_title = ingest.load_title_summaries(titles)
+        stored_checksums = ingest.load_stored_items(
+            [{"pk": f"AGENCY#{a['slug']}", "sk": "CHECKSUM"} for a in agencies], ["checksum"]
+        ) if incremental else {}
+        counts["agency_checksums"] = ingest.store_agency_checksums(agencies, units_by_title, writer, stored_checksums)
+
+        if options["word_counts"]:
+            counts["word_counts"] = ingest.store_word_counts(
+                titles, agencies, writer, incremental, int(options["fulltext_concurrency"]), recount=False
+            )
+        if options["history"]:
+            counts["history"] = ingest.store_agency_history(
+                run_id, titles, agencies, part_scopes_by_title, writer, incremental
+            )
+        counts["rollups"] = ingest.store_agency_rollups(titles, agencies, writer, incremental)
+        counts["search_index"] = ingest.store_search_index(titles, writer, incremental)
+
+        write_stats = writer.stats()
+        if int(run.get("writes", 0)) + write_stats["puts"] + write_stats["deletes"]:
+            writer.flush()
+            marker = ingest.generation_marker()
+            writer.put(marker)
+
+    counts["writes"] = writer.stats()
+    ingest.table.update_item(
+        Key={"pk": run_pk(run_id), "sk": "RUN"},
+        UpdateExpression="SET #status = :done, updated_date = :date",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={":done": "done", ":date": today()}
+    )
+    counts["publish_requested"] = ingest.request_publish(marker) if marker else False
+    ingest.store_run_metrics("finalize", {"run_id": run_id, "writes": counts["writes"]})
+    return {"ok": True, "message": f"Run {run_id} finalized", "counts": counts}
+
+
+def resume(event: Dict[str, Any], context: Any, invoke: Invoke) -> Dict[str, Any]:
+    run_id = event["run_id"]
+    items = ingest.table.query(
+        KeyConditionExpression=Key("pk").eq(run_pk(run_id)), ConsistentRead=True
+    ).get("Items", [])
+    run = next((item for item in items if item["sk"] == "RUN"), None)
+    if run is None:
+        return {"ok": False, "message": f"Unknown run {run_id}"}
+
+    unfinished = [spec_from_item(item) for item in items if item["sk"].startswith("SHARD#") and item["status"] != "done"]
+    for spec in unfinished:
+        invoke({"stage": "shard", "run_id": run_id, "shard": spec})
+    if unfinished:
+        message = f"Resumed {len(unfinished)} shards"
+    elif run["status"] != "done":
+        invoke({"stage": "finalize", "run_id": run_id})
+        message = "Re-running finalize"
+    else:
+        message = f"Run {run_id} is already complete"
+    return {"ok": True, "message": message, "run_id": run_id}
+
+
+STAGE_HANDLERS = {
+    "orchestrate": orchestrate,
+    "shard": run_shard,
+    "finalize": finalize,
+    "resume": resume,
+}
+
+
+def dispatch(event: Dict[str, Any], context: Any, invoke: Optional[Invoke] = None) -> Dict[str, Any]:
+    stage = STAGE_HANDLERS.get(event["stage"])
+    if stage is None:
+        return {"ok": False, "message": f"Unknown stage {event['stage']}; use one of {', '.join(STAGE_HANDLERS)}"}
+    return stage(event, context, invoke or lambda_invoker(context))
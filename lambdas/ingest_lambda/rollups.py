@@ -0,0 +1,124 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from merkle import TreeNode, agency_checksum, ref_unit_key
+
+# Per-agency rollups of the structure, joined through cfr_references.
+#
+# Structure ingest stores TITLE#n / UNIT_STATS: for every referenceable unit
+# [size in bytes, nodes, parts, sections, enclosing unit]. Agencies (with the
+# references of their sub-agencies folded in) are summed over the units they
+# reference into AGENCY#slug / ROLLUP, and each ranked metric gets one
+# RANKING#<metric> item per agency whose sort key orders agencies by value.
+
+SIZE, NODES, PARTS, SECTIONS, PARENT = range(5)
+# Rollup fields that can be ranked; the API's /api/rankings/{metric} accepts the same names
+RANK_METRICS = ("total_bytes", "nodes", "parts", "sections", "word_count", "titles")
+
+
+def add_unit_stats(stats: Dict[str, List[Any]], tree_node: TreeNode) -> None:
+    # Nodes from merkle.iter_tree or structure_stream, in any order; every
+    # node counts towards each unit in its scope
+    node_type = tree_node.node.get("type")
+    for unit in tree_node.scope:
+        entry = stats.setdefault(unit, [0, 0, 0, 0, ""])
+        entry[NODES] += 1
+        entry[PARTS] += 1 if node_type == "part" else 0
+        entry[SECTIONS] += 1 if node_type == "section" else 0
+    if tree_node.unit:
+        stats[tree_node.unit][SIZE] = int(tree_node.node.get("size") or 0)
+        stats[tree_node.unit][PARENT] = tree_node.scope[-2] if len(tree_node.scope) > 1 else ""
+
+
+def iter_agencies(agencies: List[Dict[str, Any]], parent: Optional[str] = None) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+    # Top-level agencies and their sub-agencies, each with its parent's slug
+    for agency in agencies:
+        yield agency, parent
+        yield from iter_agencies(agency.get("children") or [], agency["slug"])
+
+
+def all_references(agency: Dict[str, Any]) -> List[Dict[str, Any]]:
+    refs = list(agency.get("cfr_references", []))
+    for child in agency.get("children") or []:
+        refs.extend(all_references(child))
+    return refs
+
+
+def referenced_units(refs: List[Dict[str, Any]], stats_by_title: Dict[int, Dict[str, List[Any]]]) -> Tuple[List[Tuple[int, str]], int]:
+    # Distinct (title, unit) pairs, dropping units already covered by a
+    # referenced enclosing unit so nothing is counted twice. Also returns how
+    # many references match no stored unit.
+    wanted = set()
+    unresolved = 0
+    for ref in refs:
+        key = ref_unit_key(ref)
+        if key and key in stats_by_title.get(ref.get("title"), {}):
+            wanted.add((ref["title"], key))
+        else:
+            unresolved += 1
+    covered = []
+    for title_num, unit in sorted(wanted, key=str):
+        stats = stats_by_title[title_num]
+        parent = stats[unit][PARENT]
+        while parent and (title_num, parent) not in wanted:
+            parent = stats.get(parent, [0, 0, 0, 0, ""])[PARENT]
+        if not parent:
+            covered.append((title_num, unit))
+    return covered, unresolved
+
+
+def agency_rollup(
+    agency: Dict[str, Any],
+    parent: Optional[str],
+    stats_by_title: Dict[int, Dict[str, List[Any]]],
+    words_by_title: Dict[int, Dict[str, int]],
+    hashes_by_title: Dict[int, Dict[str, str]],
+    amended_by_title: Dict[int, str],
+    date_str: str,
+) -> Dict[str, Any]:
+    refs = all_references(agency)
+    units, unresolved = referenced_units(refs, stats_by_title)
+    title_numbers = sorted({title_num for title_num, _ in units})
+    item = {
+        "pk": f"AGENCY#{agency['slug']}",
+        "sk": "ROLLUP",
+        "entity_type": "agency_rollup",
+        "agency_slug": agency["slug"],
+        "name": agency.get("name", ""),
+        "parent_slug": parent or "",
+        "sub_agencies": [child["slug"] for child in agency.get("children") or []],
+        "total_bytes": sum(int(stats_by_title[t][u][SIZE]) for t, u in units),
+        "nodes": sum(int(stats_by_title[t][u][NODES]) for t, u in units),
+        "parts": sum(int(stats_by_title[t][u][PARTS]) for t, u in units),
+        "sections": sum(int(stats_by_title[t][u][SECTIONS]) for t, u in units),
+        "titles": len(title_numbers),
+        "units": len(units),
+        "unresolved_references": unresolved,
+        "checksum": agency_checksum(refs, hashes_by_title)[0],
+        "last_amended_on": max((amended_by_title.get(t) or "" for t in title_numbers), default=""),
+        "updated_date": date_str,
+    }
+    # Only when every referenced title has been counted
+    if units and all(t in words_by_title for t in title_numbers):
+        item["word_count"] = sum(int(words_by_title[t].get(u, 0)) for t, u in units)
+    return item
+
+
+def rank_sk(value: int, slug: str) -> str:
+    # Zero-padded so string order is numeric order; the slug breaks ties
+    return f"{int(value):020d}#{slug}"
+
+
+def ranking_items(rollup: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "pk": f"RANKING#{metric}",
+            "sk": rank_sk(rollup[metric], rollup["agency_slug"]),
+            "agency_slug": rollup["agency_slug"],
+            "name": rollup["name"],
+            "parent_slug": rollup["parent_slug"],
+            "metric": metric,
+            "value": rollup[metric],
+            "updated_date": rollup["updated_date"],
+        }
+        for metric in RANK_METRICS if metric in rollup
+    ]
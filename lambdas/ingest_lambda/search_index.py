@@ -0,0 +1,187 @@
+import json
+import re
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from structure_blob import varint
+
+# Inverted index over structure headings, read by the API's search_index.py.
+#
+# Every title with a stored structure also gets TITLE#n / SEARCH#k: its
+# searchable nodes ("docs") as chunked zlib JSON, each prefixed with its
+# position in the document since they are written in parse order. When
+# any title changed, the whole index is rebuilt from those fragments under a
+# new generation and META / SEARCH_INDEX is pointed at it:
+#
+#   SEARCH#<gen> / TERMS#<prefix>#<k>  terms starting with <prefix>, chunked
+#   SEARCH#<gen> / DOCS#<k>            docs k * DOCS_PER_CHUNK onwards
+#
+# A shard is magic "CFRI", version byte, varint term count, then per term
+# (sorted): varint length + UTF-8 term, varint posting byte length, postings.
+# Postings are varint pairs: doc id delta, then weight << TYPE_BITS | type
+# code, so the API can rank and filter by node type without reading docs.
+
+MAGIC = b"CFRI"
+VERSION = 1
+# Bumped when tokenizing or the encoding changes; forces a rebuild
+INDEX_VERSION = 1
+PREFIX_LEN = 2
+MIN_TERM = 2
+DOCS_PER_CHUNK = 500
+CHUNK_BYTES = 350 * 1024
+TYPE_BITS = 4
+DOC_TYPES = ("title", "subtitle", "chapter", "subchapter", "part", "subpart", "subject_group", "section", "appendix")
+OTHER_TYPE = (1 << TYPE_BITS) - 1
+# Terms in label_description are what a heading is about; the rest of the
+# label is mostly numbering
+HEADING_WEIGHT = 3
+LABEL_WEIGHT = 1
+
+# Identifiers like "60.1" or "1910.1200" stay one term
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+STOPWORDS = frozenset(("an", "and", "as", "at", "by", "for", "from", "in", "of", "on", "or", "the", "to", "with"))
+
+Doc = List[str]  # [path, type, label, label_description]
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) >= MIN_TERM and t not in STOPWORDS]
+
+
+def node_doc(node: Dict[str, Any], path: str) -> Optional[Doc]:
+    # Nodes without any heading text aren't searchable
+    if not (node.get("label") or node.get("label_description")):
+        return None
+    return [path, node.get("type", ""), node.get("label", "") or "", node.get("label_description", "") or ""]
+
+
+def _split(blob: bytes) -> List[bytes]:
+    return [blob[i:i + CHUNK_BYTES] for i in range(0, len(blob), CHUNK_BYTES)] or [blob]
+
+
+def _chunks(data: bytes) -> List[bytes]:
+    return _split(zlib.compress(data, 9))
+
+
+def fragment_sk(index: int) -> str:
+    return f"SEARCH#{index:04d}"
+
+
+class FragmentEncoder:
+    """Compresses a title's docs as they are found, so only the compressed
+    fragment is ever held."""
+
+    def __init__(self):
+        self.docs = 0
+        self._deflate = zlib.compressobj(9)
+        self._parts: List[bytes] = []
+
+    def add(self, order: int, doc: Doc) -> None:
+        data = json.dumps([order] + doc, separators=(',', ':')).encode("utf-8")
+        self._parts.append(self._deflate.compress((b"," if self.docs else b"[") + data))
+        self.docs += 1
+
+    def items(self, title_num: int, checksum: str, date_str: str) -> List[Dict[str, Any]]:
+        chunks = _split(b"".join(self._parts) + self._deflate.compress(b"]" if self.docs else b"[]") + self._deflate.flush())
+        return [
+            {
+                "pk": f"TITLE#{title_num}",
+                "sk": fragment_sk(k),
+                "data": chunk,
+                "chunk": k,
+                "chunks": len(chunks),
+                "docs": self.docs,
+                "checksum": checksum,
+                "updated_date": date_str,
+            }
+            for k, chunk in enumerate(chunks)
+        ]
+
+
+def read_fragment(items: List[Dict[str, Any]]) -> List[Doc]:
+    # Docs in document order
+    chunks = sorted(items, key=lambda item: int(item["chunk"]))
+    if len(chunks) != int(chunks[0]["chunks"]) or len({c["checksum"] for c in chunks}) != 1:
+        raise ValueError("Search fragment chunks are from different ingest runs")
+    data = b"".join(bytes(getattr(c["data"], "value", c["data"])) for c in chunks)
+    docs = json.loads(zlib.decompress(data))
+    if docs and len(docs[0]) == 4:
+        return docs  # written before fragments were streamed, already in order
+    return [doc[1:] for doc in sorted(docs, key=lambda doc: doc[0])]
+
+
+def type_code(node_type: str) -> int:
+    return DOC_TYPES.index(node_type) if node_type in DOC_TYPES else OTHER_TYPE
+
+
+class IndexBuilder:
+    """Accumulates postings for titles added in order, then encodes shards."""
+
+    def __init__(self):
+        self.docs: List[Tuple[int, Doc]] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.title_ranges: Dict[str, List[int]] = {}
+
+    def add_title(self, title_num: int, docs: List[Doc]) -> None:
+        start = len(self.docs)
+        for path, node_type, label, description in docs:
+            doc_id = len(self.docs)
+            self.docs.append((title_num, [path, node_type, label, description]))
+            weights: Dict[str, int] = {}
+            for term in tokenize(label) + tokenize(path.rsplit("/", 1)[-1]):
+                weights[term] = LABEL_WEIGHT
+            for term in tokenize(description):
+                weights[term] = HEADING_WEIGHT
+            code = type_code(node_type)
+            for term, weight in weights.items():
+                self.postings.setdefault(term, []).append((doc_id, weight << TYPE_BITS | code))
+        self.title_ranges[str(title_num)] = [start, len(self.docs)]
+
+    def shards(self) -> Iterator[Tuple[str, bytes]]:
+        by_prefix: Dict[str, List[str]] = {}
+        for term in self.postings:
+            by_prefix.setdefault(term[:PREFIX_LEN], []).append(term)
+        for prefix in sorted(by_prefix):
+            out = [MAGIC, bytes([VERSION]), varint(len(by_prefix[prefix]))]
+            for term in sorted(by_prefix[prefix]):
+                postings = bytearray()
+                last = 0
+                # Doc ids are appended in increasing order, so deltas are small
+                for doc_id, packed in self.postings[term]:
+                    postings += varint(doc_id - last)
+                    postings += varint(packed)
+                    last = doc_id
+                encoded = term.encode("utf-8")
+                out.extend((varint(len(encoded)), encoded, varint(len(postings)), bytes(postings)))
+            yield prefix, b"".join(out)
+
+    def items(self, generation: str, date_str: str) -> Iterator[Dict[str, Any]]:
+        pk = f"SEARCH#{generation}"
+        for prefix, data in self.shards():
+            chunks = _chunks(data)
+            for k, chunk in enumerate(chunks):
+                yield {"pk": pk, "sk": f"TERMS#{prefix}#{k:04d}", "data": chunk, "chunk": k,
+                       "chunks": len(chunks), "updated_date": date_str}
+        for k in range(0, len(self.docs), DOCS_PER_CHUNK):
+            docs = [[title_num] + doc for title_num, doc in self.docs[k:k + DOCS_PER_CHUNK]]
+            yield {"pk": pk, "sk": f"DOCS#{k // DOCS_PER_CHUNK:05d}",
+                   "data": zlib.compress(json.dumps(docs, separators=(',', ':')).encode("utf-8"), 9),
+                   "updated_date": date_str}
+
+    def pointer(self, generation: str, source: str, date_str: str) -> Dict[str, Any]:
+        # META / SEARCH_INDEX: everything a query needs besides the shards and docs
+        return {
+            "pk": "META",
+            "sk": "SEARCH_INDEX",
+            "generation": generation,
+            "index_version": INDEX_VERSION,
+            "source": source,
+            "docs": len(self.docs),
+            "terms": len(self.postings),
+            "docs_per_chunk": DOCS_PER_CHUNK,
+            "prefix_len": PREFIX_LEN,
+            "type_bits": TYPE_BITS,
+            "doc_types": list(DOC_TYPES),
+            "title_ranges": self.title_ranges,
+            "updated_date": date_str,
+        }
@@ -0,0 +1,87 @@
+from typing import Any, Dict, List, Optional
+
+# Per-shard work, in the order a worker runs it. Each stage records the
+# titles it finished so a re-invoked worker picks up where it stopped.
+STAGES = ("agencies", "structures", "word_counts", "history")
+
+
+def run_pk(run_id: str) -> str:
+    return f"INGEST#{run_id}"
+
+
+def shard_sk(index: int) -> str:
+    return f"SHARD#{index:04d}"
+
+
+def plan_shards(title_numbers: List[int], agency_count: int, shard_count: int) -> List[Dict[str, Any]]:
+    # One contiguous title range and one agency slice per shard. Agencies are
+    # sliced by position in the slug-sorted listing (see shard_agencies).
+    numbers = sorted(title_numbers)
+    n = max(1, min(shard_count, max(len(numbers), agency_count, 1)))
+    shards = []
+    for k in range(n):
+        lo, hi = k * len(numbers) // n, (k + 1) * len(numbers) // n
+        shards.append({
+            "index": k,
+            "titles": [numbers[lo], numbers[hi - 1]] if hi > lo else [],
+            "agencies": [k * agency_count // n, (k + 1) * agency_count // n],
+        })
+    return shards
+
+
+def in_shard(title_num: int, spec: Dict[str, Any]) -> bool:
+    # Title range is inclusive; an empty range means the shard has no titles
+    bounds = spec.get("titles") or []
+    return bool(bounds) and bounds[0] <= title_num <= bounds[1]
+
+
+def shard_agencies(agencies: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    start, stop = spec.get("agencies") or [0, 0]
+    return sorted(agencies, key=lambda a: a["slug"])[start:stop]
+
+
+def shard_item(run_id: str, spec: Dict[str, Any], date_str: str) -> Dict[str, Any]:
+    return {
+        "pk": run_pk(run_id),
+        "sk": shard_sk(spec["index"]),
+        "entity_type": "ingest_shard",
+        "shard": spec,
+        "status": "pending",
+        "attempts": 0,
+        "stages": [],
+        "done": {stage: [] for stage in STAGES if stage != "agencies"},
+        "updated_date": date_str,
+    }
+
+
+def run_item(run_id: str, shard_count: int, options: Dict[str, Any], date_str: str) -> Dict[str, Any]:
+    return {
+        "pk": run_pk(run_id),
+        "sk": "RUN",
+        "entity_type": "ingest_run",
+        "status": "running",
+        "shards": shard_count,
+        "options": options,
+        "writes": 0,
+        "updated_date": date_str,
+    }
+
+
+class Deadline:
+    # Callable stop check for the ingest stages. Once tripped it stays
+    # tripped, so after a stage returns the worker can tell it ended early.
+    def __init__(self, context: Any, margin_ms: int):
+        self.context = context
+        self.margin_ms = margin_ms
+        self.hit = False
+
+    def remaining_ms(self) -> Optional[int]:
+        if self.context is None or not hasattr(self.context, "get_remaining_time_in_millis"):
+            return None
+        return self.context.get_remaining_time_in_millis()
+
+    def __call__(self) -> bool:
+        if not self.hit:
+            remaining = self.remaining_ms()
+            self.hit = remaining is not None and remaining < self.margin_ms
+        return self.hit
@@ -0,0 +1,142 @@
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List
+
+from merkle import TreeNode
+
+# Compact encoding of a whole title structure, stored as TITLE#n / BLOB#k
+# chunks instead of one item per node. The API's structure_blob.py decodes it.
+#
+#   magic "CFRT", version byte
+#   string table: varint count, then varint length + UTF-8 bytes per string
+#   root node record
+#
+# Node record, pre-order:
+#   varint string ids: type, identifier, label, label_level, label_description
+#   varint flags (1 = reserved, 2 = has extra fields)
+#   varint size
+#   varint volume count, then a string id per volume
+#   [varint string id of the remaining fields as JSON, if flag 2]
+#   varint child count
+#   varint byte length of the child records, then the child records
+#
+# The child byte length lets a reader skip whole subtrees, so finding one node
+# only decodes the records along its path and their siblings. String id 0 is
+# always "". Per-node Merkle hashes are not stored; the root hash in the title
+# SUMMARY covers the whole blob.
+MAGIC = b"CFRT"
+VERSION = 1
+# DynamoDB items top out at 400 KB; leave room for the key and attributes
+CHUNK_BYTES = 350 * 1024
+
+FLAG_RESERVED = 1
+FLAG_EXTRA = 2
+STRING_FIELDS = ("type", "identifier", "label", "label_level", "label_description")
+KNOWN_FIELDS = set(STRING_FIELDS) | {"reserved", "size", "volumes", "children"}
+
+
+def varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class _Strings:
+    def __init__(self):
+        self.ids: Dict[str, int] = {"": 0}
+
+    def id(self, value: Any) -> int:
+        value = "" if value is None else str(value)
+        if value not in self.ids:
+            self.ids[value] = len(self.ids)
+        return self.ids[value]
+
+    def encode(self) -> bytes:
+        out = [varint(len(self.ids))]
+        for value in self.ids:  # dicts keep insertion order, i.e. id order
+            data = value.encode("utf-8")
+            out.append(varint(len(data)))
+            out.append(data)
+        return b"".join(out)
+
+
+class TreeEncoder:
+    """Encodes a title from its nodes in post-order, as they are parsed.
+
+    Nodes come from merkle.iter_tree or structure_stream and need no
+    ``children``: every child is encoded before its parent, and the records
+    waiting one level below a finishing node are exactly its children.
+    """
+
+    def __init__(self):
+        self.strings = _Strings()
+        self.pending: Dict[int, List[bytes]] = {}
+        self.nodes = 0
+        self.checksum = ""
+
+    def add(self, tree_node: TreeNode) -> None:
+        node = tree_node.node
+        extra = {k: v for k, v in node.items() if k not in KNOWN_FIELDS}
+        flags = (FLAG_RESERVED if node.get("reserved") else 0) | (FLAG_EXTRA if extra else 0)
+        volumes = node.get("volumes") or []
+        record = [varint(self.strings.id(node.get(field))) for field in STRING_FIELDS]
+        record.append(varint(flags))
+        record.append(varint(int(node.get("size") or 0)))
+        record.append(varint(len(volumes)))
+        record.extend(varint(self.strings.id(v)) for v in volumes)
+        if extra:
+            record.append(varint(self.strings.id(json.dumps(extra, sort_keys=True, separators=(',', ':')))))
+        children = self.pending.pop(tree_node.depth + 1, [])
+        body = b"".join(children)
+        record.append(varint(len(children)))
+        record.append(varint(len(body)))
+        record.append(body)
+        self.pending.setdefault(tree_node.depth, []).append(b"".join(record))
+        self.nodes += 1
+        # The root comes last
+        self.checksum = tree_node.checksum
+
+    def tap(self, nodes: Iterable[TreeNode]) -> Iterator[TreeNode]:
+        # Passes nodes through unchanged, encoding each on the way
+        for tree_node in nodes:
+            self.add(tree_node)
+            yield tree_node
+
+    def encode(self) -> bytes:
+        return MAGIC + bytes([VERSION]) + self.strings.encode() + self.pending[0][0]
+
+
+def encode_tree(nodes: Iterable[TreeNode]) -> bytes:
+    encoder = TreeEncoder()
+    for tree_node in nodes:
+        encoder.add(tree_node)
+    return encoder.encode()
+
+
+def blob_sk(index: int) -> str:
+    return f"BLOB#{index:04d}"
+
+
+def blob_items(title_num: int, encoder: TreeEncoder, date_str: str) -> List[Dict[str, Any]]:
+    # Compressed encoding split into TITLE#n / BLOB#k items. Every chunk
+    # carries the root hash and chunk count, so a reader can tell when it
+    # caught a rewrite half way.
+    blob = zlib.compress(encoder.encode(), 9)
+    chunks = [blob[i:i + CHUNK_BYTES] for i in range(0, len(blob), CHUNK_BYTES)]
+    return [
+        {
+            "pk": f"TITLE#{title_num}",
+            "sk": blob_sk(k),
+            "data": chunk,
+            "chunk": k,
+            "chunks": len(chunks),
+            "encoding": f"cfrt{VERSION}+zlib",
+            "nodes": encoder.nodes,
+            "checksum": encoder.checksum,
+            "updated_date": date_str,
+        }
+        for k, chunk in enumerate(chunks)
+    ]
@@ -0,0 +1,144 @@
+import json
+from typing import Any, Dict, Iterator, List, Tuple
+
+from merkle import TreeNode, own_fields
+
+# Structural diff of one title between two dates.
+#
+# Both trees are hashed once by merkle.iter_tree. The diff then walks them
+# top-down in step and stops at every pair of nodes whose Merkle hashes
+# match, so only changed nodes, their ancestors and their siblings are ever
+# visited: the walk costs time in proportion to the change, not the title.
+
+# Listed changes per kind; the counts always cover everything
+MAX_CHANGES = 1000
+# Stored as one DynamoDB item, so the encoded diff stays under the 400 KB limit
+MAX_ITEM_BYTES = 350 * 1024
+
+
+class Snapshot:
+    """A title structure with per-node Merkle hashes and subtree sizes."""
+
+    def __init__(self, nodes: List[TreeNode]):
+        # `nodes` comes from merkle.iter_tree; the root is last
+        self.root = nodes[-1].node
+        self.checksum = nodes[-1].checksum
+        self.hashes: Dict[int, str] = {}
+        self.counts: Dict[int, int] = {}
+        for tree_node in nodes:
+            node = tree_node.node
+            self.hashes[id(node)] = tree_node.checksum
+            # Post-order, so every child is counted before its parent
+            self.counts[id(node)] = 1 + sum(self.counts[id(c)] for c in node.get("children", []))
+
+    def __len__(self) -> int:
+        return self.counts[id(self.root)]
+
+
+def _keyed(children: List[Dict[str, Any]]) -> Dict[Tuple[str, str, int], Dict[str, Any]]:
+    # Siblings are matched by type and identifier; the ordinal keeps
+    # duplicate identifiers (e.g. reserved placeholders) apart
+    keyed = {}
+    seen: Dict[Tuple[str, str], int] = {}
+    for child in children:
+        key = (child.get("type", ""), str(child.get("identifier", "")))
+        keyed[key + (seen.get(key, 0),)] = child
+        seen[key] = seen.get(key, 0) + 1
+    return keyed
+
+
+def _summary(node: Dict[str, Any], path: str, nodes: int) -> Dict[str, Any]:
+    return {
+        "path": path,
+        "type": node.get("type", ""),
+        "label": node.get("label", ""),
+        "size": int(node.get("size") or 0),
+        "nodes": nodes,
+    }
+
+
+def _field_changes(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    old_fields, new_fields = own_fields(old), own_fields(new)
+    return {
+        name: {"from": old_fields.get(name), "to": new_fields.get(name)}
+        for name in sorted(set(old_fields) | set(new_fields))
+        if old_fields.get(name) != new_fields.get(name)
+    }
+
+
+def iter_changes(old: Snapshot, new: Snapshot) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    # ("added" | "removed" | "modified" | "pruned", entry) in document order.
+    # Added and removed subtrees are reported once, at their top node.
+    stack = [(old.root, new.root, str(new.root.get("identifier", "")))]
+    while stack:
+        a, b, path = stack.pop()
+        if old.hashes[id(a)] == new.hashes[id(b)]:
+            yield "pruned", {"path": path, "nodes": new.counts[id(b)]}
+            continue
+        fields = _field_changes(a, b)
+        if fields:
+            size_from, size_to = int(a.get("size") or 0), int(b.get("size") or 0)
+            yield "modified", {
+                "path": path,
+                "type": b.get("type", ""),
+                "label": b.get("label", ""),
+                "fields": fields,
+                "size_from": size_from,
+                "size_to": size_to,
+                "size_delta": size_to - size_from,
+            }
+        before, after = _keyed(a.get("children", [])), _keyed(b.get("children", []))
+        pairs = []
+        for key, child in before.items():
+            if key not in after:
+                yield "removed", _summary(child, f"{path}/{child.get('identifier', '')}", old.counts[id(child)])
+        for key, child in after.items():
+            child_path = f"{path}/{child.get('identifier', '')}"
+            if key in before:
+                pairs.append((before[key], child, child_path))
+            else:
+                yield "added", _summary(child, child_path, new.counts[id(child)])
+        stack.extend(reversed(pairs))
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot, max_changes: int = MAX_CHANGES) -> Dict[str, Any]:
+    changes: Dict[str, List[Dict[str, Any]]] = {"added": [], "removed": [], "modified": []}
+    counts = {"added": 0, "removed": 0, "modified": 0, "added_nodes": 0, "removed_nodes": 0,
+              "pruned_subtrees": 0, "pruned_nodes": 0}
+    for kind, entry in iter_changes(old, new):
+        if kind == "pruned":
+            counts["pruned_subtrees"] += 1
+            counts["pruned_nodes"] += entry["nodes"]
+            continue
+        counts[kind] += 1
+        if kind != "modified":
+            counts[f"{kind}_nodes"] += entry["nodes"]
+        if len(changes[kind]) < max_changes:
+            changes[kind].append(entry)
+    # Nodes that were neither pruned nor added are the ones the walk looked at
+    counts["visited_nodes"] = len(new) - counts["pruned_nodes"] - counts["added_nodes"]
+    truncated = any(counts[kind] > len(changes[kind]) for kind in changes)
+    return {
+        "from_checksum": old.checksum,
+        "to_checksum": new.checksum,
+        "identical": old.checksum == new.checksum,
+        "from_nodes": len(old),
+        "to_nodes": len(new),
+        "size_from": int(old.root.get("size") or 0),
+        "size_to": int(new.root.get("size") or 0),
+        "size_delta": int(new.root.get("size") or 0) - int(old.root.get("size") or 0),
+        "counts": counts,
+        "truncated": truncated,
+        **changes,
+    }
+
+
+def fit_item(diff: Dict[str, Any], max_bytes: int = MAX_ITEM_BYTES) -> Dict[str, Any]:
+    # Halves the listed changes until the encoded diff fits in one item
+    while len(json.dumps(diff, separators=(',', ':'), default=str)) > max_bytes:
+        longest = max(("added", "removed", "modified"), key=lambda kind: len(diff[kind]))
+        if not diff[longest]:
+            break
+        diff[longest] = diff[longest][:len(diff[longest]) // 2]
+        diff["truncated"] = True
+    return diff
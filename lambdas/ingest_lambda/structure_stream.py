@@ -0,0 +1,142 @@
+import time
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import ijson
+
+from merkle import TreeNode, node_hash, unit_key
+from rollups import add_unit_stats
+from search_index import FragmentEncoder, node_doc
+
+# Structure ingest as a pipeline: the eCFR structure document is parsed
+# incrementally and every node is yielded, hashed, as soon as its closing
+# brace is read. Only the chain of open ancestors is held at any time, so
+# memory follows the depth of the tree rather than its size. The nodes are
+# the same TreeNodes merkle.iter_tree yields for the parsed document, with
+# the same checksums, except that `node` carries no "children".
+
+
+class _Open:
+    """A node whose closing brace hasn't been read yet."""
+
+    __slots__ = ("fields", "hashes", "order", "depth", "path", "chapter", "unit", "scope")
+
+    def __init__(self, order: int, depth: int):
+        self.fields: Dict[str, Any] = {}
+        self.hashes: List[str] = []
+        self.order = order
+        self.depth = depth
+        self.path: Optional[str] = None
+        self.chapter: Optional[str] = None
+        self.unit: Optional[str] = None
+        self.scope: Tuple[str, ...] = ()
+
+    def place(self, parent: Optional["_Open"]) -> None:
+        # Path and unit scope, as merkle.iter_tree derives them. Needs the
+        # node's identifier and type, and its parent placed first.
+        if self.path is not None:
+            return
+        if "identifier" not in self.fields:
+            raise ValueError("Structure node without an identifier before its children")
+        identifier = self.fields["identifier"]
+        self.path = f"{parent.path}/{identifier}" if parent else identifier
+        self.chapter = parent.chapter if parent else None
+        if self.fields.get("type") == "chapter":
+            self.chapter = identifier
+        self.unit = unit_key(self.fields.get("type", ""), identifier, self.chapter)
+        self.scope = (parent.scope if parent else ()) + ((self.unit,) if self.unit else ())
+
+
+def _value(events: Iterator[Tuple[str, Any]], event: str, value: Any) -> Any:
+    # A field value other than "children", built whole; these are small
+    if event not in ("start_map", "start_array"):
+        return value
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    while depth:
+        event, value = next(events)
+        depth += 1 if event in ("start_map", "start_array") else -1 if event in ("end_map", "end_array") else 0
+        builder.event(event, value)
+    return builder.value
+
+
+def iter_json_tree(body: BinaryIO, timings: Optional[Dict[str, float]] = None) -> Iterator[TreeNode]:
+    # Post-order, like merkle.iter_tree. Numbers are parsed as json.loads
+    # parses them, which keeps the hashes identical. With `timings`, the
+    # seconds spent hashing and the rest spent in here (reading and parsing)
+    # are added up under "checksum" and "parse".
+    clock = time.perf_counter if timings is not None else None
+    resumed = clock() if clock else 0.0
+    events = ijson.basic_parse(body, use_float=True)
+    stack: List[_Open] = []
+    # Whether the top of the stack is reading its "children" array
+    in_children: List[bool] = []
+    started = 0
+    for event, value in events:
+        if event == "map_key":
+            top = stack[-1]
+            event, next_value = next(events)
+            if value == "children" and event == "start_array":
+                top.place(stack[-2] if len(stack) > 1 else None)
+                in_children[-1] = True
+            elif value == "children":
+                _value(events, event, next_value)  # never part of a node's own fields
+            else:
+                top.fields[value] = _value(events, event, next_value)
+        elif event == "start_map" and (not stack or in_children[-1]):
+            stack.append(_Open(started, len(stack)))
+            in_children.append(False)
+            started += 1
+        elif event == "end_array" and stack and in_children[-1]:
+            in_children[-1] = False
+        elif event == "end_map":
+            top = stack.pop()
+            in_children.pop()
+            top.place(stack[-1] if stack else None)
+            if clock:
+                hashing = clock()
+                checksum = node_hash(top.fields, top.hashes)
+                timings["parse"] = timings.get("parse", 0.0) + hashing - resumed
+                timings["checksum"] = timings.get("checksum", 0.0) + clock() - hashing
+            else:
+                checksum = node_hash(top.fields, top.hashes)
+            if stack:
+                stack[-1].hashes.append(checksum)
+            yield TreeNode(top.fields, top.path, top.depth, checksum, top.unit, top.scope, top.order)
+            resumed = clock() if clock else 0.0
+        else:
+            raise ValueError(f"Unexpected {event} in structure document")
+
+
+class TreeTally:
+    """What a title's SUMMARY, UNIT_STATS and search fragment need, kept
+    while its nodes stream past on their way to the writer. Nothing here
+    grows with the number of sections except the compressed fragment."""
+
+    def __init__(self):
+        self.nodes = 0
+        self.checksum = ""
+        self.units: Dict[str, str] = {}
+        self.part_scopes: Dict[str, List[str]] = {}
+        self.unit_stats: Dict[str, List[Any]] = {}
+        self.fragment = FragmentEncoder()
+
+    def add(self, tree_node: TreeNode) -> None:
+        self.nodes += 1
+        # The root comes last
+        self.checksum = tree_node.checksum
+        if tree_node.unit:
+            self.units[tree_node.unit] = tree_node.checksum
+        # Version listings only name the part, so keep each part's enclosing units
+        if tree_node.node.get("type") == "part":
+            self.part_scopes[tree_node.node["identifier"]] = list(tree_node.scope)
+        add_unit_stats(self.unit_stats, tree_node)
+        doc = node_doc(tree_node.node, tree_node.path)
+        if doc:
+            self.fragment.add(tree_node.order, doc)
+
+    def tap(self, nodes: Iterable[TreeNode]) -> Iterator[TreeNode]:
+        # Passes nodes through unchanged, tallying each on the way
+        for tree_node in nodes:
+            self.add(tree_node)
+            yield tree_node
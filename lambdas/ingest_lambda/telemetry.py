@@ -0,0 +1,266 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# Ingest instrumentation: per-title stage timings, DynamoDB consumed capacity
+# and errors, logged as CloudWatch Embedded Metric Format (EMF) lines, which
+# CloudWatch turns into metrics without any API calls. The API's telemetry.py
+# is the request-side counterpart and reads the INGEST_METRICS items written
+# at the end of every invocation.
+
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "eCFR")
+FUNCTION = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "ingest-local")
+EMF_ENABLED = os.environ.get("METRICS_LOGS", "true").lower() == "true"
+# Operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = frozenset((
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems",
+))
+THROTTLE_CODES = frozenset(("ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded"))
+# Title stages in pipeline order. "load" reads the stored node checksums;
+# "write" is everything in storing a title that isn't parsing or hashing:
+# building items and waiting on BatchWriter.
+STAGES = ("fetch", "load", "parse", "checksum", "write")
+SLOWEST_TITLES = 10
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_TOP_STACKS = 50
+
+
+def _unit(name: str) -> str:
+    if name.endswith("_ms"):
+        return "Milliseconds"
+    if name.endswith("_bytes"):
+        return "Bytes"
+    return "Count"
+
+
+def emit(metrics: Dict[str, float], dimensions: Optional[Dict[str, str]] = None, **properties: Any) -> None:
+    # One EMF log line. Properties are logged alongside but aren't metrics,
+    # e.g. the title number, which would make a dimension per title.
+    if not EMF_ENABLED or not metrics:
+        return
+    dimensions = dict({"Function": FUNCTION}, **(dimensions or {}))
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": _unit(name)} for name in metrics],
+            }],
+        },
+        **dimensions,
+        **metrics,
+        **properties,
+    }, default=str))
+
+
+def error(stage: str, message: str, **fields: Any) -> None:
+    # Structured replacement for a bare print; counted per stage for the run summary
+    stages.count_error(stage)
+    print(json.dumps({"level": "error", "stage": stage, "message": message, **fields}, default=str))
+
+
+class Capacity:
+    """Consumed capacity, calls, retries and throttles per DynamoDB operation.
+
+    Fed by botocore event hooks on every client of the default session, so
+    every call is covered without touching call sites.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ops: Dict[str, Dict[str, float]] = {}
+            self._indexes: Dict[str, float] = {}
+
+    def record(self, operation: str, consumed: Any, retries: int, throttled: bool) -> None:
+        entries = consumed if isinstance(consumed, list) else [consumed] if consumed else []
+        with self._lock:
+            op = self._ops.setdefault(operation, {"calls": 0, "capacity_units": 0.0, "retries": 0, "throttled": 0})
+            op["calls"] += 1
+            op["retries"] += retries
+            op["throttled"] += 1 if throttled else 0
+            for entry in entries:
+                op["capacity_units"] += float(entry.get("CapacityUnits", 0))
+                table = entry.get("Table", {}).get("CapacityUnits")
+                if table is not None:
+                    self._indexes["table"] = self._indexes.get("table", 0.0) + float(table)
+                for name, index in entry.get("GlobalSecondaryIndexes", {}).items():
+                    self._indexes[name] = self._indexes.get(name, 0.0) + float(index.get("CapacityUnits", 0))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            ops = {name: dict(op, capacity_units=round(op["capacity_units"], 2)) for name, op in self._ops.items()}
+            indexes = {name: round(units, 2) for name, units in self._indexes.items()}
+        return {
+            "capacity_units": round(sum(op["capacity_units"] for op in ops.values()), 2),
+            "operations": ops,
+            "by_index": indexes,
+        }
+
+
+capacity = Capacity()
+
+
+def _request_capacity(params: Dict[str, Any], model: Any, **kwargs: Any) -> None:
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault("ReturnConsumedCapacity", "INDEXES")
+
+
+def _collect_capacity(parsed: Dict[str, Any], model: Any, **kwargs: Any) -> None:
+    if model.name in CAPACITY_OPERATIONS:
+        capacity.record(
+            model.name,
+            parsed.get("ConsumedCapacity"),
+            int(parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)),
+            parsed.get("Error", {}).get("Code") in THROTTLE_CODES,
+        )
+
+
+def instrument_dynamodb() -> None:
+    # Registers on the default boto3 session, so every DynamoDB client or
+    # resource created afterwards (including per-thread ones) is covered
+    import boto3
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    events = boto3.DEFAULT_SESSION.events
+    events.register("provide-client-params.dynamodb", _request_capacity, unique_id="telemetry-capacity-request")
+    events.register("after-call.dynamodb", _collect_capacity, unique_id="telemetry-capacity-collect")
+
+
+class Stages:
+    """Seconds per stage for each title, from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._titles: Dict[int, Dict[str, float]] = {}
+            self._errors: Counter = Counter()
+
+    def add(self, title_num: int, stage: str, seconds: float) -> None:
+        with self._lock:
+            stages = self._titles.setdefault(title_num, {})
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, title_num: int, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(title_num, stage, time.perf_counter() - started)
+
+    def count_error(self, stage: str) -> None:
+        with self._lock:
+            self._errors[stage] += 1
+
+    def title(self, title_num: int) -> Dict[str, float]:
+        # Milliseconds per stage, every stage present
+        with self._lock:
+            stages = dict(self._titles.get(title_num, {}))
+        return {f"{stage}_ms": round(stages.get(stage, 0.0) * 1000, 1) for stage in STAGES}
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            titles = {n: dict(stages) for n, stages in self._titles.items()}
+            errors = dict(self._errors)
+        totals = {stage: 0.0 for stage in STAGES}
+        for stages in titles.values():
+            for stage, seconds in stages.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        slowest = sorted(titles, key=lambda n: -sum(titles[n].values()))[:SLOWEST_TITLES]
+        return {
+            "titles": len(titles),
+            # Fetches overlap each other, so stage totals can exceed wall time
+            "totals_ms": {stage: round(seconds * 1000, 1) for stage, seconds in totals.items()},
+            "slowest_titles": [{"title": n, **self.title(n)} for n in slowest],
+            "errors": errors,
+        }
+
+
+stages = Stages()
+
+
+class Profiler:
+    """Statistical profiler: a background thread samples every other
+    thread's stack at a fixed interval and counts identical stacks.
+
+    Idle pool workers are skipped, so the counts show where time went
+    rather than where threads waited for work.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._started = 0.0
+
+    def start(self) -> "Profiler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.reverse()
+                # A pool worker blocked on its work queue is idle
+                if len(stack) > 1 and stack[-1].startswith(("threading.py:", "queue.py:")) and any(
+                        s.endswith("thread.py:_worker") for s in stack):
+                    continue
+                self._stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self) -> Dict[str, Any]:
+        # Collapsed stacks ("a;b;c" -> samples), the input flame graph tools take
+        self._stop.set()
+        self._thread.join()
+        return {
+            "duration_ms": round((time.perf_counter() - self._started) * 1000, 1),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stacks": [[stack, count] for stack, count in self._stacks.most_common(PROFILE_TOP_STACKS)],
+        }
+
+
+def run_summary(label: str, extra: Dict[str, Any]) -> Dict[str, Any]:
+    # Emits the run's EMF lines and returns the body of its INGEST_METRICS item.
+    # `label` says what kind of invocation this was: run, shard or finalize.
+    summary = {"label": label, "stages": stages.summary(), "dynamodb": capacity.snapshot(), **extra}
+    emit({
+        **{f"{stage}_ms": ms for stage, ms in summary["stages"]["totals_ms"].items()},
+        "titles": summary["stages"]["titles"],
+        "errors": sum(summary["stages"]["errors"].values()),
+        "capacity_units": summary["dynamodb"]["capacity_units"],
+    }, {"Run": label})
+    for name, op in summary["dynamodb"]["operations"].items():
+        emit({"calls": op["calls"], "capacity_units": op["capacity_units"], "retries": op["retries"],
+              "throttled": op["throttled"]}, {"Operation": name})
+    return summary
+
+
+def reset() -> None:
+    stages.reset()
+    capacity.reset()
@@ -0,0 +1,170 @@
+import re
+from decimal import Decimal
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Optional
+
+# Custom text metrics computed during the full-text pass (fulltext.py).
+#
+# A metric turns a batch of text into additive counters, e.g. {"words": 812,
+# "sentences": 31}. Counters are summed up the tree (section, part, chapter,
+# title, agency) and only turned into ratios by `finalize`, so every level's
+# result is exact. All metrics share the one streaming pass that already
+# counts words: registering another metric adds work per batch, never another
+# download or parse of the corpus.
+
+WORD_RE = re.compile(r"\w+(?:['’-]\w+)*")
+Counters = Dict[str, int]
+
+
+class TextBatch:
+    """A run of text from one place in the tree, handed to every metric.
+
+    Derived views are computed once per batch and shared, so metrics work on
+    whole batches with regex calls instead of per-token Python.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    @cached_property
+    def words(self) -> List[str]:
+        return WORD_RE.findall(self.text)
+
+    @cached_property
+    def lower(self) -> str:
+        return self.text.lower()
+
+
+class Metric:
+    # Subclasses set `name`, return counters from `measure` and derive the
+    # reported values from summed counters in `finalize`.
+    name = ""
+
+    def measure(self, batch: TextBatch) -> Counters:
+        raise NotImplementedError
+
+    def finalize(self, counters: Counters) -> Dict[str, float]:
+        raise NotImplementedError
+
+
+REGISTRY: Dict[str, Metric] = {}
+
+
+def register(cls):
+    REGISTRY[cls.name] = cls()
+    return cls
+
+
+def enabled(names: Optional[str]) -> List[Metric]:
+    # "all" (or unset), "none", or a comma-separated list of metric names
+    if not names or names == "all":
+        return list(REGISTRY.values())
+    if names == "none":
+        return []
+    unknown = [n for n in names.split(",") if n.strip() not in REGISTRY]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)}; registered: {', '.join(REGISTRY)}")
+    return [REGISTRY[n.strip()] for n in names.split(",")]
+
+
+def _ratio(num: float, den: float, scale: float = 1.0) -> float:
+    return num * scale / den if den else 0.0
+
+
+@register
+class RestrictiveTerms(Metric):
+    # Obligations and prohibitions per 1,000 words
+    name = "restrictive_terms"
+    TERMS = ("shall", "must", "may not", "prohibited", "required")
+    PATTERN = re.compile(r"\b(shall|must|may not|prohibited|required)\b")
+
+    def measure(self, batch: TextBatch) -> Counters:
+        counters = {"words": len(batch.words), "terms": 0}
+        for term in self.PATTERN.findall(batch.lower):
+            key = term.replace(" ", "_")
+            counters[key] = counters.get(key, 0) + 1
+            counters["terms"] += 1
+        return counters
+
+    def finalize(self, counters: Counters) -> Dict[str, float]:
+        values = {"per_1000_words": _ratio(counters.get("terms", 0), counters.get("words", 0), 1000)}
+        for term in self.TERMS:
+            values[term.replace(" ", "_")] = counters.get(term.replace(" ", "_"), 0)
+        return values
+
+
+@register
+class Readability(Metric):
+    # Mean sentence length and Flesch reading ease (higher reads easier)
+    name = "readability"
+    SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+    VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+
+    def measure(self, batch: TextBatch) -> Counters:
+        return {
+            "words": len(batch.words),
+            "sentences": len(self.SENTENCE_END.findall(batch.text)),
+            # Vowel groups approximate syllables well enough for a corpus-level score
+            "syllables": len(self.VOWEL_GROUPS.findall(batch.lower)),
+        }
+
+    def finalize(self, counters: Counters) -> Dict[str, float]:
+        words, sentences = counters.get("words", 0), counters.get("sentences", 0)
+        if not words or not sentences:
+            return {"words_per_sentence": 0.0, "flesch_reading_ease": 0.0}
+        return {
+            "words_per_sentence": words / sentences,
+            "flesch_reading_ease": 206.835 - 1.015 * words / sentences - 84.6 * counters.get("syllables", 0) / words,
+        }
+
+
+@register
+class CrossReferences(Metric):
+    # Citations of other sections, parts and CFR titles per 1,000 words
+    name = "cross_references"
+    SECTION = re.compile(r"§+\s*\d+[\w.-]*")
+    PART = re.compile(r"\bparts?\s+\d+\b")
+    CFR = re.compile(r"\b\d+\s+cfr\b")
+
+    def measure(self, batch: TextBatch) -> Counters:
+        return {
+            "words": len(batch.words),
+            "sections": len(self.SECTION.findall(batch.text)),
+            "parts": len(self.PART.findall(batch.lower)),
+            "cfr": len(self.CFR.findall(batch.lower)),
+        }
+
+    def finalize(self, counters: Counters) -> Dict[str, float]:
+        total = counters.get("sections", 0) + counters.get("parts", 0) + counters.get("cfr", 0)
+        return {
+            "total": total,
+            "per_1000_words": _ratio(total, counters.get("words", 0), 1000),
+            "sections": counters.get("sections", 0),
+            "parts": counters.get("parts", 0),
+            "cfr": counters.get("cfr", 0),
+        }
+
+
+def measure(metrics: Iterable[Metric], batch: TextBatch) -> Dict[str, Counters]:
+    return {metric.name: metric.measure(batch) for metric in metrics}
+
+
+def merge(into: Dict[str, Counters], measured: Dict[str, Counters]) -> None:
+    for name, counters in measured.items():
+        target = into.setdefault(name, {})
+        for key, value in counters.items():
+            target[key] = target.get(key, 0) + int(value)
+
+
+def finalize(counters: Dict[str, Counters]) -> Dict[str, Dict[str, Any]]:
+    # Summed counters -> reported values, as DynamoDB-safe numbers
+    values = {}
+    for name, metric_counters in counters.items():
+        metric = REGISTRY.get(name)
+        if metric is None:
+            continue  # stored by a metric that has since been removed
+        values[name] = {
+            key: Decimal(str(round(value, 3))) if isinstance(value, float) else value
+            for key, value in metric.finalize({k: int(v) for k, v in metric_counters.items()}).items()
+        }
+    return values
@@ -0,0 +1,26 @@
+import pytest
+
+from common import API_DIR
+
+
+@pytest.fixture(scope="package", autouse=True)
+def _api_lambda(lambda_modules):
+    with lambda_modules(API_DIR):
+        yield
+
+
+@pytest.fixture
+def main(ddb):
+    # main.handler with empty caches over an empty table
+    import cache
+    import main
+    for entries in (cache.responses, cache.blobs, cache.search):
+        entries.clear()
+    cache._generation.update(value=None, checked=0.0)
+    return main
+
+
+@pytest.fixture
+def table(ddb):
+    import data_access
+    return data_access.table()
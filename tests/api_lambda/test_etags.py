@@ -0,0 +1,25 @@
+import json
+
+from common import http_event
+
+
+def test_etag_survives_a_generation_change(main, table):
+    import cache
+    table.put_item(Item={"pk": "TITLE#1", "sk": "METADATA", "entity_type": "title", "list_type": "title", "number": 1, "checksum": "c1"})
+    table.put_item(Item=dict(cache.GENERATION_KEY, generation="2026-10-16"))
+    event = http_event("GET", "/titles", {"format": "json"})
+    first = main.handler(event, None)
+
+    table.put_item(Item=dict(cache.GENERATION_KEY, generation="2026-10-17"))
+    cache._generation.update(checked=0.0)
+    revalidated = main.handler(http_event("GET", "/titles", {"format": "json"}, {"if-none-match": first["headers"]["ETag"]}), None)
+    assert cache.stats()["generation"] == "2026-10-17"
+    assert revalidated["statusCode"] == 304
+
+    table.put_item(Item={"pk": "TITLE#1", "sk": "METADATA", "entity_type": "title", "list_type": "title", "number": 1, "checksum": "c2"})
+    table.put_item(Item=dict(cache.GENERATION_KEY, generation="2026-10-18"))
+    cache._generation.update(checked=0.0)
+    changed = main.handler(event, None)
+    assert changed["statusCode"] == 200
+    assert changed["headers"]["ETag"] != first["headers"]["ETag"]
+    assert json.loads(changed["body"])["count"] == 1
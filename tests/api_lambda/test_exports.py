@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+from common import http_event
+
+AGENCY = {
+    "pk": "AGENCY#epa", "sk": "METADATA", "entity_type": "agency", "list_type": "agency", "name": "Environmental Protection Agency",
+    "short_name": "EPA", "slug": "epa", "updated_date": "2026-10-01", "checksum": "c-epa",
+    "cfr_references": [{"title": Decimal(40), "chapter": "I"}, {"title": Decimal(48), "chapter": "15"}],
+}
+
+
+class FakeS3:
+    # The four calls exports.py makes, over a dict
+    def __init__(self):
+        self.objects = {}
+        self.uploads = 0
+
+    def head_object(self, Bucket, Key):
+        from botocore.exceptions import ClientError
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None):
+        self.uploads += 1
+        self.objects[Key] = (Fileobj.read(), ExtraArgs)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3.example/{Params['Key']}?expires={ExpiresIn}"
+
+
+def test_csv_rows_follow_the_columns():
+    import app
+    pages = [[AGENCY], [dict(AGENCY, name="Second, Agency", cfr_references=[])]]
+    rows = list(csv.reader(io.StringIO("".join(app._export_lines("agencies", "csv", pages)))))
+    assert rows[0] == ["Name", "Short Name", "Slug", "CFR References", "Updated Date", "Checksum"]
+    assert rows[1] == ["Environmental Protection Agency", "EPA", "epa", "Title 40 Ch I; Title 48 Ch 15", "2026-10-01", "c-epa"]
+    assert rows[2][0] == "Second, Agency"
+    assert rows[2][3] == ""
+
+
+def test_ndjson_is_one_item_per_line():
+    import app
+    pages = [[AGENCY, dict(AGENCY, slug="other")], [], [{"pk": "TITLE#1", "size": Decimal("12.5")}]]
+    chunks = list(app._export_lines("structure", "ndjson", pages))
+    assert len(chunks) == 2
+    lines = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [line.get("slug") for line in lines] == ["epa", "other", None]
+    assert lines[0]["cfr_references"][0]["title"] == 40
+    assert lines[2]["size"] == 12.5
+
+
+def test_chunk_stream_reads_across_chunks():
+    import exports
+    stream = io.BufferedReader(exports.ChunkStream(["ab", "", "cdé", "f"]), 3)
+    assert stream.read() == "abcdéf".encode("utf-8")
+
+
+def test_export_streams_without_a_bucket(main, table, monkeypatch):
+    import exports
+    monkeypatch.setattr(exports, "EXPORT_BUCKET", "")
+    table.put_item(Item=AGENCY)
+    response = main.handler(http_event("GET", "/api/export/agencies", {"format": "csv"}), None)
+    assert response["statusCode"] == 200
+    assert 'filename="ecfr-agencies.csv"' in response["headers"]["content-disposition"]
+    assert "Environmental Protection Agency" in response["body"]
+
+
+def test_export_is_uploaded_once_per_generation(main, table, monkeypatch):
+    import cache
+    import exports
+    s3 = FakeS3()
+    monkeypatch.setattr(exports, "EXPORT_BUCKET", "exports-bucket")
+    monkeypatch.setitem(exports._client, "s3", s3)
+    table.put_item(Item=AGENCY)
+    table.put_item(Item=dict(cache.GENERATION_KEY, generation="2026-10-17"))
+
+    event = http_event("GET", "/api/export/agencies", {"format": "ndjson"})
+    first = main.handler(event, None)
+    assert first["statusCode"] == 303
+    key = "exports/2026-10-17/ecfr-agencies.ndjson"
+    assert first["headers"]["location"].startswith(f"https://exports-bucket.s3.example/{key}")
+    body, extra = s3.objects[key]
+    assert json.loads(body)["slug"] == "epa"
+    assert extra["ContentType"] == "application/x-ndjson"
+
+    assert main.handler(event, None)["statusCode"] == 303
+    assert s3.uploads == 1
+
+    table.put_item(Item=dict(cache.GENERATION_KEY, generation="2026-10-18"))
+    cache._generation.update(checked=0.0)
+    main.handler(event, None)
+    assert s3.uploads == 2
@@ -0,0 +1,22 @@
+import json
+
+from common import http_event
+
+
+class RecordingLambda:
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"StatusCode": 202}
+
+
+def test_ingest_starts_a_sharded_run(main, monkeypatch):
+    client = RecordingLambda()
+    monkeypatch.setitem(main._lazy, "lambda", client)
+    response = main.handler(http_event("POST", "/ingest"), None)
+    assert response["statusCode"] == 200
+    [call] = client.calls
+    assert call["InvocationType"] == "Event"
+    assert json.loads(call["Payload"]) == {"stage": "orchestrate"}
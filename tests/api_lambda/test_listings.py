@@ -0,0 +1,23 @@
+import json
+
+from common import http_event
+
+
+def test_title_listing_leaves_out_structure_nodes(main, table):
+    table.put_item(Item={"pk": "TITLE#1", "sk": "METADATA", "entity_type": "title", "list_type": "title", "number": 1,
+                         "name": "General Provisions", "structure_layout": 5})
+    # The title's root node shares entity_type "title" but is not listable
+    table.put_item(Item={"pk": "TITLE#1", "sk": "TITLE#1", "entity_type": "title", "identifier": "1", "path": "1"})
+    response = main.handler(http_event("GET", "/titles", {"format": "json"}), None)
+    body = json.loads(response["body"])
+    assert body["count"] == 1
+    # list-index only projects what listings show
+    assert body["titles"][0]["name"] == "General Provisions"
+    assert "structure_layout" not in body["titles"][0]
+
+
+def test_node_types_need_a_title(main, table):
+    response = main.handler(http_event("GET", "/api/search", {"entity_type": "part"}), None)
+    assert response["statusCode"] == 400
+    response = main.handler(http_event("GET", "/api/search", {"entity_type": "part", "title_num": "1"}), None)
+    assert response["statusCode"] == 200
@@ -0,0 +1,50 @@
+import base64
+import json
+
+from common import http_event
+
+
+def put_titles(table, count):
+    for number in range(1, count + 1):
+        table.put_item(Item={"pk": f"TITLE#{number}", "sk": "METADATA", "entity_type": "title", "list_type": "title",
+                             "number": number, "name": f"Title {number}"})
+
+
+def test_limits_below_one_read_one_item(main, table):
+    put_titles(table, 3)
+    for path, query in [
+        ("/titles", {"format": "json", "limit": "0"}),  # fast path
+        ("/titles", {"limit": "-5"}),  # HTML, through the app
+        ("/api/search", {"entity_type": "title", "limit": "0"}),
+        ("/api/rankings/total_bytes", {"limit": "-1"}),
+        ("/api/title/1/tree", {"limit": "0"}),
+    ]:
+        response = main.handler(http_event("GET", path, query), None)
+        assert response["statusCode"] in (200, 404), (path, query, response["body"])
+    body = json.loads(main.handler(http_event("GET", "/titles", {"format": "json", "limit": "0"}), None)["body"])
+    assert body["count"] == 1
+    assert body["next"]
+
+
+def test_cursor_round_trips_and_rejects_non_objects(main, table):
+    put_titles(table, 3)
+    first = json.loads(main.handler(http_event("GET", "/titles", {"format": "json", "limit": "2"}), None)["body"])
+    second = json.loads(main.handler(http_event("GET", "/titles", {"format": "json", "limit": "2", "next": first["next"]}), None)["body"])
+    assert sorted(t["number"] for t in first["titles"] + second["titles"]) == [1, 2, 3]
+    assert second["next"] is None
+
+    bogus = base64.urlsafe_b64encode(b"[1]").decode("ascii")
+    for path, query in [("/titles", {"format": "json"}), ("/api/search", {"entity_type": "title"})]:
+        response = main.handler(http_event("GET", path, dict(query, next=bogus)), None)
+        assert response["statusCode"] == 400
+
+
+def test_helpers():
+    import paging
+    from decimal import Decimal
+    assert [paging.clamp_limit(n) for n in (-3, 0, 1, 25, 5000)] == [1, 1, 1, 25, paging.MAX_LIMIT]
+    assert paging.clamp_limit(500, 100) == 100
+    state = {"pk": "TITLE#1", "sk": "METADATA"}
+    assert paging.decode_cursor(paging.encode_cursor(state)) == state
+    assert paging.encode_cursor(None) is None
+    assert json.dumps([Decimal(3), Decimal("1.5")], default=paging.json_default) == "[3, 1.5]"
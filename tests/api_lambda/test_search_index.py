@@ -0,0 +1,70 @@
+import contextlib
+import sys
+
+from common import INGEST_DIR
+
+DOCS = {
+    1: [
+        ["1", "title", "Title 1", "General Provisions"],
+        ["1/I/10", "part", "Part 10", "Water Quality Standards"],
+        ["1/I/10/10.1", "section", "§ 10.1 Water sampling", ""],
+    ],
+    2: [
+        ["2/II/20", "part", "Part 20", "Waste water treatment"],
+        ["2/II/20/20.5", "section", "§ 20.5 Records", "Treatment records"],
+    ],
+}
+
+
+@contextlib.contextmanager
+def ingest_modules(lambda_modules):
+    # Ingest's search_index and structure_blob share their names with the API's
+    saved = {name: sys.modules.pop(name) for name in ("search_index", "structure_blob") if name in sys.modules}
+    try:
+        with lambda_modules(INGEST_DIR):
+            yield
+    finally:
+        sys.modules.update(saved)
+
+
+def build(lambda_modules, table):
+    # Writes the index the way ingest does; returns ingest's builder
+    with ingest_modules(lambda_modules):
+        import search_index
+        builder = search_index.IndexBuilder()
+        for title_num, docs in DOCS.items():
+            builder.add_title(title_num, docs)
+        for item in builder.items("idx-1", "2026-10-17"):
+            table.put_item(Item=item)
+        table.put_item(Item=builder.pointer("idx-1", "test", "2026-10-17"))
+    return builder
+
+
+def test_postings_round_trip(main, table, lambda_modules):
+    builder = build(lambda_modules, table)
+    import search_index
+    index = search_index.SearchIndex.load(table, "data-1")
+    assert index.docs == 5
+    for term, postings in builder.postings.items():
+        shard = index.shard(term[:index.prefix_len])
+        assert shard.postings(term) == dict(postings)
+    assert index.shard("zz") is None
+
+
+def test_queries_rank_filter_and_page(main, table, lambda_modules):
+    build(lambda_modules, table)
+    import search_index
+    body = search_index.run_query(table, "data-1", "water")
+    # Heading matches outrank label matches; ties keep document order
+    assert [r["path"] for r in body["results"]] == ["1/I/10", "2/II/20", "1/I/10/10.1"]
+    assert body["results"][0]["label_description"] == "Water Quality Standards"
+
+    assert [r["path"] for r in search_index.run_query(table, "data-1", "wat", entity_type="section")["results"]] == ["1/I/10/10.1"]
+    assert [r["path"] for r in search_index.run_query(table, "data-1", "treat", title_num=2)["results"]] == ["2/II/20", "2/II/20/20.5"]
+    # A finished word is matched exactly
+    assert search_index.run_query(table, "data-1", "wat ")["total"] == 0
+
+    first = search_index.run_query(table, "data-1", "water", limit=2)
+    rest = search_index.run_query(table, "data-1", "water", limit=2, cursor=first["next"])
+    assert [r["path"] for r in first["results"] + rest["results"]] == [r["path"] for r in body["results"]]
+    assert rest["next"] is None
@@ -0,0 +1,77 @@
+import json
+from decimal import Decimal
+
+from common import http_event
+
+
+def put_nodes(table):
+    for sk, path, depth, size in [
+        ("TITLE#1", "1", 0, 300),
+        ("CHAPTER#1/I", "1/I", 1, 200),
+        ("CHAPTER#1/II", "1/II", 1, 100),
+        ("PART#1/I/10", "1/I/10", 2, 200),
+    ]:
+        identifier = path.rsplit("/", 1)[-1]
+        table.put_item(Item={
+            "pk": "TITLE#1", "sk": sk, "entity_type": sk.split("#")[0].lower(), "identifier": identifier,
+            "label": f"Node {identifier}", "path": path, "depth": depth, "size": size,
+            "level_key": f"{depth:03d}#{path}/", "checksum": f"c-{path}",
+        })
+
+
+def test_legacy_json_serializes_decimals(main, table):
+    put_nodes(table)
+    response = main.handler(http_event("GET", "/title/structure", {"title_num": "1", "format": "json"}), None)
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert [c["identifier"] for c in body["chapters"]] == ["I", "II"]
+    assert body["parts"][0]["size"] == 200
+    assert isinstance(table.get_item(Key={"pk": "TITLE#1", "sk": "PART#1/I/10"})["Item"]["size"], Decimal)
+
+
+def test_depth_one_reads_one_level_range_each(main, table, ddb):
+    put_nodes(table)
+    ddb.reset_stats()
+    response = main.handler(http_event("GET", "/api/title/1/tree", {"depth": "1"}), None)
+    body = json.loads(response["body"])
+    assert [n["path"] for n in body["nodes"]] == ["1", "1/I", "1/II"]
+    assert body["next"] is None
+    # The title node's level and its children's, and no filtered-out reads
+    assert ddb.stats()["operations"]["Query"]["calls"] == 3  # the blob probe and two levels
+
+
+def test_whole_subtree_reads_level_by_level(main, table, ddb):
+    put_nodes(table)
+    ddb.reset_stats()
+    body = json.loads(main.handler(http_event("GET", "/api/title/1/tree", {"path": "1/I"}), None)["body"])
+    assert [n["path"] for n in body["nodes"]] == ["1/I", "1/I/10"]
+    assert body["next"] is None
+    # The blob probe, chapter I's level, its parts' level and the empty level below
+    assert ddb.stats()["operations"]["Query"]["calls"] == 4
+
+
+def test_whole_tree_pages_across_levels(main, table):
+    put_nodes(table)
+    paths, cursor = [], None
+    while True:
+        query = {"limit": "2", **({"next": cursor} if cursor else {})}
+        body = json.loads(main.handler(http_event("GET", "/api/title/1/tree", query), None)["body"])
+        paths += [n["path"] for n in body["nodes"]]
+        cursor = body["next"]
+        if not cursor:
+            break
+    assert paths == ["1", "1/I", "1/II", "1/I/10"]
+
+
+def test_missing_subtree_is_not_found(main, table):
+    put_nodes(table)
+    response = main.handler(http_event("GET", "/api/title/1/tree", {"path": "1/IX"}), None)
+    assert response["statusCode"] == 404
+
+
+def test_nested_subtree_without_a_depth(main, table):
+    put_nodes(table)
+    response = main.handler(http_event("GET", "/title/structure", {"title_num": "1", "path": "1", "format": "json"}), None)
+    node = json.loads(response["body"])["node"]
+    assert [c["identifier"] for c in node["children"]] == ["I", "II"]
+    assert [p["identifier"] for p in node["children"][0]["children"]] == ["10"]
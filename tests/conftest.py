@@ -0,0 +1,50 @@
+"""Shared fixtures.
+
+The two Lambdas share module names (app, search_index, structure_blob), so
+each test package imports its Lambda's modules inside `lambda_modules` and
+drops them again afterwards. DynamoDB is benchmarks/fake_dynamodb.py, with a
+fresh table for every test.
+"""
+import contextlib
+import os
+import sys
+from typing import Iterator
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from common import TABLE, offline_env  # noqa: E402
+from fake_dynamodb import FakeDynamoDB  # noqa: E402
+
+# Before any Lambda module is imported, as they read their settings then
+offline_env()
+
+
+@contextlib.contextmanager
+def _lambda_modules(directory: str) -> Iterator[None]:
+    sys.path.insert(0, directory)
+    try:
+        yield
+    finally:
+        sys.path.remove(directory)
+        for name, module in list(sys.modules.items()):
+            if (getattr(module, "__file__", None) or "").startswith(directory + os.sep):
+                del sys.modules[name]
+
+
+@pytest.fixture(scope="session")
+def lambda_modules():
+    return _lambda_modules
+
+
+@pytest.fixture(scope="session")
+def fake() -> FakeDynamoDB:
+    return FakeDynamoDB().install()
+
+
+@pytest.fixture
+def ddb(fake: FakeDynamoDB) -> FakeDynamoDB:
+    fake.create_table(TABLE)
+    return fake
@@ -0,0 +1,45 @@
+import pytest
+
+from common import INGEST_DIR
+from ecfr_server import EcfrServer, SyntheticEcfr
+
+
+class FlakyEcfr:
+    """A synthetic eCFR whose listed paths answer 404 once each."""
+
+    def __init__(self, source: SyntheticEcfr):
+        self.source = source
+        self.failing = set()
+
+    def get(self, path: str):
+        if path in self.failing:
+            self.failing.discard(path)
+            return None
+        return self.source.get(path)
+
+
+@pytest.fixture(scope="package")
+def ecfr():
+    server = EcfrServer(FlakyEcfr(SyntheticEcfr(3, 2, 2, 3).prepare())).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope="package", autouse=True)
+def _ingest_lambda(lambda_modules, fake, ecfr):
+    # Ingest reads its settings when it is imported
+    with pytest.MonkeyPatch.context() as env:
+        env.setenv("ECFR_BASE_URL", ecfr.base_url)
+        env.setenv("INGEST_HISTORY", "false")
+        env.setenv("INGEST_WORD_COUNTS", "false")
+        env.setenv("PUBLISH_FUNCTION_NAME", "")
+        env.delenv("ECFR_CACHE", raising=False)
+        with lambda_modules(INGEST_DIR):
+            yield
+
+
+@pytest.fixture
+def ingest(ddb, ecfr):
+    import app
+    ecfr.source.failing.clear()
+    return app
@@ -0,0 +1,44 @@
+import io
+
+TITLE = b"""<?xml version="1.0"?>
+<DIV1 N="1" TYPE="TITLE"><HEAD>Title 1 General</HEAD>
+  <DIV3 N="I" TYPE="CHAPTER"><HEAD>Chapter I</HEAD>
+    <DIV5 N="10" TYPE="PART"><HEAD>Part 10 Heading</HEAD>
+      <DIV8 N="10.1" TYPE="SECTION"><HEAD>Scope</HEAD>
+        <P>alpha <I>beta</I> gamma delta <E T="03">eps</E> zeta eta</P>
+      </DIV8>
+    </DIV5>
+    <P>Text after the part <I>still</I> belongs to the chapter</P>
+  </DIV3>
+</DIV1>
+"""
+
+
+def count(document: bytes, metrics=()):
+    from fulltext import count_title_words
+    return count_title_words(io.BytesIO(document), metrics)
+
+
+def test_text_after_inline_markup_is_counted():
+    result = count(b'<DIV1 N="1" TYPE="TITLE"><HEAD>Head</HEAD>'
+                   b'<P>alpha <I>beta</I> gamma delta <E>eps</E> zeta eta</P></DIV1>')
+    assert result["total"] == 1 + 7
+
+
+def test_words_count_towards_every_enclosing_unit():
+    result = count(TITLE)
+    # Title heading 3, chapter heading 2, part heading 3, section 1 + 7, after the part 9
+    assert result["total"] == 25
+    assert result["units"] == {"chapter:I": 22, "part:10": 11}
+
+
+def test_metrics_share_the_pass():
+    from text_metrics import REGISTRY
+    result = count(b'<DIV1 N="1" TYPE="TITLE"><DIV5 N="5" TYPE="PART">'
+                   b'<P>Applicants <E>shall</E> file. They must not <I>wait</I>.</P></DIV5></DIV1>',
+                   [REGISTRY["restrictive_terms"], REGISTRY["readability"]])
+    assert result["total"] == 7
+    title = result["metrics"]["title"]
+    assert title["restrictive_terms"]["terms"] == 2
+    assert title["readability"] == {"words": 7, "sentences": 2, "syllables": title["readability"]["syllables"]}
+    assert result["metrics"]["units"]["part:5"] == title
@@ -0,0 +1,19 @@
+from collections import Counter
+
+
+def test_only_listable_items_carry_list_type(ingest):
+    result = ingest.handler({"mode": "full", "history": False, "word_counts": False}, None)
+    assert result["ok"]
+    items, kwargs = [], {}
+    while True:
+        page = ingest.table.scan(**kwargs)
+        items.extend(page["Items"])
+        if "LastEvaluatedKey" not in page:
+            break
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+    listed = [item for item in items if "list_type" in item]
+    counts = Counter(item["list_type"] for item in listed)
+    assert set(counts) == {"agency", "title", "agency_title_mapping"}
+    assert counts["title"] == sum(1 for item in items if item["pk"].startswith("TITLE#") and item["sk"] == "METADATA")
+    assert all(item["sk"] == "METADATA" for item in listed if item["list_type"] != "agency_title_mapping")
+    assert len(listed) < len(items) // 4
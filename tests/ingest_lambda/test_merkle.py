@@ -0,0 +1,75 @@
+import copy
+
+TREE = {
+    "type": "title", "identifier": "1", "label": "Title 1",
+    "children": [
+        {"type": "chapter", "identifier": "I", "label": "Chapter I", "children": [
+            {"type": "subchapter", "identifier": "A", "label": "Subchapter A", "children": [
+                {"type": "part", "identifier": "10", "label": "Part 10", "children": [
+                    {"type": "section", "identifier": "10.1", "label": "Section 10.1"},
+                ]},
+            ]},
+        ]},
+        {"type": "chapter", "identifier": "II", "label": "Chapter II", "children": [
+            {"type": "subchapter", "identifier": "A", "label": "Subchapter A"},
+        ]},
+    ],
+}
+
+
+def nodes(tree):
+    import merkle
+    return {n.path: n for n in merkle.iter_tree(tree)}
+
+
+def test_children_come_before_their_parent():
+    import merkle
+    walked = list(merkle.iter_tree(TREE))
+    seen = set()
+    for node in walked:
+        assert all(f"{node.path}/{c['identifier']}" in seen for c in node.node.get("children", []))
+        seen.add(node.path)
+    assert walked[-1].path == "1"
+    # order is the pre-order position
+    assert [n.path for n in sorted(walked, key=lambda n: n.order)][:3] == ["1", "1/I", "1/I/A"]
+
+
+def test_root_checksum_covers_every_node():
+    import merkle
+    before = nodes(TREE)
+    assert before["1"].checksum == merkle.node_hash(merkle.own_fields(TREE), [before["1/I"].checksum, before["1/II"].checksum])
+
+    changed = copy.deepcopy(TREE)
+    changed["children"][0]["children"][0]["children"][0]["children"][0]["label"] = "Section 10.1, amended"
+    after = nodes(changed)
+    for path in ("1", "1/I", "1/I/A", "1/I/A/10", "1/I/A/10/10.1"):
+        assert after[path].checksum != before[path].checksum
+    assert after["1/II"].checksum == before["1/II"].checksum
+
+    # Sibling order is part of the hash
+    swapped = copy.deepcopy(TREE)
+    swapped["children"].reverse()
+    assert nodes(swapped)["1"].checksum != before["1"].checksum
+
+
+def test_units_are_scoped_to_their_chapter():
+    found = nodes(TREE)
+    assert found["1/I/A"].unit == "chapter:I/subchapter:A"
+    assert found["1/II/A"].unit == "chapter:II/subchapter:A"
+    assert found["1/I/A/10"].scope == ("chapter:I", "chapter:I/subchapter:A", "part:10")
+    assert found["1/I/A/10/10.1"].unit is None
+
+
+def test_agency_checksum_combines_referenced_units():
+    import merkle
+    found = nodes(TREE)
+    units = {1: {n.unit: n.checksum for n in found.values() if n.unit}}
+    refs = [{"title": 1, "chapter": "I"}, {"title": 1, "chapter": "II", "subchapter": "A"}]
+    checksum, missing = merkle.agency_checksum(refs, units)
+    assert missing == 0
+    # Reference order doesn't matter
+    assert merkle.agency_checksum(list(reversed(refs)), units) == (checksum, 0)
+
+    changed = dict(units[1], **{"chapter:I": "0" * 64})
+    assert merkle.agency_checksum(refs, {1: changed})[0] != checksum
+    assert merkle.agency_checksum(refs + [{"title": 2, "part": "5"}], units)[1] == 1
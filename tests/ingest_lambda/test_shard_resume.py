@@ -0,0 +1,37 @@
+from ecfr_server import DATE
+
+
+class Context:
+    """Lambda context whose time runs out after `checks` deadline checks."""
+
+    def __init__(self, checks: int):
+        self.checks = checks
+
+    def get_remaining_time_in_millis(self) -> int:
+        self.checks -= 1
+        return 900_000 if self.checks >= 0 else 0
+
+
+def test_failed_title_is_retried_when_the_shard_resumes(ingest, ecfr):
+    import orchestrator
+    invoked = []
+    started = orchestrator.orchestrate(
+        {"stage": "orchestrate", "mode": "full", "word_counts": False, "history": False,
+         "concurrency": 1, "shards": 1},
+        None, invoked.append
+    )
+    shard = invoked.pop()
+
+    # Title 2's structure fails; time runs out before title 3 is stored
+    ecfr.source.failing.add(f"versioner/v1/structure/{DATE}/title-2.json")
+    first = orchestrator.run_shard(shard, Context(checks=3), invoked.append)
+    assert first["message"].endswith("continues in a new invocation")
+    checkpoint = orchestrator.load_item(started["run_id"], orchestrator.shard_sk(0))
+    assert sorted(int(n) for n in checkpoint["done"]["structures"]) == [1, 4]
+    assert "Item" not in ingest.table.get_item(Key={"pk": "TITLE#2", "sk": "METADATA"})
+
+    second = orchestrator.run_shard(invoked.pop(), Context(checks=100), invoked.append)
+    assert second["message"].endswith("complete")
+    assert second["counts"]["titles"] == 2
+    assert "Item" in ingest.table.get_item(Key={"pk": "TITLE#2", "sk": "METADATA"})
+    assert invoked == [{"stage": "finalize", "run_id": started["run_id"]}]
@@ -0,0 +1,74 @@
+import copy
+import json
+
+
+def tree():
+    def part(n, sections):
+        return {"type": "part", "identifier": str(n), "label": f"Part {n}", "size": 10 * sections,
+                "children": [{"type": "section", "identifier": f"{n}.{s}", "label": f"§ {n}.{s}", "size": 10}
+                             for s in range(1, sections + 1)]}
+    return {"type": "title", "identifier": "1", "label": "Title 1", "size": 90, "children": [
+        {"type": "chapter", "identifier": "I", "label": "Chapter I", "size": 50, "children": [part(10, 2), part(11, 3)]},
+        {"type": "chapter", "identifier": "II", "label": "Chapter II", "size": 40, "children": [part(20, 4)]},
+    ]}
+
+
+def snapshot(document):
+    import merkle
+    import structure_diff
+    return structure_diff.Snapshot(list(merkle.iter_tree(document)))
+
+
+def test_identical_trees_prune_at_the_root():
+    import structure_diff
+    diff = structure_diff.diff_snapshots(snapshot(tree()), snapshot(tree()))
+    assert diff["identical"]
+    assert diff["counts"]["pruned_subtrees"] == 1
+    assert diff["counts"]["visited_nodes"] == 0
+    assert diff["added"] == diff["removed"] == diff["modified"] == []
+
+
+def test_changes_are_found_without_walking_unchanged_subtrees():
+    import structure_diff
+    old, new = tree(), tree()
+    chapter_i = new["children"][0]
+    chapter_i["children"][1]["children"][0]["label"] = "§ 11.1, amended"
+    del chapter_i["children"][0]["children"][1]
+    chapter_i["children"].append({"type": "part", "identifier": "12", "label": "Part 12", "size": 5,
+                                  "children": [{"type": "section", "identifier": "12.1", "label": "§ 12.1"}]})
+    diff = structure_diff.diff_snapshots(snapshot(old), snapshot(new))
+
+    assert not diff["identical"]
+    assert [m["path"] for m in diff["modified"]] == ["1/I/11/11.1"]
+    assert diff["modified"][0]["fields"] == {"label": {"from": "§ 11.1", "to": "§ 11.1, amended"}}
+    assert [(r["path"], r["nodes"]) for r in diff["removed"]] == [("1/I/10/10.2", 1)]
+    assert [(a["path"], a["nodes"]) for a in diff["added"]] == [("1/I/12", 2)]
+    # Chapter II (six nodes) and the three untouched sections are skipped whole
+    assert diff["counts"]["pruned_subtrees"] == 4
+    assert diff["counts"]["pruned_nodes"] == 9
+    # The title, chapter I, parts 10 and 11 and section 11.1
+    assert diff["counts"]["visited_nodes"] == 5
+
+
+def test_sizes_and_truncation():
+    import structure_diff
+    old, new = tree(), copy.deepcopy(tree())
+    for child in new["children"][1]["children"][0]["children"]:
+        child["size"] = 20
+    new["size"] = 130
+    diff = structure_diff.diff_snapshots(snapshot(old), snapshot(new), max_changes=2)
+    assert diff["size_delta"] == 40
+    assert diff["counts"]["modified"] == 5  # the title and four sections
+    assert len(diff["modified"]) == 2
+    assert diff["truncated"]
+
+
+def test_fit_item_keeps_the_counts():
+    import structure_diff
+    old, new = tree(), tree()
+    new["children"][1]["children"][0]["children"] = []
+    diff = structure_diff.diff_snapshots(snapshot(old), snapshot(new))
+    fitted = structure_diff.fit_item(copy.deepcopy(diff), max_bytes=len(json.dumps(diff, separators=(',', ':'))) - 1)
+    assert len(fitted["removed"]) < len(diff["removed"])
+    assert fitted["counts"] == diff["counts"]
+    assert fitted["truncated"]
@@ -0,0 +1,16 @@
+def test_old_layout_nodes_lose_tree_key(ingest):
+    assert ingest.handler({"mode": "full", "history": False, "word_counts": False}, None)["ok"]
+    key = {"pk": "TITLE#1", "sk": "TITLE#1"}
+    root = ingest.table.get_item(Key=key)["Item"]
+    assert "tree_key" not in root
+    assert root["level_key"] == "000#1/"
+
+    # A title stored under layout 5, whose nodes still carry tree_key
+    ingest.table.put_item(Item=dict(root, tree_key="1/"))
+    ingest.table.update_item(Key={"pk": "TITLE#1", "sk": "METADATA"}, UpdateExpression="SET structure_layout = :v",
+                             ExpressionAttributeValues={":v": 5})
+    ingest.table.update_item(Key={"pk": "TITLE#1", "sk": "SUMMARY"}, UpdateExpression="SET layout = :v",
+                             ExpressionAttributeValues={":v": 5})
+    assert ingest.handler({"mode": "incremental", "history": False, "word_counts": False}, None)["ok"]
+    assert "tree_key" not in ingest.table.get_item(Key=key)["Item"]
+    assert ingest.table.get_item(Key={"pk": "TITLE#1", "sk": "METADATA"})["Item"]["structure_layout"] == ingest.STRUCTURE_LAYOUT
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+import pytest
+
+
+def measured(text: str):
+    import text_metrics
+    return text_metrics.measure(text_metrics.enabled("all"), text_metrics.TextBatch(text))
+
+
+def test_counters_add_up_across_batches():
+    import text_metrics
+    summed = {}
+    text_metrics.merge(summed, measured("You shall file. You may not wait."))
+    text_metrics.merge(summed, measured("See § 10.5 and part 12 of 40 CFR. Filing is required."))
+    assert summed["restrictive_terms"] == {"words": 19, "terms": 3, "shall": 1, "may_not": 1, "required": 1}
+    assert summed["cross_references"] == {"words": 19, "sections": 1, "parts": 1, "cfr": 1}
+    assert summed["readability"]["sentences"] == 4
+
+
+def test_finalize_turns_counters_into_decimal_ratios():
+    import text_metrics
+    values = text_metrics.finalize({
+        "restrictive_terms": {"words": 2000, "terms": 3, "shall": 3},
+        "readability": {"words": 20, "sentences": 0, "syllables": 30},
+        "retired_metric": {"words": 1},
+    })
+    assert values["restrictive_terms"]["per_1000_words"] == Decimal("1.5")
+    assert values["restrictive_terms"]["shall"] == 3
+    # No sentences: no ratio rather than a division by zero
+    assert values["readability"] == {"words_per_sentence": Decimal("0.0"), "flesch_reading_ease": Decimal("0.0")}
+    assert "retired_metric" not in values
+
+
+def test_enabled_names():
+    import text_metrics
+    assert text_metrics.enabled("none") == []
+    assert [m.name for m in text_metrics.enabled("readability, cross_references")] == ["readability", "cross_references"]
+    with pytest.raises(ValueError):
+        text_metrics.enabled("readability,nope")